@@ -0,0 +1,122 @@
+from collections import namedtuple
+
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    InlineFragmentNode,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_list_type,
+)
+from graphql.execution.values import get_argument_values
+
+QueryCost = namedtuple("QueryCost", "depth nodes cost")
+
+
+class CostAnalyzer:
+    """
+    Estimates how much work an operation will do before it runs.
+
+    Each field costs one unit per object it is resolved on. A connection
+    field multiplies everything below it by its ``first``/``last``
+    argument (or ``default_page_size``), and a plain list field by
+    ``default_list_size``. ``nodes`` is the estimated number of objects
+    returned and ``depth`` the deepest field nesting. Introspection
+    fields are free.
+    """
+
+    def __init__(self, schema, document, variables=None, default_page_size=100, default_list_size=10):
+        self.schema = schema
+        self.variables = variables or {}
+        self.default_page_size = default_page_size
+        self.default_list_size = default_list_size
+        self.fragments = {
+            d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)
+        }
+        self.document = document
+        self.depth = self.nodes = self.cost = 0
+
+    def analyze(self, operation_name=None):
+        operation = get_operation_ast(self.document, operation_name)
+        if operation is None:
+            return QueryCost(0, 0, 0)
+        root_type = self.schema.get_root_type(operation.operation)
+        self.visit(operation.selection_set, root_type, multiplier=1, depth=1, in_connection=False)
+        return QueryCost(self.depth, self.nodes, self.cost)
+
+    def visit(self, selection_set, parent_type, multiplier, depth, in_connection, visited=()):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                self.visit_field(selection, parent_type, multiplier, depth, in_connection, visited)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                self.visit(selection.selection_set, fragment_type, multiplier, depth, in_connection, visited)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                self.visit(fragment.selection_set, fragment_type, multiplier, depth,
+                           in_connection, visited + (name,))
+
+    def visit_field(self, node, parent_type, multiplier, depth, in_connection, visited):
+        name = node.name.value
+        fields = getattr(parent_type, "fields", None)
+        if name.startswith("__") or not fields or name not in fields:
+            return
+        field = fields[name]
+        self.depth = max(self.depth, depth)
+        self.cost += multiplier
+
+        size, child_in_connection = 1, False
+        if "first" in field.args or "last" in field.args:
+            try:
+                args = get_argument_values(field, node, self.variables)
+            except GraphQLError:
+                args = {}
+            # A negative page size must not lower the cost of the rest of
+            # the query, and 0 is a page size, not a missing argument.
+            sizes = [max(0, args[arg]) for arg in ("first", "last") if args.get(arg) is not None]
+            size = max(sizes) if sizes else self.default_page_size
+            child_in_connection = True
+        elif is_list_type(get_nullable_type(field.type)) and not in_connection:
+            size = self.default_list_size
+        # The ``edges`` list of a connection is already counted by the page size.
+
+        if size > 1 or child_in_connection:
+            self.nodes += multiplier * size
+        if node.selection_set:
+            self.visit(node.selection_set, get_named_type(field.type), multiplier * size,
+                       depth + 1, child_in_connection, visited)
+
+
+def check_query_cost(schema, document, operation_name, variables, limits):
+    """
+    Returns the operation's ``QueryCost`` and a list of errors for every
+    limit in ``limits`` (``MAX_DEPTH``, ``MAX_NODES``, ``MAX_COST``) it
+    exceeds.
+    """
+    cost = CostAnalyzer(
+        schema,
+        document,
+        variables,
+        default_page_size=limits.get("DEFAULT_PAGE_SIZE", 100),
+        default_list_size=limits.get("DEFAULT_LIST_SIZE", 10),
+    ).analyze(operation_name)
+
+    errors = []
+    for metric, setting in (("depth", "MAX_DEPTH"), ("nodes", "MAX_NODES"), ("cost", "MAX_COST")):
+        limit = limits.get(setting)
+        value = getattr(cost, metric)
+        if limit is not None and value > limit:
+            errors.append(GraphQLError(
+                f"Query {metric} {value} exceeds the maximum of {limit}.",
+                extensions={"code": "QUERY_TOO_COMPLEX", "metric": metric, "value": value, "limit": limit},
+            ))
+    return cost, errors
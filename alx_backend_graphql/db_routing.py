@@ -0,0 +1,117 @@
+"""
+Read/write routing between the ``default`` database and a read replica.
+
+GraphQL query operations read from the replica while it is within
+DATABASE_READ_REPLICA's MAX_LAG_SECONDS. Mutations, reads that follow a
+write in the same request, and code running outside a GraphQL request
+(commands, cron jobs, workers) use ``default``.
+"""
+import os
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# The routing of the GraphQL request being executed. Like the trace in
+# .instrumentation, it follows the work into sync_to_async threads.
+current_routing = ContextVar("db_routing", default=None)
+
+
+def replica_settings():
+    return getattr(settings, "DATABASE_READ_REPLICA", {})
+
+
+def replica_alias():
+    alias = replica_settings().get("ALIAS", "replica")
+    return alias if alias in settings.DATABASES else None
+
+
+def replica_lag(alias):
+    """
+    Seconds the replica is behind ``default``, or None if it cannot be
+    used. A SQLite replica is a snapshot file stamped with the time it was
+    taken (see ``manage.py snapshot_replica``); other backends are trusted
+    to replicate within the tolerance.
+    """
+    connection = connections[alias]
+    if connection.vendor != "sqlite":
+        return 0.0
+    try:
+        return max(0.0, time.time() - os.path.getmtime(connection.settings_dict["NAME"]))
+    except (OSError, TypeError):
+        return None
+
+
+class RoutingState:
+    """Where the current request reads from, and whether it has written."""
+
+    __slots__ = ("read_alias", "wrote")
+
+    def __init__(self):
+        self.read_alias = DEFAULT_DB_ALIAS
+        self.wrote = False
+
+
+def use_replica_for_reads():
+    """
+    Sends the current request's reads to the replica, if one is
+    configured and fresh enough. Returns the alias reads now go to.
+    """
+    state = current_routing.get()
+    if state is None:
+        return DEFAULT_DB_ALIAS
+    alias = replica_alias()
+    if alias is not None:
+        lag = replica_lag(alias)
+        if lag is not None and lag <= replica_settings().get("MAX_LAG_SECONDS", 30.0):
+            state.read_alias = alias
+    return state.read_alias
+
+
+def reads_from_replica():
+    """Whether the current request's reads are going to the replica."""
+    state = current_routing.get()
+    return state is not None and not state.wrote and state.read_alias != DEFAULT_DB_ALIAS
+
+
+async def routed(state, awaitable):
+    """Awaits ``awaitable`` with ``state`` as the current routing."""
+    token = current_routing.set(state)
+    try:
+        return await awaitable
+    finally:
+        current_routing.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Database router following ``current_routing``. Writes always go to
+    ``default``, even for instances read from the replica, and the first
+    write sends the rest of the request's reads there too, so it reads
+    its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if state is None:
+            return None
+        return DEFAULT_DB_ALIAS if state.wrote else state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as default.
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, replica_alias()}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica's schema comes with its data.
+        if db == replica_alias():
+            return False
+        return None
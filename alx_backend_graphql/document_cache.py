@@ -0,0 +1,69 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CachedDocument = namedtuple("CachedDocument", "query document errors")
+
+
+def query_hash(query):
+    """sha256 hex digest of a query string, as used by persisted queries."""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU of parsed and validated GraphQL documents.
+
+    Entries are keyed by ``query_hash(query)``. Once ``max_size`` is
+    reached the least recently used entry is evicted; with ``ttl`` set,
+    entries older than ``ttl`` seconds are also dropped on access.
+    """
+
+    def __init__(self, max_size=1000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[1] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, entry):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (entry, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,325 @@
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from graphene.relay.node import GlobalID
+from graphene.types.resolver import dict_or_attr_resolver
+
+# Seconds. Resolvers and SQL statements are usually sub-millisecond, so
+# the buckets start low.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# The trace of the GraphQL request being executed, and the field whose
+# resolver is running. Context variables follow the work into
+# sync_to_async threads and asyncio tasks.
+current_trace = ContextVar("graphql_trace", default=None)
+current_field = ContextVar("graphql_field", default=None)
+
+# Resolvers that only read an attribute; timing them costs more than
+# it tells.
+TRIVIAL_RESOLVERS = (dict_or_attr_resolver, GlobalID.id_resolver)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as exposed in the Prometheus text format."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Thread-safe, in-process histograms and counters keyed by metric name
+    and label values. Each worker process keeps its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # name -> (kind, help, buckets, {labels: Histogram | float})
+
+    def register(self, name, kind, help, buckets=None):
+        self._metrics.setdefault(name, (kind, help, buckets, {}))
+
+    def observe(self, name, labels, value):
+        _, _, buckets, series = self._metrics[name]
+        with self._lock:
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, labels, amount=1):
+        series = self._metrics[name][3]
+        with self._lock:
+            series[labels] = series.get(labels, 0) + amount
+
+    def clear(self):
+        with self._lock:
+            for _, _, _, series in self._metrics.values():
+                series.clear()
+
+    def render(self):
+        """The registry in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, (kind, help, _, series) in self._metrics.items():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series.items()):
+                    if kind == "counter":
+                        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip((*value.buckets, "+Inf"), value.counts):
+                        cumulative += count
+                        le = bound if bound == "+Inf" else format_value(bound)
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {format_value(value.sum)}")
+                    lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value):
+    return repr(float(value))
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+metrics = MetricsRegistry()
+metrics.register(
+    "graphql_request_duration_seconds", "histogram",
+    "Time to answer a GraphQL request, from parsing to the executed result.", DEFAULT_BUCKETS,
+)
+metrics.register(
+    "graphql_phase_duration_seconds", "histogram",
+    "Time spent per request phase (parse_validate, cost, execute).", DEFAULT_BUCKETS,
+)
+metrics.register(
+    "graphql_request_sql_queries", "histogram", "SQL statements run per GraphQL request.", QUERY_COUNT_BUCKETS,
+)
+metrics.register(
+    "graphql_resolver_duration_seconds", "histogram",
+    "Wall time of non-trivial field resolvers, by Type.field.", DEFAULT_BUCKETS,
+)
+metrics.register(
+    "graphql_resolver_sql_queries_total", "counter",
+    "SQL statements attributed to the field whose resolver ran them, by Type.field.",
+)
+metrics.register(
+    "graphql_resolver_sql_duration_seconds_total", "counter",
+    "Time in SQL statements attributed to each Type.field.",
+)
+
+OPERATION_FIELD = "(operation)"
+
+
+class FieldStats:
+    __slots__ = ("calls", "duration", "sql_count", "sql_duration")
+
+    def __init__(self):
+        self.calls = self.sql_count = 0
+        self.duration = self.sql_duration = 0.0
+
+
+class RequestTrace:
+    """
+    Timings of one GraphQL request. Always aggregated into ``metrics``;
+    with ``detailed`` it also keeps per-path figures for the response's
+    ``extensions``.
+    """
+
+    def __init__(self, detailed=False):
+        self.detailed = detailed
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.fields = {}  # Type.field -> FieldStats
+        self.paths = {}  # response path without list indices -> FieldStats
+        self.sql_count = 0
+        self.sql_duration = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def stats(self, table, key):
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = FieldStats()
+        return stats
+
+    def record_resolver(self, field, path, duration):
+        metrics.observe("graphql_resolver_duration_seconds", (("field", field),), duration)
+        if self.detailed:
+            with self._lock:
+                stats = self.stats(self.paths, path)
+                stats.calls += 1
+                stats.duration += duration
+
+    def record_sql(self, running, duration):
+        field, path = running or (OPERATION_FIELD, OPERATION_FIELD)
+        # SQL may run on pool threads while the event loop resolves
+        # other fields, hence the lock.
+        with self._lock:
+            self.sql_count += 1
+            self.sql_duration += duration
+            targets = [self.stats(self.fields, field)]
+            if self.detailed:
+                targets.append(self.stats(self.paths, path))
+            for stats in targets:
+                stats.sql_count += 1
+                stats.sql_duration += duration
+
+    def finish(self, operation_type):
+        """Feeds the request's totals into ``metrics``; returns the elapsed seconds."""
+        elapsed = time.perf_counter() - self.started
+        metrics.observe("graphql_request_duration_seconds", (("operation_type", operation_type),), elapsed)
+        metrics.observe("graphql_request_sql_queries", (("operation_type", operation_type),), self.sql_count)
+        for name, duration in self.phases.items():
+            metrics.observe("graphql_phase_duration_seconds", (("phase", name),), duration)
+        for field, stats in self.fields.items():
+            metrics.increment("graphql_resolver_sql_queries_total", (("field", field),), stats.sql_count)
+            metrics.increment("graphql_resolver_sql_duration_seconds_total", (("field", field),), stats.sql_duration)
+        return elapsed
+
+    def extension(self, elapsed):
+        # A resolver's duration includes the SQL it ran; SQL outside any
+        # resolver has only the latter.
+        resolvers = sorted(
+            self.paths.items(), key=lambda item: max(item[1].duration, item[1].sql_duration), reverse=True
+        )
+        return {
+            "duration_ms": milliseconds(elapsed),
+            "phases_ms": {name: milliseconds(duration) for name, duration in self.phases.items()},
+            "sql": {"count": self.sql_count, "duration_ms": milliseconds(self.sql_duration)},
+            "resolvers": [
+                {
+                    "path": path,
+                    "calls": stats.calls,
+                    "duration_ms": milliseconds(stats.duration),
+                    "sql_count": stats.sql_count,
+                    "sql_duration_ms": milliseconds(stats.sql_duration),
+                }
+                for path, stats in resolvers
+            ],
+        }
+
+
+@contextmanager
+def traced_phase(name):
+    """Times a request phase when a trace is active."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.phase(name):
+        yield
+
+
+class InstrumentationMiddleware:
+    """
+    Graphene middleware timing every non-trivial resolver of a traced
+    request and marking it as the running field, so ``sql_observer`` can
+    attribute the queries it runs. Batched loaders run their query while
+    resolving the field that dispatched the batch, so it gets the queries.
+    """
+
+    def __init__(self):
+        self._trivial = {}
+
+    def is_trivial(self, info):
+        key = (info.parent_type.name, info.field_name)
+        trivial = self._trivial.get(key)
+        if trivial is None:
+            resolve = info.parent_type.fields[info.field_name].resolve
+            trivial = self._trivial[key] = (
+                info.parent_type.name.startswith("__")
+                or resolve is None
+                or (isinstance(resolve, partial) and resolve.func in TRIVIAL_RESOLVERS)
+            )
+        return trivial
+
+    def resolve(self, next, root, info, **args):
+        trace = current_trace.get()
+        if trace is None or self.is_trivial(info):
+            return next(root, info, **args)
+
+        field = f"{info.parent_type.name}.{info.field_name}"
+        path = ".".join(str(key) for key in info.path.as_list() if isinstance(key, str)) if trace.detailed else None
+        token = current_field.set((field, path))
+        started = time.perf_counter()
+        try:
+            result = next(root, info, **args)
+        finally:
+            current_field.reset(token)
+        if inspect.isawaitable(result):
+            return self.await_result(result, trace, field, path, started)
+        trace.record_resolver(field, path, time.perf_counter() - started)
+        return result
+
+    async def await_result(self, result, trace, field, path, started):
+        token = current_field.set((field, path))
+        try:
+            return await result
+        finally:
+            current_field.reset(token)
+            trace.record_resolver(field, path, time.perf_counter() - started)
+
+
+def sql_observer(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting and timing SQL for the current
+    trace. The time covers executing the statement; rows fetched lazily
+    afterwards count towards the resolver, not the SQL.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace.record_sql(current_field.get(), time.perf_counter() - started)
+
+
+def install_sql_observer(sender=None, connection=None, **kwargs):
+    """
+    Adds ``sql_observer`` to ``connection`` (or to every connection open in
+    this thread). Connected to ``connection_created`` so pool threads'
+    connections get it too.
+    """
+    for conn in [connection] if connection is not None else connections.all(initialized_only=True):
+        if sql_observer not in conn.execute_wrappers:
+            conn.execute_wrappers.append(sql_observer)
+
+
+connection_created.connect(install_sql_observer, dispatch_uid="graphql_sql_observer")
@@ -14,14 +14,23 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
+from crm.views import export
 from .schema import schema
+from .views import AsyncGraphQLView, CachedGraphQLView, document_cache_stats, metrics_view
+
+GraphQLViewClass = AsyncGraphQLView if settings.GRAPHQL_ASYNC_VIEW else CachedGraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True,
-                                                    schema=schema))),
+    path("graphql/", csrf_exempt(GraphQLViewClass.as_view(graphiql=True,
+                                                         schema=schema))),
+    path("graphql/async/", csrf_exempt(AsyncGraphQLView.as_view(graphiql=True,
+                                                                schema=schema))),
+    path("graphql/cache-stats/", document_cache_stats),
+    path("metrics", metrics_view),
+    path("export/<str:kind>/", export),
 ]
@@ -0,0 +1,376 @@
+import inspect
+import json
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse
+from django.http.response import HttpResponseBadRequest
+from django.utils.crypto import constant_time_compare
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, parse, validate_schema
+from graphql.error import GraphQLError
+from graphql.validation import validate
+
+from crm.utils import run_sync
+from .cost import check_query_cost
+from .db_routing import RoutingState, current_routing, routed, use_replica_for_reads
+from .document_cache import CachedDocument, DocumentCache, query_hash
+from .instrumentation import (
+    InstrumentationMiddleware, RequestTrace, current_trace, install_sql_observer, metrics, traced_phase,
+)
+
+cache_settings = getattr(settings, "GRAPHQL_DOCUMENT_CACHE", {})
+document_cache = DocumentCache(
+    max_size=cache_settings.get("MAX_SIZE", 1000),
+    ttl=cache_settings.get("TTL"),
+)
+
+instrumentation_middleware = InstrumentationMiddleware()
+# Connections opened before this module was imported miss connection_created.
+install_sql_observer()
+
+
+def instrumentation_settings():
+    return getattr(settings, "GRAPHQL_INSTRUMENTATION", {})
+
+
+class CachedGraphQLView(GraphQLView):
+    """
+    GraphQLView that reuses parsed and validated documents across requests,
+    supports Automatic Persisted Queries and rejects operations over the
+    GRAPHQL_QUERY_LIMITS budget before any resolver runs.
+
+    A client may send ``extensions.persistedQuery.sha256Hash`` instead of
+    the query body. Unknown hashes get a ``PERSISTED_QUERY_NOT_FOUND``
+    error, and the client then retries once with both the hash and the
+    query, which registers it.
+
+    Query operations read from the read replica when one is configured
+    and fresh (see ``db_routing``).
+
+    Every request is timed into the ``/metrics`` histograms. A request
+    carrying the GRAPHQL_INSTRUMENTATION debug header also gets its
+    phase, per-resolver and SQL timings in ``extensions.instrumentation``.
+    """
+
+    document_cache = document_cache
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        state = RoutingState()
+        token = current_routing.set(state)
+        try:
+            result = self.traced_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+        finally:
+            current_routing.reset(token)
+        if inspect.isawaitable(result):
+            return routed(state, result)
+        return result
+
+    def traced_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        if not instrumentation_settings().get("ENABLED", True):
+            return self.run_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+
+        trace = RequestTrace(detailed=self.debug_requested(request))
+        token = current_trace.set(trace)
+        try:
+            result = self.run_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+        finally:
+            current_trace.reset(token)
+        if inspect.isawaitable(result):
+            return self.finish_trace_async(request, trace, result)
+        self.finish_trace(request, trace)
+        return result
+
+    async def finish_trace_async(self, request, trace, result):
+        # The execution coroutine runs here, so the trace must be current.
+        token = current_trace.set(trace)
+        try:
+            with trace.phase("execute"):
+                result = await result
+        finally:
+            current_trace.reset(token)
+        self.finish_trace(request, trace)
+        return result
+
+    def finish_trace(self, request, trace):
+        elapsed = trace.finish(getattr(request, "graphql_operation_type", "unknown"))
+        if trace.detailed:
+            self.add_extension(request, "instrumentation", trace.extension(elapsed))
+
+    def debug_requested(self, request):
+        """
+        Whether the request asked for its timings. With a DEBUG_TOKEN set
+        the header must carry it; otherwise any value works, in DEBUG only.
+        """
+        options = instrumentation_settings()
+        value = request.headers.get(options.get("DEBUG_HEADER", "X-GraphQL-Debug"))
+        if not value:
+            return False
+        token = options.get("DEBUG_TOKEN")
+        if token:
+            return constant_time_compare(value, token)
+        return settings.DEBUG
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        if not instrumentation_settings().get("ENABLED", True):
+            return middleware
+        return [*(middleware or ()), instrumentation_middleware]
+
+    def run_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        try:
+            query = self.resolve_persisted_query(request, data, query)
+        except GraphQLError as e:
+            return ExecutionResult(data=None, errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            with traced_phase("parse_validate"):
+                cached = self.get_document(request, query)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        document = cached.document
+        operation_ast = get_operation_ast(document, operation_name)
+        if operation_ast is not None:
+            request.graphql_operation_type = operation_ast.operation.value
+            if operation_ast.operation == OperationType.QUERY:
+                use_replica_for_reads()
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        if cached.errors:
+            return ExecutionResult(data=None, errors=cached.errors)
+
+        with traced_phase("cost"):
+            cost, cost_errors = check_query_cost(
+                schema, document, operation_name, variables,
+                getattr(settings, "GRAPHQL_QUERY_LIMITS", {}),
+            )
+        self.add_extension(request, "cost", cost._asdict())
+        if cost_errors:
+            return ExecutionResult(data=None, errors=cost_errors)
+
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic(), traced_phase("execute"):
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            with traced_phase("execute"):
+                return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    @staticmethod
+    def add_extension(request, key, value):
+        """Adds ``key`` to the ``extensions`` object of this request's response."""
+        if not hasattr(request, "graphql_extensions"):
+            request.graphql_extensions = {}
+        request.graphql_extensions[key] = value
+
+    def json_encode(self, request, d, pretty=False):
+        extensions = getattr(request, "graphql_extensions", None)
+        if extensions and isinstance(d, dict):
+            d = {**d, "extensions": extensions}
+        return super().json_encode(request, d, pretty)
+
+    def cached_document(self, request, key):
+        """
+        ``document_cache.get(key)``, asked of the cache once per request so
+        its hit and miss counts stay per request: the persisted query
+        lookup and the async view's planning see the same answer.
+        """
+        if not hasattr(request, "graphql_documents"):
+            request.graphql_documents = {}
+        if key not in request.graphql_documents:
+            request.graphql_documents[key] = self.document_cache.get(key)
+        return request.graphql_documents[key]
+
+    def get_document(self, request, query):
+        """Returns the parsed document and its validation errors, cached by hash."""
+        key = query_hash(query)
+        cached = self.cached_document(request, key)
+        if cached is None:
+            document = parse(query)
+            errors = validate(
+                self.schema.graphql_schema,
+                document,
+                self.validation_rules,
+                graphene_settings.MAX_VALIDATION_ERRORS,
+            )
+            cached = CachedDocument(query, document, errors)
+            self.document_cache.set(key, cached)
+            request.graphql_documents[key] = cached
+        return cached
+
+    def resolve_persisted_query(self, request, data, query):
+        extensions = request.GET.get("extensions") or data.get("extensions") or {}
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persisted = extensions.get("persistedQuery")
+        if not persisted:
+            return query
+
+        sha256 = persisted.get("sha256Hash")
+        if query:
+            if query_hash(query) != sha256:
+                raise GraphQLError(
+                    "provided sha does not match query",
+                    extensions={"code": "PERSISTED_QUERY_HASH_MISMATCH"},
+                )
+            return query
+
+        cached = self.cached_document(request, sha256)
+        if cached is None:
+            raise GraphQLError(
+                "PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"}
+            )
+        return cached.query
+
+
+class AsyncGraphQLView(CachedGraphQLView):
+    """
+    CachedGraphQLView for ASGI. Queries execute on the event loop: the
+    connection fields and relation loaders fetch rows with Django's async
+    ORM, and the few remaining sync pieces (root resolvers, filtersets,
+    counters) run on the bounded pool from ``crm.utils.run_sync``.
+
+    Mutations, batches and GraphiQL take the sync code path, as a whole,
+    on that same pool, so transactions stay on one thread and connection.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            plan = self.async_operation(request)
+        except (HttpError, GraphQLError):
+            plan = None
+        if plan is None:
+            return await run_sync(super().dispatch, request, *args, **kwargs)
+
+        data, query, variables, operation_name = plan
+        request.crm_async = True
+        try:
+            result = self.execute_graphql_request(request, data, query, variables, operation_name)
+            if inspect.isawaitable(result):
+                result = await result
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+        response, status_code = {}, 200
+        if result.errors:
+            response["errors"] = [self.format_error(e) for e in result.errors]
+        if result.errors and any(not getattr(e, "path", None) for e in result.errors):
+            status_code = 400
+        else:
+            response["data"] = result.data
+        return HttpResponse(
+            status=status_code,
+            content=self.json_encode(request, response),
+            content_type="application/json",
+        )
+
+    def async_operation(self, request):
+        """
+        Returns ``(data, query, variables, operation_name)`` if the request
+        is a single query operation that can run on the event loop, else
+        None. Anything this cannot parse is left to the sync path, which
+        reports the error.
+        """
+        if request.method.lower() not in ("get", "post") or self.batch:
+            return None
+        data = self.parse_body(request)
+        if self.graphiql and self.can_display_graphiql(request, data):
+            return None
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        query = self.resolve_persisted_query(request, data, query)
+        if not query:
+            return None
+        operation_ast = get_operation_ast(self.get_document(request, query).document, operation_name)
+        if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+            return None
+        return data, query, variables, operation_name
+
+
+def metrics_allowed(request):
+    """Whether the client is in GRAPHQL_INSTRUMENTATION's METRICS_ALLOWED_IPS (None for any)."""
+    allowed = instrumentation_settings().get("METRICS_ALLOWED_IPS", ("127.0.0.1", "::1"))
+    return allowed is None or request.META.get("REMOTE_ADDR") in allowed
+
+
+def document_cache_stats(request):
+    """Document cache size and hit counts, for the clients that may scrape ``/metrics``."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return JsonResponse(document_cache.stats())
+
+
+def metrics_view(request):
+    """
+    GraphQL request, phase, resolver and SQL histograms in Prometheus text
+    format. Only clients in GRAPHQL_INSTRUMENTATION's METRICS_ALLOWED_IPS
+    (None for any) may scrape it.
+    """
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
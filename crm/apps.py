@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_indexes_after_migrate(sender, using, **kwargs):
+    from .search import ensure_search_indexes
+    ensure_search_indexes(connections[using])
 
 
 class CrmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'crm'
+
+    def ready(self):
+        post_migrate.connect(ensure_search_indexes_after_migrate, sender=self)
@@ -0,0 +1,197 @@
+"""
+The canonical GraphQL operations ``manage.py benchmark_graphql`` times,
+and the measuring and comparison it reports with.
+"""
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from itertools import count
+
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from .models import Customer, Product
+from .result_cache import get_cache
+
+# Seeded with seed_db --seed BENCHMARK_SEED --end BENCHMARK_END.
+Tier = namedtuple("Tier", "customers products orders")
+TIERS = {
+    "1k": Tier(200, 50, 1000),
+    "100k": Tier(20000, 2000, 100000),
+    "1m": Tier(100000, 5000, 1000000),
+}
+BENCHMARK_SEED = 2024
+BENCHMARK_END = "2026-01-01"
+
+Operation = namedtuple("Operation", "name document variables mutation")
+
+ORDERS_FILTERED = """
+query ($since: Date, $minTotal: Decimal) {
+  totalOrders
+  totalRevenue
+  allOrders(first: 50, orderDate_Gte: $since, totalAmount_Gte: $minTotal) {
+    edges { node { id orderDate totalAmount customer { name email } products { edges { node { name price } } } } }
+  }
+}
+"""
+
+CUSTOMERS_SEARCH = """
+query ($search: String) {
+  allCustomers(search: $search, first: 50) { edges { node { id name email phone createdAt } } }
+}
+"""
+
+PRODUCTS_RANGE = """
+query ($min: Decimal, $max: Decimal) {
+  allProducts(price_Gte: $min, price_Lte: $max, first: 50, orderBy: ["price"]) {
+    edges { node { id name price stock } }
+  }
+}
+"""
+
+CREATE_CUSTOMER = """
+mutation ($input: CustomerInput!) {
+  createCustomer(input: $input) { success message customer { id } }
+}
+"""
+
+BULK_CREATE_CUSTOMERS = """
+mutation ($input: [CustomerInput]!) {
+  bulkCreateCustomers(input: $input) { customers { id } errors }
+}
+"""
+
+CREATE_PRODUCT = """
+mutation ($input: CreateProductInput!) {
+  createProduct(input: $input) { success message product { id } }
+}
+"""
+
+CREATE_ORDER = """
+mutation ($input: CreateOrderInput!) {
+  createOrder(input: $input) { message errors order { id totalAmount } }
+}
+"""
+
+UPDATE_LOW_STOCK = """
+mutation {
+  updateLowStockProducts(threshold: 10) { success message updatedProducts { id stock } }
+}
+"""
+
+
+def operations():
+    """
+    Returns the benchmark operations. Variables are callables taking the
+    iteration number, so each mutation run gets unique input.
+    """
+    customer = Customer.objects.order_by("pk").values_list("pk", flat=True).first()
+    # Orders reserve stock, so order products that have some.
+    products = list(Product.objects.filter(stock__gte=10).order_by("pk").values_list("pk", flat=True)[:3])
+
+    def new_customer(n, i=0):
+        return {"name": "Bench Customer", "email": f"bench-{n}-{i}@example.com", "phone": "+15550000000"}
+
+    return [
+        Operation("all_orders_filtered", ORDERS_FILTERED,
+                  lambda n: {"since": "2025-07-01", "minTotal": "50"}, False),
+        Operation("all_customers_search", CUSTOMERS_SEARCH, lambda n: {"search": "smith"}, False),
+        Operation("all_products_price_range", PRODUCTS_RANGE, lambda n: {"min": "20", "max": "80"}, False),
+        Operation("create_customer", CREATE_CUSTOMER, lambda n: {"input": new_customer(n)}, True),
+        Operation("bulk_create_customers", BULK_CREATE_CUSTOMERS,
+                  lambda n: {"input": [new_customer(n, i) for i in range(100)]}, True),
+        Operation("create_product", CREATE_PRODUCT,
+                  lambda n: {"input": {"name": f"Bench Product {n}", "price": 19.99, "stock": 5}}, True),
+        Operation("create_order", CREATE_ORDER,
+                  lambda n: {"input": {"customerId": str(customer), "productIds": [str(p) for p in products]}},
+                  True),
+        Operation("update_low_stock_products", UPDATE_LOW_STOCK, lambda n: {}, True),
+    ]
+
+
+def execute(schema, operation, iteration):
+    """
+    Runs ``operation`` once with a fresh request context and a cold result
+    cache. Mutations are rolled back, so every run sees the same dataset.
+    """
+    cache = get_cache()
+    if cache is not None:
+        cache.clear()
+    context = RequestFactory().post("/graphql/")
+    with transaction.atomic():
+        result = schema.execute(
+            operation.document, variable_values=operation.variables(iteration), context_value=context
+        )
+        if operation.mutation:
+            transaction.set_rollback(True)
+    if result.errors:
+        raise RuntimeError(f"{operation.name} failed: {result.errors[0]}")
+    return result
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, -(-len(ordered) * p // 100) - 1))]
+
+
+def measure(schema, operation, iterations=20, warmup=2):
+    """
+    Times ``iterations`` runs of ``operation`` after ``warmup`` untimed
+    ones. Query count and peak Python memory come from two further runs,
+    so their instrumentation does not skew the latencies.
+    """
+    runs = count()
+    for _ in range(warmup):
+        execute(schema, operation, next(runs))
+    latencies = []
+    for _ in range(iterations):
+        iteration = next(runs)
+        started = time.perf_counter()
+        execute(schema, operation, iteration)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    with CaptureQueriesContext(connection) as queries:
+        execute(schema, operation, next(runs))
+    # Transaction control statements are not the operation's queries.
+    query_count = sum(1 for q in queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE", "ROLLBACK")))
+
+    tracemalloc.start()
+    try:
+        execute(schema, operation, next(runs))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "queries": query_count,
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def regressions(baseline, current, threshold=0.2, min_delta_ms=1.0, latency="p50_ms"):
+    """
+    Compares two results dicts (``{operation: metrics}``) and returns a
+    message per regression: ``latency`` (a percentile key) or peak memory
+    more than ``threshold`` (a fraction) above the baseline, or any extra
+    query. Latency growth under ``min_delta_ms`` is treated as noise.
+    """
+    found = []
+    for name, metrics in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if metrics["queries"] > before["queries"]:
+            found.append(f"{name}: {before['queries']} -> {metrics['queries']} queries")
+        value, base_value = metrics[latency], before[latency]
+        if value > base_value * (1 + threshold) and value - base_value >= min_delta_ms:
+            found.append(f"{name}: {latency[:-3]} {base_value:.1f} -> {value:.1f} ms")
+        memory, base_memory = metrics["peak_memory_kib"], before["peak_memory_kib"]
+        if memory > base_memory * (1 + threshold):
+            found.append(f"{name}: peak memory {base_memory:.0f} -> {memory:.0f} KiB")
+    return found
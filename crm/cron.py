@@ -1,12 +1,30 @@
 #!/usr/bin/env python3
 from datetime import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+
+from django.conf import settings
+
+from crm.executor import execute_graphql
+
+HEARTBEAT_QUERY = "{ totalCustomers }"
+
+LOW_STOCK_MUTATION = """
+mutation {
+  updateLowStockProducts {
+    success
+    message
+  }
+}
+"""
+
 
 def log_crm_heartbeat():
     """
     Logs a heartbeat message to /tmp/crm_heartbeat_log.txt
-    and optionally checks if the GraphQL endpoint responds.
+    and checks that the GraphQL schema answers.
+
+    The check runs in this process unless CRM_HEARTBEAT_URL is set, in
+    which case that endpoint is queried over HTTP to also cover the web
+    tier.
     """
     log_file = "/tmp/crm_heartbeat_log.txt"
     timestamp = datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
@@ -18,59 +36,41 @@ def log_crm_heartbeat():
     with open(log_file, "a") as f:
         f.write(message)
 
-    # Optional: Verify the GraphQL endpoint
+    url = getattr(settings, "CRM_HEARTBEAT_URL", None)
     try:
-        transport = RequestsHTTPTransport(
-            url="http://localhost:8000/graphql",
-            verify=True,
-            retries=2,
-        )
-        client = Client(transport=transport, fetch_schema_from_transport=False)
-        query = gql("{ hello }")
-        response = client.execute(query)
-        print(f"GraphQL endpoint responded: {response}")
+        response = check_endpoint(url) if url else execute_graphql(HEARTBEAT_QUERY)
+        print(f"GraphQL {'endpoint' if url else 'schema'} responded: {response}")
     except Exception as e:
         print(f"GraphQL check failed: {e}")
 
+
+def check_endpoint(url):
+    # Only the HTTP heartbeat needs gql's requests transport.
+    from gql import gql, Client
+    from gql.transport.requests import RequestsHTTPTransport
+
+    transport = RequestsHTTPTransport(url=url, verify=True, retries=2)
+    client = Client(transport=transport, fetch_schema_from_transport=False)
+    return client.execute(gql("{ __typename }"))
+
+
 def update_low_stock():
     """
-    Runs the UpdateLowStockProducts GraphQL mutation
-    and logs the updated products to /tmp/low_stock_updates_log.txt.
+    Runs the UpdateLowStockProducts GraphQL mutation in this process
+    and logs how many products it restocked to
+    /tmp/low_stock_updates_log.txt. The products are not read back, so
+    the restock is a single UPDATE however many there are.
     """
     log_file = "/tmp/low_stock_updates_log.txt"
     timestamp = datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
 
     try:
-        # Setup GraphQL client
-        transport = RequestsHTTPTransport(
-            url="http://localhost:8000/graphql",
-            verify=True,
-            retries=3,
-        )
-        client = Client(transport=transport, fetch_schema_from_transport=False)
-
-        # Define and execute the mutation
-        mutation = gql("""
-        mutation {
-          updateLowStockProducts {
-            success
-            message
-            updatedProducts {
-              name
-              stock
-            }
-          }
-        }
-        """)
-
-        result = client.execute(mutation)
-        data = result.get("updateLowStockProducts", {})
+        result = execute_graphql(LOW_STOCK_MUTATION)
+        data = result.get("updateLowStockProducts") or {}
 
         # Log results
         with open(log_file, "a") as f:
             f.write(f"[{timestamp}] {data.get('message')}\n")
-            for p in data.get("updatedProducts", []):
-                f.write(f" - {p['name']}: stock = {p['stock']}\n")
 
         print("Low-stock products updated successfully.")
 
@@ -78,4 +78,3 @@ def update_low_stock():
         with open(log_file, "a") as f:
             f.write(f"[{timestamp}] ERROR: {e}\n")
         print(f"Error running low-stock update: {e}")
-
@@ -1,48 +1,145 @@
 #!/usr/bin/env python3
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
-from datetime import datetime, timedelta
+"""
+Logs one reminder per customer with orders placed in the last week.
 
-# GraphQL endpoint
-GRAPHQL_URL = "http://localhost:8000/graphql"
+Orders are read page by page through the allOrders connection, sorted by
+customer, fetching only the order id and customer email. Each customer's
+reminder is written as soon as their last order has been read, so memory
+does not grow with the number of orders. A checkpoint file under
+CRM_STATE_DIR records up to when orders have been handled, so the next
+run only picks up newer orders.
+"""
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from itertools import groupby
 
 # Log file
 LOG_FILE = "/tmp/order_reminders_log.txt"
+# Checkpoint file name, in CRM_STATE_DIR.
+CHECKPOINT_NAME = "order_reminders_checkpoint.json"
+
+# Orders per page, the connection's maximum.
+PAGE_SIZE = 100
+# Log lines buffered per write.
+LOG_BATCH_SIZE = 500
+# How far back a run looks, whatever the checkpoint says.
+WINDOW = timedelta(days=7)
 
-# Configure the transport and client
-transport = RequestsHTTPTransport(
-    url=GRAPHQL_URL,
-    verify=True,
-    retries=3,
-)
-client = Client(transport=transport, fetch_schema_from_transport=False)
-
-# Calculate the date range (last 7 days)
-today = datetime.now()
-seven_days_ago = today - timedelta(days=7)
-
-# Define GraphQL query
-query = gql("""
-query RecentOrders($fromDate: DateTime!) {
-  allOrders(filter: { orderDate_Gte: $fromDate }) {
-    id
-    customer {
-      email
-    }
+# Sorted by customer, so each customer's orders arrive together.
+RECENT_ORDERS = """
+query RecentOrders($after: DateTime, $until: DateTime, $first: Int, $cursor: String) {
+  allOrders(
+    placedAfter: $after, placedBefore: $until, orderBy: ["customer", "order_date"],
+    first: $first, after: $cursor
+  ) {
+    pageInfo { hasNextPage endCursor }
+    edges { node { id customer { email } } }
   }
 }
-""")
+"""
+
+
+def order_pages(execute, after, until, page_size=PAGE_SIZE):
+    """
+    Yields each page of the orders placed after ``after`` and up to
+    ``until`` (aware datetimes), as lists of ``{id, customer: {email}}``.
+    """
+    cursor = None
+    while True:
+        result = execute(RECENT_ORDERS, {
+            "after": after.isoformat(), "until": until.isoformat(), "first": page_size, "cursor": cursor,
+        })
+        connection = result["allOrders"]
+        orders = [edge["node"] for edge in connection["edges"]]
+        if orders:
+            yield orders
+        if not connection["pageInfo"]["hasNextPage"]:
+            return
+        cursor = connection["pageInfo"]["endCursor"]
+
+
+def customer_reminders(pages):
+    """
+    Yields ``(email, order_ids)`` per customer. The pages are sorted by
+    customer, so a customer's group is complete once the next one starts.
+    """
+    orders = (order for page in pages for order in page)
+    for email, group in groupby(orders, key=lambda order: order["customer"]["email"]):
+        yield email, [order["id"] for order in group]
+
+
+def write_reminders(reminders, timestamp, log_file=LOG_FILE, batch_size=LOG_BATCH_SIZE):
+    """
+    Appends one line per ``(email, order_ids)`` reminder, written in
+    batches of ``batch_size``. Returns the number of reminders.
+    """
+    buffer, count = [], 0
+    with open(log_file, "a") as log:
+        for email, order_ids in reminders:
+            buffer.append(f"[{timestamp}] Reminder for {email}: {len(order_ids)} order(s) {', '.join(order_ids)}\n")
+            count += 1
+            if len(buffer) >= batch_size:
+                log.writelines(buffer)
+                buffer.clear()
+        log.writelines(buffer)
+    return count
+
+
+def default_checkpoint_file():
+    from django.conf import settings
+
+    os.makedirs(settings.CRM_STATE_DIR, exist_ok=True)
+    return os.path.join(settings.CRM_STATE_DIR, CHECKPOINT_NAME)
+
+
+def load_checkpoint(path):
+    """The time orders were last handled up to, or None."""
+    try:
+        with open(path) as f:
+            return datetime.fromisoformat(json.load(f)["until"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_checkpoint(until, path):
+    # Written aside and renamed, so a crash never leaves half a file.
+    with open(path + ".tmp", "w") as f:
+        json.dump({"until": until.isoformat(), "saved": datetime.now().isoformat(timespec="seconds")}, f)
+    os.replace(path + ".tmp", path)
+
+
+def send_order_reminders(execute, now=None, log_file=LOG_FILE, checkpoint_file=None):
+    """
+    Logs reminders for orders placed after the checkpoint within the last
+    week, then moves the checkpoint to ``now``. Returns the number of
+    customers reminded.
+    """
+    from django.utils import timezone
+
+    now = now or timezone.now()
+    checkpoint_file = checkpoint_file or default_checkpoint_file()
+    after = max(filter(None, [now - WINDOW, load_checkpoint(checkpoint_file)]))
+    reminders = customer_reminders(order_pages(execute, after, now))
+    count = write_reminders(reminders, timezone.localtime(now).strftime("%Y-%m-%d %H:%M:%S"), log_file)
+    # Only once the reminders are logged, so a failed run is retried.
+    save_checkpoint(now, checkpoint_file)
+    return count
+
+
+def main():
+    # Run from cron as a plain script: make the project importable first.
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql.settings")
+    import django
+    django.setup()
 
-# Execute the query
-result = client.execute(query, variable_values={"fromDate": seven_days_ago.isoformat()})
+    from crm.executor import execute_graphql
 
-# Extract and log the results
-orders = result.get("allOrders", [])
+    customers = send_order_reminders(execute_graphql)
+    print(f"Order reminders processed for {customers} customers!")
 
-with open(LOG_FILE, "a") as log:
-    for order in orders:
-        order_id = order.get("id")
-        email = order.get("customer", {}).get("email")
-        log.write(f"[{today.strftime('%Y-%m-%d %H:%M:%S')}] Order ID: {order_id}, Email: {email}\n")
 
-print("Order reminders processed!")
+if __name__ == "__main__":
+    main()
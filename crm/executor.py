@@ -0,0 +1,35 @@
+"""
+Runs GraphQL documents against the project schema inside the current
+process (a cron job, a Celery worker, a management command), with no
+HTTP round trip through the web tier.
+"""
+from types import SimpleNamespace
+
+
+class GraphQLExecutionError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(str(error) for error in errors))
+
+
+def execute_graphql(document, variables=None, operation_name=None):
+    """
+    Executes ``document`` against ``alx_backend_graphql.schema.schema`` and
+    returns its ``data``. Raises GraphQLExecutionError if any error was
+    reported, so jobs cannot mistake a partial result for success.
+    """
+    # Imported here: the project schema imports crm.schema, which needs
+    # the app registry to be ready.
+    from alx_backend_graphql.schema import schema
+
+    result = schema.execute(
+        document,
+        variable_values=variables,
+        operation_name=operation_name,
+        # A per-execution context, so DataLoaders batch within the
+        # operation just as they do per request.
+        context_value=SimpleNamespace(),
+    )
+    if result.errors:
+        raise GraphQLExecutionError(result.errors)
+    return result.data
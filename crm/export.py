@@ -0,0 +1,107 @@
+import csv
+import json
+from itertools import groupby
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from .filters import CustomerFilter, OrderFilter, ProductFilter
+from .models import Customer, Order, Product
+
+FORMATS = ("ndjson", "csv")
+
+# (output column, ORM lookup). Every export is one values_list() query,
+# so related fields are joined in SQL rather than fetched per row.
+CUSTOMER_COLUMNS = [
+    ("id", "id"), ("name", "name"), ("email", "email"), ("phone", "phone"), ("created_at", "created_at"),
+]
+PRODUCT_COLUMNS = [("id", "id"), ("name", "name"), ("price", "price"), ("stock", "stock")]
+ORDER_COLUMNS = [
+    ("id", "id"),
+    ("order_date", "order_date"),
+    ("total_amount", "total_amount"),
+    ("customer_id", "customer_id"),
+    ("customer_name", "customer__name"),
+    ("customer_email", "customer__email"),
+]
+ITEM_COLUMNS = [
+    ("product_id", "order_items__product_id"),
+    ("product_name", "order_items__product__name"),
+    ("quantity", "order_items__quantity"),
+    ("unit_price", "order_items__unit_price"),
+]
+
+EXPORTS = {
+    "customers": (Customer, CustomerFilter, CUSTOMER_COLUMNS, ("created_at", "id")),
+    "products": (Product, ProductFilter, PRODUCT_COLUMNS, ("name", "id")),
+    "orders": (Order, OrderFilter, ORDER_COLUMNS + ITEM_COLUMNS, ("order_date", "id")),
+}
+
+
+def export_queryset(kind, filters=None):
+    """
+    Returns the rows of ``kind`` matching ``filters`` (the arguments of
+    its FilterSet, e.g. OrderFilter's ``customer_name`` or
+    ``order_date__gte``). Raises ValidationError for unknown kinds or
+    invalid filter values.
+    """
+    if kind not in EXPORTS:
+        raise ValidationError(f"Unknown export '{kind}'; expected one of {', '.join(EXPORTS)}.")
+    model, filterset_class, columns, ordering = EXPORTS[kind]
+    filterset = filterset_class(data=filters or {}, queryset=model.objects.all())
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors.as_json())
+    queryset = filterset.qs
+    if len(queryset.query.alias_map) > 1:
+        # A filter joined a related table; select on the primary keys so the
+        # item join below still returns every item of each matching order.
+        queryset = model.objects.filter(pk__in=queryset.values("pk"))
+    # Sorted on a (column, id) index, so rows stream without a sort step and
+    # the item rows of an order arrive together.
+    return queryset.order_by(*ordering).values_list(*(lookup for _, lookup in columns))
+
+
+def export_lines(kind, queryset, format="ndjson", chunk_size=2000):
+    """
+    Yields the export as text lines. Rows are read with
+    ``iterator(chunk_size)``, so memory use does not grow with the export.
+    NDJSON orders nest their items; CSV orders have one row per item.
+    """
+    columns = [name for name, _ in EXPORTS[kind][2]]
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if format == "csv":
+        yield from csv_lines(columns, rows)
+    elif kind == "orders":
+        yield from order_ndjson_lines(rows)
+    else:
+        for row in rows:
+            yield ndjson_line(dict(zip(columns, row)))
+
+
+def ndjson_line(record):
+    return json.dumps(record, cls=DjangoJSONEncoder, separators=(",", ":")) + "\n"
+
+
+def order_ndjson_lines(rows):
+    order_width = len(ORDER_COLUMNS)
+    order_names = [name for name, _ in ORDER_COLUMNS]
+    item_names = [name for name, _ in ITEM_COLUMNS]
+    for order, group in groupby(rows, key=lambda row: row[:order_width]):
+        record = dict(zip(order_names, order))
+        record["items"] = [
+            dict(zip(item_names, row[order_width:])) for row in group if row[order_width] is not None
+        ]
+        yield ndjson_line(record)
+
+
+class LineBuffer:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
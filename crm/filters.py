@@ -1,18 +1,49 @@
+from datetime import datetime, time, timedelta
+
 import django_filters
-from .models import Customer, Product, Order
+from django.utils import timezone
+
+from .models import Customer, Product, Order, OrderItem
+from .search import filter_contains
+
+
+class ContainsFilterMixin:
+    """Substring filters backed by the FTS index (see crm.search)."""
+
+    def filter_contains(self, queryset, name, value):
+        if value:
+            return filter_contains(queryset, value, [name])
+        return queryset
+
+class DayFilter(django_filters.DateFilter):
+    """
+    Date filter for a DateTimeField. The date stands for the whole day in
+    the current time zone, so ``lte`` includes that day, and the database
+    compares aware datetimes instead of warning about naive midnights.
+    """
+
+    def filter(self, qs, value):
+        if value is None:
+            return qs
+        start = timezone.make_aware(datetime.combine(value, time.min))
+        if self.lookup_expr == "lte":
+            return qs.filter(**{f"{self.field_name}__lt": start + timedelta(days=1)})
+        return super().filter(qs, start)
 
-class CustomerFilter(django_filters.FilterSet):
+class CustomerFilter(ContainsFilterMixin, django_filters.FilterSet):
     
-    name = django_filters.CharFilter(lookup_expr='icontains')
-    email = django_filters.CharFilter(lookup_expr='icontains')
-    created_at__gte = django_filters.DateFilter(field_name='created_at', lookup_expr='gte')
-    created_at__lte = django_filters.DateFilter(field_name='created_at', lookup_expr='lte')
+    name = django_filters.CharFilter(method='filter_contains')
+    email = django_filters.CharFilter(method='filter_contains')
+    created_at__gte = DayFilter(field_name='created_at', lookup_expr='gte')
+    created_at__lte = DayFilter(field_name='created_at', lookup_expr='lte')
     phone_starts_with = django_filters.CharFilter(method='filter_phone_starts_with')
     
     def filter_phone_starts_with(self, queryset, name, value):
         """Custom filter for phone numbers starting with a specific prefix (e.g., +1)."""
         if value:
-            return queryset.filter(phone__startswith=value)
+            # A half-open range instead of LIKE 'x%' so the phone index is used.
+            upper = value[:-1] + chr(ord(value[-1]) + 1)
+            return queryset.filter(phone__gte=value, phone__lt=upper)
         return queryset
 
     class Meta:
@@ -24,16 +55,16 @@ class CustomerFilter(django_filters.FilterSet):
             'created_at__lte'
         ]
 
-class ProductFilter(django_filters.FilterSet):
+class ProductFilter(ContainsFilterMixin, django_filters.FilterSet):
     
-    name = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = django_filters.CharFilter(field_name='name', method='filter_contains')
     price__gte = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     price__lte = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
     stock__gte = django_filters.NumberFilter(field_name='stock', lookup_expr='gte')
     stock__lte = django_filters.NumberFilter(field_name='stock', lookup_expr='lte')
-    low_stock = django_filters.NumberFilter(method='low_stock')
+    low_stock = django_filters.NumberFilter(method='filter_low_stock')
     
-    def low_stock(self, queryset, name, value):
+    def filter_low_stock(self, queryset, name, value):
         if value:
             return queryset.filter(stock__lt=value)
         return queryset
@@ -50,13 +81,16 @@ class ProductFilter(django_filters.FilterSet):
 
 class OrderFilter(django_filters.FilterSet):
     
-    total_amount__gte = django_filters.NumberFilter(method='filter_total_amount_gte')
-    total_amount__lte = django_filters.NumberFilter(method='filter_total_amount_lte')
-    order_date__gte = django_filters.DateFilter(field_name='order_date', lookup_expr='gte')
-    order_date__lte = django_filters.DateFilter(field_name='order_date', lookup_expr='lte')
-    customer_name = django_filters.CharFilter(field_name='customer__name', lookup_expr='icontains')
-    product_name = django_filters.CharFilter(field_name='products__name', lookup_expr='icontains')
-    product_id = django_filters.NumberFilter(method='filter_by_product_id')
+    total_amount__gte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='gte')
+    total_amount__lte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='lte')
+    order_date__gte = DayFilter(field_name='order_date', lookup_expr='gte')
+    order_date__lte = DayFilter(field_name='order_date', lookup_expr='lte')
+    # Exact bounds, for jobs walking orders from a point in time.
+    placed_after = django_filters.IsoDateTimeFilter(field_name='order_date', lookup_expr='gt')
+    placed_before = django_filters.IsoDateTimeFilter(field_name='order_date', lookup_expr='lte')
+    customer_name = django_filters.CharFilter(method='filter_customer_name')
+    product_name = django_filters.CharFilter(method='filter_product_name')
+    product_id = django_filters.UUIDFilter(method='filter_by_product_id')
 
     class Meta:
         model = Order
@@ -67,14 +101,26 @@ class OrderFilter(django_filters.FilterSet):
             'product_name'
         ]
     
-    def filter_total_amount_gte(self, queryset, name, value):
-        ids = [order.id for order in queryset if order.total_amount >= value]
-        return queryset.filter(id__in=ids)
+    def filter_customer_name(self, queryset, name, value):
+        if value:
+            return queryset.filter(
+                customer__in=filter_contains(Customer.objects.all(), value, ['name'])
+            )
+        return queryset
+
+    def filter_product_name(self, queryset, name, value):
+        """
+        Orders containing a product whose name matches. A semi-join on the
+        order items, so orders with several matching products are not
+        repeated and no DISTINCT is needed.
+        """
+        if value:
+            products = filter_contains(Product.objects.all(), value, ['name'])
+            return queryset.filter(
+                pk__in=OrderItem.objects.filter(product__in=products).values('order_id')
+            )
+        return queryset
 
-    def filter_total_amount_lte(self, queryset, name, value):
-        ids = [order.id for order in queryset if order.total_amount <= value]
-        return queryset.filter(id__in=ids)
-    
     def filter_by_product_id(self, queryset, name, value):
         """
         Filters orders that include a specific product ID.
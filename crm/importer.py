@@ -0,0 +1,171 @@
+"""
+Reading and validation for ``manage.py import_crm``.
+
+These functions run in worker processes, so this module must not import
+the models: a spawned worker imports it before ``django.setup()`` runs.
+"""
+import csv
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .validators import customer_input_error
+
+KINDS = ("customers", "products", "orders")
+ORDER_FIELDS = ("id", "order_date", "customer_id", "customer_email")
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_records(path, kind, format=None):
+    """
+    Streams the records of an NDJSON or CSV file (the layout written by
+    ``export_crm``). CSV orders have one row per item; consecutive rows
+    with the same order ``id`` are folded into one record with ``items``.
+    """
+    format = format or ("csv" if str(path).endswith(".csv") else "ndjson")
+    with open(path, newline="", encoding="utf-8") as source:
+        if format == "csv":
+            rows = csv.DictReader(source)
+            if kind != "orders":
+                yield from rows
+                return
+            for key, group in groupby(enumerate(rows), key=lambda r: r[1].get("id") or -r[0]):
+                group = [row for _, row in group]
+                record = {name: group[0].get(name) for name in ORDER_FIELDS}
+                record["items"] = group
+                yield record
+        else:
+            for line in source:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield {"_error": f"Invalid JSON: {e}"}
+
+
+def validate_chunk(kind, start, records):
+    """
+    Validates ``records`` (numbered from ``start``). Returns
+    ``(rows, errors)``: normalized tuples ready to be written, and
+    ``(number, message)`` pairs for the records that were rejected.
+    """
+    clean = CLEANERS[kind]
+    rows, errors = [], []
+    for number, record in enumerate(records, start):
+        try:
+            if not isinstance(record, dict):
+                raise RowError("Expected an object.")
+            if "_error" in record:
+                raise RowError(record["_error"])
+            rows.append((number, *clean(record)))
+        except RowError as e:
+            errors.append((number, str(e)))
+    return rows, errors
+
+
+def clean_customer(record):
+    name, email, phone = text(record, "name"), text(record, "email"), text(record, "phone") or None
+    if not name:
+        raise RowError("name is required.")
+    error = customer_input_error(email, phone)
+    if error:
+        raise RowError(error)
+    return uuid_value(record, "id"), name, email, phone, datetime_value(record, "created_at")
+
+
+def clean_product(record):
+    name = text(record, "name")
+    if not name:
+        raise RowError("name is required.")
+    price = decimal_value(record, "price")
+    if price is None:
+        raise RowError("price is required.")
+    if price < 0:
+        raise RowError("Price must be positive")
+    stock = int_value(record, "stock", 0)
+    if stock < 0:
+        raise RowError("Stock must be positive")
+    return uuid_value(record, "id"), name, price, stock
+
+
+def clean_order(record):
+    customer_id, customer_email = uuid_value(record, "customer_id"), text(record, "customer_email")
+    if not customer_id and not customer_email:
+        raise RowError("customer_id or customer_email is required.")
+    items = []
+    for item in record.get("items") or ():
+        product_id, product_name = uuid_value(item, "product_id"), text(item, "product_name")
+        if not product_id and not product_name:
+            raise RowError("Every item needs a product_id or product_name.")
+        quantity = int_value(item, "quantity", 1)
+        if quantity < 1:
+            raise RowError("quantity must be at least 1.")
+        unit_price = decimal_value(item, "unit_price")
+        if unit_price is not None and unit_price < 0:
+            raise RowError("unit_price must not be negative.")
+        items.append((product_id, product_name, quantity, unit_price))
+    if not items:
+        raise RowError("At least one product must be selected.")
+    return (uuid_value(record, "id"), customer_id, customer_email,
+            datetime_value(record, "order_date"), tuple(items))
+
+
+CLEANERS = {"customers": clean_customer, "products": clean_product, "orders": clean_order}
+
+
+def text(record, name):
+    value = record.get(name)
+    return str(value).strip() if value not in (None, "") else ""
+
+
+def uuid_value(record, name):
+    value = text(record, name)
+    if not value:
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise RowError(f"{name} is not a valid UUID.")
+
+
+def decimal_value(record, name):
+    value = text(record, name)
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise RowError(f"{name} is not a number.")
+    # NaN and Infinity parse, but cannot be compared or stored.
+    if not number.is_finite():
+        raise RowError(f"{name} is not a number.")
+    return number
+
+
+def int_value(record, name, default):
+    value = text(record, name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f"{name} is not an integer.")
+
+
+def datetime_value(record, name):
+    value = text(record, name)
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError(f"{name} is not an ISO 8601 datetime.")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
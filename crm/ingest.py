@@ -0,0 +1,179 @@
+"""
+Write-behind order ingestion for bursts of orders.
+
+``enqueue_orders`` puts validated orders on a queue on the Celery broker
+and returns one ticket per order. ``drain_order_queue`` (a Celery task)
+takes them off in micro-batches and commits each batch in one
+transaction with bulk inserts, recording every order's outcome as an
+OrderTicket alongside it. On SQLite, where each commit is an fsync, that
+turns hundreds of commits into one.
+"""
+import uuid
+from queue import Empty
+
+from celery import shared_task
+from kombu import pools
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .celery import app
+from .models import Customer, Order, OrderItem, OrderTicket, Product
+from .result_cache import invalidate
+from .services import InsufficientStock, increment_counters, reserve_stock
+
+DRAIN_SCHEDULED_KEY = "crm:ingest:drain-scheduled"
+
+
+def ingest_settings():
+    options = {"QUEUE": "crm.order_ingest", "BATCH_SIZE": 500, "DRAIN_DELAY": 0.2, "BROKER_URL": None}
+    options.update(getattr(settings, "CRM_ORDER_INGEST", {}))
+    return options
+
+
+def broker_pool():
+    """Connection pool for the ingest queue: BROKER_URL's, or else the Celery app's."""
+    url = ingest_settings()["BROKER_URL"]
+    if url is None:
+        return app.pool
+    return pools.connections[app.connection_for_write(url)]
+
+
+def enqueue_orders(orders):
+    """
+    Queues ``orders``, ``(customer_id, {product_id: quantity}, order_date)``
+    tuples already checked by the caller, and returns their ticket ids.
+    Orders without a date are dated now, not when they are drained.
+    """
+    now = timezone.now()
+    tickets = []
+    with broker_pool().acquire(block=True) as connection:
+        queue = connection.SimpleQueue(ingest_settings()["QUEUE"], serializer="json")
+        try:
+            for customer_id, quantities, order_date in orders:
+                ticket = uuid.uuid4()
+                queue.put({
+                    "ticket": str(ticket),
+                    "customer_id": str(customer_id),
+                    "items": {str(pk): quantity for pk, quantity in quantities.items()},
+                    "order_date": (order_date or now).isoformat(),
+                })
+                tickets.append(ticket)
+        finally:
+            queue.close()
+    schedule_drain()
+    return tickets
+
+
+def schedule_drain():
+    """
+    Schedules one drain DRAIN_DELAY seconds out, unless one is already
+    scheduled: orders arriving meanwhile are committed together. The
+    beat schedule also drains periodically, in case a drain is missed.
+    """
+    delay = ingest_settings()["DRAIN_DELAY"]
+    if cache.add(DRAIN_SCHEDULED_KEY, True, timeout=max(delay, 1)):
+        drain_order_queue.apply_async(countdown=delay)
+
+
+@shared_task
+def drain_order_queue(batch_size=None):
+    """
+    Places queued orders batch by batch until the queue is empty. A batch
+    is acknowledged only once committed, so a crash redelivers it; tickets
+    already recorded are skipped then. Returns the number of orders taken
+    off the queue.
+    """
+    options = ingest_settings()
+    batch_size = batch_size or options["BATCH_SIZE"]
+    cache.delete(DRAIN_SCHEDULED_KEY)
+    drained = 0
+    with broker_pool().acquire(block=True) as connection:
+        queue = connection.SimpleQueue(options["QUEUE"], serializer="json")
+        try:
+            while True:
+                messages = []
+                while len(messages) < batch_size:
+                    try:
+                        messages.append(queue.get_nowait())
+                    except Empty:
+                        break
+                if not messages:
+                    return drained
+                place_orders([message.payload for message in messages])
+                for message in messages:
+                    message.ack()
+                drained += len(messages)
+        finally:
+            queue.close()
+
+
+def place_orders(payloads):
+    """
+    Places the queued ``payloads`` in one transaction: stock is reserved
+    as createOrder does it, and orders, items and tickets are bulk
+    inserted. Orders that cannot be placed get a failed ticket.
+    """
+    tickets = [uuid.UUID(payload["ticket"]) for payload in payloads]
+    customer_ids = {uuid.UUID(payload["customer_id"]) for payload in payloads}
+    with transaction.atomic():
+        done = set(OrderTicket.objects.filter(pk__in=tickets).values_list("pk", flat=True))
+        customers = set(Customer.objects.filter(pk__in=customer_ids).values_list("pk", flat=True))
+        pending, results = [], []
+        for ticket, payload in zip(tickets, payloads):
+            if ticket in done:
+                continue
+            done.add(ticket)
+            customer_id = uuid.UUID(payload["customer_id"])
+            if customer_id not in customers:
+                results.append(OrderTicket(id=ticket, status=OrderTicket.FAILED, errors=["Invalid customer ID."]))
+                continue
+            quantities = {uuid.UUID(pk): quantity for pk, quantity in payload["items"].items()}
+            pending.append((ticket, customer_id, quantities, payload["order_date"]))
+
+        # Usually stock covers the whole batch, so it is reserved at once;
+        # otherwise order by order, and only the orders it cannot cover fail.
+        batch = {}
+        for _, _, quantities, _ in pending:
+            for pk, quantity in quantities.items():
+                batch[pk] = batch.get(pk, 0) + quantity
+        try:
+            prices = reserve_stock(batch) if batch else {}
+        except InsufficientStock:
+            prices = None
+
+        orders, items = [], []
+        for ticket, customer_id, quantities, order_date in pending:
+            if prices is None:
+                try:
+                    order_prices = reserve_stock(quantities)
+                except InsufficientStock as e:
+                    results.append(OrderTicket(id=ticket, status=OrderTicket.FAILED, errors=list(e.problems.values())))
+                    continue
+            else:
+                order_prices = prices
+            # Snapshot prices so the stored total never drifts.
+            lines = [
+                OrderItem(product_id=pk, quantity=quantity, unit_price=order_prices[pk])
+                for pk, quantity in quantities.items()
+            ]
+            order = Order(
+                customer_id=customer_id,
+                order_date=parse_datetime(order_date),
+                total_amount=sum(line.line_total for line in lines),
+            )
+            for line in lines:
+                line.order = order
+            orders.append(order)
+            items.extend(lines)
+            results.append(OrderTicket(id=ticket, status=OrderTicket.PLACED, order=order))
+
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(items)
+        OrderTicket.objects.bulk_create(results)
+        increment_counters(orders=len(orders), revenue=sum(order.total_amount for order in orders))
+        if orders:
+            invalidate(Product)
+    return results
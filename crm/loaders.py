@@ -0,0 +1,214 @@
+import asyncio
+from collections import defaultdict
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils.functional import cached_property
+from .models import Customer, Product, Order
+from .services import get_counters
+from .utils import run_sync
+
+
+class DataLoader:
+    """
+    Synchronous batching loader.
+
+    Keys are queued as soon as their parent objects are known (a
+    connection page, or the results of another loader). The first
+    ``load()`` dispatches a single batch for every queued key, so each
+    relation costs one query per nesting level instead of one per row.
+    """
+
+    def __init__(self, batch_load_fn):
+        self.batch_load_fn = batch_load_fn
+        self._cache = {}
+        self._queue = {}
+
+    def queue(self, key):
+        if key not in self._cache:
+            self._queue[key] = None
+
+    def prime(self, key, value):
+        self._cache.setdefault(key, value)
+        self._queue.pop(key, None)
+
+    def load(self, key):
+        if key not in self._cache:
+            self.queue(key)
+            self.dispatch()
+        return self._cache[key]
+
+    def dispatch(self):
+        keys = list(self._queue)
+        self._queue = {}
+        if keys:
+            self._cache.update(zip(keys, self.batch_load_fn(keys)))
+
+
+class AsyncDataLoader(DataLoader):
+    """
+    DataLoader for async execution. ``load()`` returns an awaitable, the
+    batch function is a coroutine, and loads issued while a batch is in
+    flight wait for it instead of starting their own.
+    """
+
+    def __init__(self, batch_load_fn):
+        super().__init__(batch_load_fn)
+        self._pending = None
+
+    async def load(self, key):
+        while key not in self._cache:
+            self.queue(key)
+            if self._pending is None:
+                self._pending = asyncio.ensure_future(self.dispatch())
+            await self._pending
+        return self._cache[key]
+
+    async def dispatch(self):
+        try:
+            keys = list(self._queue)
+            self._queue = {}
+            if keys:
+                self._cache.update(zip(keys, await self.batch_load_fn(keys)))
+        finally:
+            self._pending = None
+
+
+class Loaders:
+    """
+    Per-request set of relation loaders (and the CRM counters).
+
+    With ``is_async`` the loaders return awaitables and fetch their
+    batches with the async ORM.
+    """
+
+    def __init__(self, is_async=False):
+        self.is_async = is_async
+        loader_class = AsyncDataLoader if is_async else DataLoader
+        self.loader_class = loader_class
+        self.order_customer = loader_class(self.load_order_customers)
+        self.order_products = loader_class(self.load_order_products)
+        # Orders of a customer or product are loaded a page at a time, by
+        # one loader per page size; parents are remembered for later ones.
+        self._order_loaders = {Customer: {}, Product: {}}
+        self._order_parents = {Customer: {}, Product: {}}
+        self._counters_task = None
+
+    @cached_property
+    def counters(self):
+        return get_counters()
+
+    def counter(self, name):
+        """Returns one CRM counter (an awaitable in async mode)."""
+        if not self.is_async:
+            return self.counters[name]
+
+        async def load():
+            if self._counters_task is None:
+                self._counters_task = asyncio.ensure_future(run_sync(get_counters))
+            return (await self._counters_task)[name]
+        return load()
+
+    def customer_orders(self, limit=None):
+        """Loader of each customer's first ``limit`` orders (all with None)."""
+        return self._orders_loader(Customer, limit)
+
+    def product_orders(self, limit=None):
+        """Loader of the first ``limit`` orders of each product (all with None)."""
+        return self._orders_loader(Product, limit)
+
+    def _orders_loader(self, model, limit):
+        loaders = self._order_loaders[model]
+        if limit not in loaders:
+            load = self.load_customer_orders if model is Customer else self.load_product_orders
+            loader = self.loader_class(lambda keys: load(keys, limit))
+            for pk in self._order_parents[model]:
+                loader.queue(pk)
+            loaders[limit] = loader
+        return loaders[limit]
+
+    def _queue_orders(self, model, pk):
+        self._order_parents[model][pk] = None
+        for loader in self._order_loaders[model].values():
+            loader.queue(pk)
+
+    def register(self, instances):
+        """Queues the relation keys of freshly fetched model instances."""
+        for instance in instances:
+            if isinstance(instance, Order):
+                self.order_customer.queue(instance.customer_id)
+                self.order_products.queue(instance.pk)
+            elif isinstance(instance, Customer):
+                self.order_customer.prime(instance.pk, instance)
+                self._queue_orders(Customer, instance.pk)
+            elif isinstance(instance, Product):
+                self._queue_orders(Product, instance.pk)
+
+    def load_order_customers(self, customer_ids):
+        return self._group(
+            Customer.objects.filter(pk__in=customer_ids), customer_ids, key="pk", many=False
+        )
+
+    def load_order_products(self, order_ids):
+        products = Product.objects.filter(orders__in=order_ids).annotate(
+            loader_key=F("orders__id")
+        )
+        return self._group(products, order_ids)
+
+    def load_customer_orders(self, customer_ids, limit=None):
+        orders = Order.objects.filter(customer_id__in=customer_ids)
+        return self._group(first_per_parent(orders, "customer_id", limit), customer_ids, key="customer_id")
+
+    def load_product_orders(self, product_ids, limit=None):
+        orders = Order.objects.filter(products__in=product_ids).annotate(
+            loader_key=F("products__id")
+        )
+        return self._group(first_per_parent(orders, "products__id", limit), product_ids)
+
+    def _group(self, queryset, keys, key="loader_key", many=True):
+        if self.is_async:
+            async def fetch():
+                return self._grouped([instance async for instance in queryset], keys, key, many)
+            return fetch()
+        return self._grouped(queryset, keys, key, many)
+
+    def _grouped(self, instances, keys, key, many):
+        grouped = defaultdict(list)
+        for instance in instances:
+            grouped[getattr(instance, key)].append(instance)
+        for group in grouped.values():
+            self.register(group)
+        if many:
+            return [grouped.get(k, []) for k in keys]
+        return [grouped[k][0] if k in grouped else None for k in keys]
+
+
+def first_per_parent(orders, parent, limit=None):
+    """
+    Orders ``orders`` by date and keeps the first ``limit`` of each
+    ``parent``, numbering the rows with ROW_NUMBER() over that parent so
+    the database does the cut, not Python.
+    """
+    ordering = ("order_date", "id")
+    if limit is not None:
+        orders = orders.annotate(
+            parent_row=Window(RowNumber(), partition_by=F(parent), order_by=[F(name).asc() for name in ordering])
+        ).filter(parent_row__lte=limit)
+    return orders.order_by(*ordering)
+
+
+def get_loaders(info):
+    """
+    Returns the loaders bound to the current request.
+
+    Without a request context (e.g. ``schema.execute`` with no
+    ``context_value``) a fresh, unshared set is returned. Contexts marked
+    ``crm_async`` (see AsyncGraphQLView) get async loaders.
+    """
+    context = info.context
+    if context is None:
+        return Loaders()
+    loaders = getattr(context, "crm_loaders", None)
+    if loaders is None:
+        loaders = Loaders(is_async=getattr(context, "crm_async", False))
+        setattr(context, "crm_loaders", loaders)
+    return loaders
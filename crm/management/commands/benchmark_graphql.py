@@ -0,0 +1,163 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from crm.benchmarks import BENCHMARK_END, BENCHMARK_SEED, TIERS, measure, operations, regressions
+from crm.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the canonical GraphQL operations against a seeded dataset tier and "
+        "reports p50/p95/p99 latency, SQL query count and peak memory per operation. "
+        "Results can be saved as JSON and compared with a baseline run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tier", choices=TIERS, default="1k", help="Dataset size (default: 1k)")
+        parser.add_argument("--iterations", type=int, default=20, help="Timed runs per operation (default: 20)")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per operation (default: 2)")
+        parser.add_argument("--operation", action="append", help="Only run this operation (repeatable)")
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2,
+            help="Allowed latency / peak memory growth over the baseline, as a fraction (default: 0.2)",
+        )
+        parser.add_argument(
+            "--latency", choices=("p50", "p95", "p99"), default="p50",
+            help="Latency percentile compared with the baseline (default: p50, the least noisy)",
+        )
+        parser.add_argument(
+            "--min-delta-ms", type=float, default=1.0,
+            help="Ignore latency growth smaller than this many milliseconds (default: 1)",
+        )
+        parser.add_argument(
+            "--data-dir", default=os.path.join(tempfile.gettempdir(), "crm-benchmarks"),
+            help="Where the per-tier SQLite datasets are kept between runs",
+        )
+        parser.add_argument(
+            "--in-place", action="store_true",
+            help="Benchmark the configured database as it is instead of a seeded tier",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be positive.")
+        tier = "in-place" if options["in_place"] else options["tier"]
+        if not options["in_place"]:
+            self.use_tier_database(options["tier"], options["data_dir"])
+
+        from alx_backend_graphql.schema import schema
+
+        selected = [op for op in operations() if not options["operation"] or op.name in options["operation"]]
+        if not selected:
+            raise CommandError("No operation matches --operation.")
+        self.stdout.write(
+            f"Tier {tier} ({Order.objects.count()} orders), "
+            f"{options['iterations']} iterations per operation"
+        )
+        self.stdout.write(
+            f"{'operation':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KiB':>11}"
+        )
+        results = {}
+        for operation in selected:
+            metrics = measure(schema, operation, options["iterations"], options["warmup"])
+            results[operation.name] = metrics
+            self.stdout.write(
+                f"{operation.name:<28}{metrics['p50_ms']:>10.2f}{metrics['p95_ms']:>10.2f}"
+                f"{metrics['p99_ms']:>10.2f}{metrics['queries']:>9}{metrics['peak_memory_kib']:>11.0f}"
+            )
+
+        report = {
+            "tier": tier,
+            "commit": self.git_commit(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "database": connections[DEFAULT_DB_ALIAS].vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "iterations": options["iterations"],
+            "operations": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options["baseline"]:
+            self.compare(report, options)
+
+    def use_tier_database(self, tier, data_dir):
+        """
+        Points the default connection at the tier's SQLite file, seeding it
+        with a fixed seed the first time, the way the test runner swaps in
+        its test database.
+        """
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != "sqlite":
+            raise CommandError("Seeded tiers use SQLite files; pass --in-place to benchmark this database.")
+        os.makedirs(data_dir, exist_ok=True)
+        path = os.path.join(data_dir, f"crm-{tier}.sqlite3")
+        marker = path + ".json"
+        expected = {"tier": tier, "seed": BENCHMARK_SEED, "end": BENCHMARK_END, **TIERS[tier]._asdict()}
+
+        connection.close()
+        connection.settings_dict["NAME"] = path
+        try:
+            with open(marker, encoding="utf-8") as f:
+                if json.load(f) == expected:
+                    call_command("migrate", verbosity=0)
+                    return
+        except (OSError, ValueError):
+            pass
+
+        self.stdout.write(f"Seeding the {tier} tier into {path}...")
+        connection.close()
+        for stale in (path, marker):
+            if os.path.exists(stale):
+                os.remove(stale)
+        call_command("migrate", verbosity=0)
+        counts = TIERS[tier]
+        call_command(
+            "seed_db", customers=counts.customers, products=counts.products, orders=counts.orders,
+            seed=BENCHMARK_SEED, end=BENCHMARK_END, stdout=self.stdout,
+        )
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump(expected, f)
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, report, options):
+        try:
+            with open(options["baseline"], encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline: {e}")
+        if baseline.get("tier") != report["tier"]:
+            raise CommandError(
+                f"Baseline is for tier {baseline.get('tier')}, this run is {report['tier']}."
+            )
+        found = regressions(
+            baseline["operations"], report["operations"], options["threshold"], options["min_delta_ms"],
+            f"{options['latency']}_ms",
+        )
+        if found:
+            raise CommandError(
+                f"Regressions against {baseline.get('commit') or options['baseline']}:\n  " + "\n  ".join(found)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"No regressions against {baseline.get('commit') or options['baseline']}."
+        ))
@@ -0,0 +1,134 @@
+import asyncio
+import io
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+QUERY = """
+query ($first: Int) {
+  allOrders(first: $first) {
+    edges { node { id orderDate totalAmount customer { name email } products { edges { node { name price } } } } }
+  }
+}
+"""
+
+# A host DEBUG accepts with an empty ALLOWED_HOSTS.
+HOST = "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares allOrders throughput of the sync view behind Django's WSGI handler "
+        "with the async view behind its ASGI handler, at the same concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per run (default: 200)")
+        parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight (default: 16)")
+        parser.add_argument("--first", type=int, default=50, help="Orders per page (default: 50)")
+
+    def handle(self, *args, **options):
+        body = json.dumps({"query": QUERY, "variables": {"first": options["first"]}}).encode("utf-8")
+        total, concurrency = options["requests"], options["concurrency"]
+        self.stdout.write(
+            f"{total} allOrders(first: {options['first']}) requests, {concurrency} concurrent"
+        )
+        self.report("sync view / WSGI", *self.run_wsgi(body, total, concurrency))
+        self.report("async view / ASGI", *self.run_asgi(body, total, concurrency))
+
+    def run_wsgi(self, body, total, concurrency):
+        application = get_wsgi_application()
+
+        def request(_):
+            environ = {
+                "REQUEST_METHOD": "POST",
+                "PATH_INFO": "/graphql/",
+                "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(body)),
+                "HTTP_HOST": HOST,
+                "wsgi.input": io.BytesIO(body),
+            }
+            setup_testing_defaults(environ)
+            status = []
+            start = time.perf_counter()
+            response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+            content = b"".join(response)
+            response.close()
+            self.assert_ok(int(status[0].split()[0]), content)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(request, range(total)))
+        return time.perf_counter() - start, latencies
+
+    def run_asgi(self, body, total, concurrency):
+        application = get_asgi_application()
+
+        async def request():
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": "/graphql/async/",
+                "query_string": b"",
+                "headers": [
+                    (b"host", HOST.encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": (HOST, 80),
+            }
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+            response = {"status": None, "body": []}
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # The client never disconnects; Django cancels this when done.
+                await asyncio.Future()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+                else:
+                    response["body"].append(message.get("body", b""))
+
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            self.assert_ok(response["status"], b"".join(response["body"]))
+            return time.perf_counter() - start
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def limited():
+                async with semaphore:
+                    return await request()
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(limited() for _ in range(total)))
+            return time.perf_counter() - start, latencies
+
+        return asyncio.run(run())
+
+    def assert_ok(self, status, content):
+        if status != 200 or b'"errors"' in content:
+            raise RuntimeError(f"Request failed ({status}): {content[:500]!r}")
+
+    def report(self, label, elapsed, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"{label:<18} {len(latencies) / elapsed:8.1f} req/s   "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms"
+        )
@@ -0,0 +1,109 @@
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from graphql import execute, parse
+
+from alx_backend_graphql.schema import schema
+from crm.ingest import DRAIN_SCHEDULED_KEY, drain_order_queue
+from crm.management.commands.cleanup_inactive_customers import delete_customers
+from crm.models import Customer, OrderTicket, Product
+from crm.services import increment_counters
+
+CREATE_ORDER = """
+mutation ($input: CreateOrderInput!) {
+  createOrder(input: $input) { order { id } errors }
+}
+"""
+
+ENQUEUE_ORDERS = """
+mutation ($input: [CreateOrderInput!]!) {
+  enqueueOrders(input: $input) { tickets errors }
+}
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares placing a burst of orders one createOrder at a time with queueing them "
+        "one enqueueOrders at a time and draining the queue in micro-batches. Writes to the "
+        "configured database (pass --yes to confirm) and queues on Kombu's in-memory broker, "
+        "and removes its rows afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=500, help="Orders per run (default: 500)")
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="Orders committed per drain transaction (default: CRM_ORDER_INGEST's BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--yes", action="store_true",
+            help="Confirm writing benchmark customers, products and orders to the configured database",
+        )
+
+    def handle(self, *args, **options):
+        total = options["orders"]
+        if total < 1:
+            raise CommandError("--orders must be at least 1.")
+        if not options["yes"]:
+            raise CommandError(
+                "This writes benchmark rows to the configured database; run it against a "
+                "throwaway database, or pass --yes."
+            )
+
+        # Unique, so a run left behind by a crash never collides with the next.
+        run = uuid.uuid4().hex[:12]
+        customer = Customer.objects.create(name=f"Benchmark {run}", email=f"benchmark-{run}@example.com")
+        increment_counters(customers=1)
+        product = Product.objects.create(name=f"Benchmark {run}", price=Decimal("1.00"), stock=total * 2)
+        order = {"customerId": str(customer.pk), "items": [{"productId": str(product.pk)}]}
+        # Parsed once, as the view's document cache does for repeated documents.
+        create_order, enqueue_orders = parse(CREATE_ORDER), parse(ENQUEUE_ORDERS)
+        # Orders are queued on an in-memory broker in this process only. The
+        # drain is run here rather than scheduled, so the timing includes it.
+        ingest = override_settings(CRM_ORDER_INGEST={**settings.CRM_ORDER_INGEST, "BROKER_URL": "memory://"})
+        ingest.enable()
+        cache.set(DRAIN_SCHEDULED_KEY, True, timeout=None)
+        tickets = []
+        try:
+            self.stdout.write(f"{total} orders of one line each")
+            start = time.perf_counter()
+            for _ in range(total):
+                self.run_operation(create_order, {"input": order}, "createOrder")
+            direct = time.perf_counter() - start
+            self.report("createOrder", total, direct)
+
+            start = time.perf_counter()
+            for _ in range(total):
+                tickets.extend(self.run_operation(enqueue_orders, {"input": [order]}, "enqueueOrders")["tickets"])
+            enqueued = time.perf_counter() - start
+            drained = drain_order_queue(options["batch_size"])
+            queued = time.perf_counter() - start
+            if drained != total:
+                raise CommandError(f"Drained {drained} orders, expected {total}.")
+            self.report("enqueueOrders", total, enqueued, "accepted")
+            self.report("  + drain", total, queued)
+            self.stdout.write(f"Speedup: {direct / queued:.1f}x")
+        finally:
+            ingest.disable()
+            cache.delete(DRAIN_SCHEDULED_KEY)
+            with transaction.atomic():
+                OrderTicket.objects.filter(pk__in=tickets).delete()
+                delete_customers([customer.pk])
+                product.delete()
+
+    def run_operation(self, document, variables, field):
+        result = execute(schema.graphql_schema, document, variable_values=variables, context_value=SimpleNamespace())
+        if result.errors or result.data[field]["errors"]:
+            raise CommandError(f"{field} failed: {result.errors or result.data[field]['errors']}")
+        return result.data[field]
+
+    def report(self, label, total, elapsed, verb="placed"):
+        self.stdout.write(f"{label:<14} {total / elapsed:9.1f} orders/s {verb}   ({elapsed:.2f}s)")
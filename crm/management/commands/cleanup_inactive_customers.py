@@ -0,0 +1,125 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.utils import timezone
+
+from crm.models import Customer, Order, OrderItem
+from crm.result_cache import invalidate
+from crm.services import increment_counters
+
+
+def inactive_customers(cutoff):
+    """
+    Customers who signed up before ``cutoff`` and have not ordered since.
+    The NOT EXISTS probe is answered by the (customer, order_date) index.
+    """
+    recent = Order.objects.filter(customer=OuterRef("pk"), order_date__gte=cutoff)
+    return Customer.objects.filter(created_at__lt=cutoff).filter(~Exists(recent))
+
+
+def delete_customers(pks, using=DEFAULT_DB_ALIAS):
+    """
+    Deletes the customers ``pks`` with their orders and order items, one
+    DELETE per table instead of the collector loading every cascaded row,
+    and takes them off the CRM counters. Returns ``(orders, revenue)``.
+    """
+    orders = Order.objects.using(using).filter(customer_id__in=pks)
+    totals = orders.aggregate(count=Count("pk"), revenue=Sum("total_amount"))
+    OrderItem.objects.using(using).filter(order_id__in=orders.values("pk"))._raw_delete(using)
+    orders._raw_delete(using)
+    Customer.objects.using(using).filter(pk__in=pks)._raw_delete(using)
+    revenue = totals["revenue"] or 0
+    increment_counters(customers=-len(pks), orders=-totals["count"], revenue=-revenue)
+    invalidate(Customer)
+    return totals["count"], revenue
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes customers with no orders in the last --days days, in small "
+        "primary-key batches that each commit on their own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=365,
+            help="Customers without an order in this many days are inactive (default: 365)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Customers deleted per transaction (default: 500)",
+        )
+        parser.add_argument(
+            "--max-rate", type=float, default=0,
+            help="Most customers deleted per second; 0 for no limit (default: 0)",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report what would be deleted",
+        )
+        parser.add_argument(
+            "--progress-interval", type=float, default=5.0,
+            help="Seconds between progress lines (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size, max_rate = options["batch_size"], options["max_rate"]
+        if batch_size < 1 or options["days"] < 1:
+            raise CommandError("--batch-size and --days must be positive.")
+        if max_rate < 0:
+            raise CommandError("--max-rate cannot be negative.")
+
+        now = timezone.now()
+        cutoff = now - timedelta(days=options["days"])
+        self.stdout.write(f"Cleanup run at {now:%Y-%m-%d %H:%M:%S}: no orders since {cutoff:%Y-%m-%d}.")
+        inactive = inactive_customers(cutoff)
+
+        if options["dry_run"]:
+            totals = Order.objects.filter(customer__in=inactive).aggregate(count=Count("pk"), revenue=Sum("total_amount"))
+            self.stdout.write(
+                f"Would delete {inactive.count()} inactive customers with {totals['count']} orders "
+                f"({totals['revenue'] or 0:.2f} revenue)."
+            )
+            return
+
+        started = last_report = time.monotonic()
+        customers = orders = 0
+        last_pk = None
+        while True:
+            batch = inactive.order_by("pk")
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            with transaction.atomic():
+                # Locked, so no order can be placed for them until the
+                # batch commits (a no-op on SQLite, whose writes are
+                # serialized anyway).
+                pks = list(batch.select_for_update().values_list("pk", flat=True)[:batch_size])
+                if not pks:
+                    break
+                deleted_orders, _ = delete_customers(pks)
+            customers += len(pks)
+            orders += deleted_orders
+            last_pk = pks[-1]
+
+            elapsed = time.monotonic() - started
+            if max_rate:
+                # Pause so the average stays under the limit, leaving the
+                # database to live traffic between batches.
+                time.sleep(max(0.0, customers / max_rate - elapsed))
+            now = time.monotonic()
+            if now - last_report >= options["progress_interval"]:
+                self.report(customers, orders, now - started)
+                last_report = now
+
+        self.report(customers, orders, time.monotonic() - started)
+        if customers:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {customers} inactive customers."))
+        else:
+            self.stdout.write("No inactive customers found.")
+
+    def report(self, customers, orders, elapsed):
+        rate = customers / elapsed if elapsed else 0
+        self.stdout.write(f"{customers} customers ({rate:,.0f}/s), {orders} orders deleted")
@@ -0,0 +1,46 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.export import EXPORTS, FORMATS, export_lines, export_queryset
+
+
+class Command(BaseCommand):
+    help = "Streams customers, products or orders to NDJSON or CSV with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(EXPORTS))
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument("--output", help="File to write (default: stdout)")
+        parser.add_argument(
+            "--chunk-size", type=int, default=2000, help="Rows fetched per round trip (default: 2000)"
+        )
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="FilterSet argument, e.g. --filter customer_name=alice --filter order_date__gte=2025-01-01",
+        )
+
+    def handle(self, *args, **options):
+        filters = {}
+        for item in options["filter"]:
+            name, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"--filter expects NAME=VALUE, got '{item}'.")
+            filters[name] = value
+        try:
+            queryset = export_queryset(options["kind"], filters)
+        except ValidationError as e:
+            raise CommandError("; ".join(e.messages))
+
+        lines = export_lines(options["kind"], queryset, options["format"], options["chunk_size"])
+        count = 0
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                for count, line in enumerate(lines, 1):
+                    output.write(line)
+        else:
+            for count, line in enumerate(lines, 1):
+                self.stdout.write(line, ending="")
+        self.stderr.write(self.style.SUCCESS(f"Wrote {count} lines of {options['kind']}."))
@@ -0,0 +1,230 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from crm.importer import KINDS, read_records, validate_chunk
+from crm.models import Customer, Order, OrderItem, Product
+from crm.result_cache import invalidate
+from crm.services import increment_counters
+from crm.utils import chunked
+
+AMBIGUOUS = object()
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-loads customers, products or orders from a CSV or NDJSON file, "
+        "validating in a process pool and writing with batched bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=KINDS)
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("ndjson", "csv"), help="Default: from the file extension")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Records validated and committed together (default: 1000)",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Validation processes; 0 validates in this process (default: CPU count)",
+        )
+        parser.add_argument(
+            "--progress-interval", type=float, default=5.0,
+            help="Seconds between progress lines (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        kind, batch_size = options["kind"], options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+        if not os.path.exists(options["path"]):
+            raise CommandError(f"No such file: {options['path']}")
+
+        self.load_id_maps(kind)
+        write = {
+            "customers": self.write_customers,
+            "products": self.write_products,
+            "orders": self.write_orders,
+        }[kind]
+        records = read_records(options["path"], kind, options["format"])
+
+        started = last_report = time.monotonic()
+        processed = created = failed = 0
+        for rows, errors in self.validated(kind, records, batch_size, options["workers"]):
+            processed += len(rows) + len(errors)
+            written, write_errors = write(rows)
+            errors = sorted(errors + write_errors)
+            for number, message in errors:
+                self.stderr.write(f"record {number}: {message}")
+            created += written
+            failed += len(errors)
+            now = time.monotonic()
+            if now - last_report >= options["progress_interval"]:
+                self.report(processed, created, failed, now - started)
+                last_report = now
+
+        if created and kind in ("customers", "products"):
+            invalidate(Customer if kind == "customers" else Product)
+        self.report(processed, created, failed, time.monotonic() - started)
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} {kind}."))
+
+    def report(self, processed, created, failed, elapsed):
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{processed} records ({rate:,.0f}/s): {created} created, {failed} errors"
+        )
+
+    def validated(self, kind, records, batch_size, workers):
+        """
+        Yields ``(rows, errors)`` per batch, in file order. With workers,
+        a bounded number of batches is in flight so the file is never
+        read far ahead of the writer.
+        """
+        batches = (
+            (i * batch_size + 1, batch) for i, batch in enumerate(chunked(records, batch_size))
+        )
+        if workers < 1:
+            for start, batch in batches:
+                yield validate_chunk(kind, start, batch)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            pending = deque()
+            for start, batch in batches:
+                pending.append(pool.submit(validate_chunk, kind, start, batch))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def load_id_maps(self, kind):
+        """
+        Loads the natural keys references are resolved against, once, so
+        rows never need a lookup query of their own.
+        """
+        self.customer_emails = dict(
+            Customer.objects.values_list("email", "id").iterator(chunk_size=10000)
+        )
+        self.customer_ids = set(self.customer_emails.values())
+        self.product_prices, self.product_names = {}, {}
+        for pk, name, price in Product.objects.values_list("id", "name", "price").iterator(chunk_size=10000):
+            self.add_product(pk, name, price)
+
+    def add_product(self, pk, name, price):
+        self.product_prices[pk] = price
+        self.product_names[name] = AMBIGUOUS if name in self.product_names else pk
+
+    def save(self, rows, write):
+        """Runs ``write`` in one transaction; an integrity error fails the whole batch."""
+        try:
+            with transaction.atomic():
+                return write(), []
+        except IntegrityError as e:
+            return 0, [(row[0], f"Batch not imported: {e}") for row in rows]
+
+    def write_customers(self, rows):
+        customers, errors = [], []
+        for number, pk, name, email, phone, created_at in rows:
+            if email in self.customer_emails:
+                errors.append((number, "Email already exists."))
+                continue
+            if pk in self.customer_ids:
+                errors.append((number, "id already exists."))
+                continue
+            customer = Customer(name=name, email=email, phone=phone)
+            if pk:
+                customer.id = pk
+            if created_at:
+                customer.created_at = created_at
+            customers.append(customer)
+            self.customer_emails[email] = customer.id
+            self.customer_ids.add(customer.id)
+
+        def write():
+            Customer.objects.bulk_create(customers)
+            increment_counters(customers=len(customers))
+            return len(customers)
+        written, batch_errors = self.save(rows, write)
+        if batch_errors:
+            for customer in customers:
+                self.customer_emails.pop(customer.email, None)
+                self.customer_ids.discard(customer.id)
+        return written, errors + batch_errors
+
+    def write_products(self, rows):
+        products, errors = [], []
+        for number, pk, name, price, stock in rows:
+            if pk in self.product_prices:
+                errors.append((number, "id already exists."))
+                continue
+            product = Product(name=name, price=price, stock=stock)
+            if pk:
+                product.id = pk
+            products.append(product)
+            self.add_product(product.id, name, price)
+
+        def write():
+            Product.objects.bulk_create(products)
+            return len(products)
+        written, batch_errors = self.save(rows, write)
+        if batch_errors:
+            for product in products:
+                self.product_prices.pop(product.id, None)
+                if self.product_names.get(product.name) == product.id:
+                    del self.product_names[product.name]
+        return written, errors + batch_errors
+
+    def write_orders(self, rows):
+        orders, items, errors = [], [], []
+        given_ids = [row[1] for row in rows if row[1]]
+        taken = set()
+        for ids in chunked(given_ids, 500):
+            taken.update(Order.objects.filter(pk__in=ids).values_list("pk", flat=True))
+
+        for number, pk, customer_id, customer_email, order_date, lines in rows:
+            try:
+                if pk in taken:
+                    raise ValueError("id already exists.")
+                customer = customer_id if customer_id in self.customer_ids else self.customer_emails.get(customer_email)
+                if customer is None:
+                    raise ValueError(f"Unknown customer {customer_id or customer_email}.")
+                order = Order(customer_id=customer)
+                if pk:
+                    order.id = pk
+                    taken.add(pk)
+                if order_date:
+                    order.order_date = order_date
+                order_items, seen = [], set()
+                for product_id, product_name, quantity, unit_price in lines:
+                    product = product_id if product_id in self.product_prices else self.product_names.get(product_name)
+                    if product is None:
+                        raise ValueError(f"Unknown product {product_id or product_name}.")
+                    if product is AMBIGUOUS:
+                        raise ValueError(f"Product name '{product_name}' is ambiguous; use product_id.")
+                    if product in seen:
+                        raise ValueError(f"Product {product} appears twice.")
+                    seen.add(product)
+                    order_items.append(OrderItem(
+                        order=order, product_id=product, quantity=quantity,
+                        unit_price=self.product_prices[product] if unit_price is None else unit_price,
+                    ))
+            except ValueError as e:
+                errors.append((number, str(e)))
+                continue
+            order.total_amount = sum(item.line_total for item in order_items)
+            orders.append(order)
+            items.extend(order_items)
+
+        def write():
+            Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(items)
+            increment_counters(orders=len(orders), revenue=sum(o.total_amount for o in orders))
+            return len(orders)
+        written, batch_errors = self.save(rows, write)
+        return written, errors + batch_errors
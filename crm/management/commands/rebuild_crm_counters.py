@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from crm.services import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recomputes the totalCustomers/totalOrders/totalRevenue counters from scratch."
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("Rebuilding CRM counters..."))
+        values = rebuild_counters()
+        for name, value in values.items():
+            self.stdout.write(f"{name}: {value}")
+        self.stdout.write(self.style.SUCCESS("CRM counters rebuilt."))
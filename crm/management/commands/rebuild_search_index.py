@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from crm.search import ensure_search_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreates the customer/product full-text search indexes and their triggers. "
+        "Run it with --vacuum instead of a bare VACUUM, which renumbers the rowids the "
+        "indexes are keyed on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--vacuum", action="store_true",
+            help="VACUUM the database first, then rebuild the indexes against the new rowids",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if options["vacuum"] and connection.vendor == "sqlite":
+            self.stdout.write(self.style.WARNING("Vacuuming..."))
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+        self.stdout.write(self.style.WARNING("Rebuilding search indexes..."))
+        if not ensure_search_indexes(connection, rebuild=True):
+            self.stdout.write(self.style.ERROR("This database does not support FTS5."))
+            return
+        self.stdout.write(self.style.SUCCESS("Search indexes rebuilt."))
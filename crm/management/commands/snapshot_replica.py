@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from alx_backend_graphql.db_routing import replica_alias
+
+
+def snapshot(source, path):
+    """
+    Copies the SQLite database behind ``source`` (a Django connection) to
+    ``path`` with SQLite's online backup, then swaps it into place, so
+    readers see either the old snapshot or the new one. The file's
+    modification time is set to when the copy started, which is what the
+    router measures replica lag from.
+    """
+    started = time.time()
+    temporary = f"{path}.tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    source.ensure_connection()
+    target = sqlite3.connect(temporary)
+    try:
+        # One step, so the copy is a consistent snapshot; a stepped backup
+        # restarts whenever another connection writes.
+        source.connection.backup(target)
+        # Readers must not create WAL files next to a file that is replaced.
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+    os.utime(temporary, (started, started))
+    os.replace(temporary, path)
+    return time.time() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the default SQLite database to the read replica's file, once or every "
+        "--every seconds, so query operations can read from it locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every", type=float,
+            help="Keep taking a snapshot every this many seconds (default: once)",
+        )
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS,
+            help="Database to copy (default: default)",
+        )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No read replica is configured in DATABASES.")
+        source, replica = connections[options["database"]], connections[alias]
+        if source.vendor != "sqlite" or replica.vendor != "sqlite":
+            raise CommandError("Snapshots are for SQLite; other databases replicate on their own.")
+        path = replica.settings_dict["NAME"]
+        if path == source.settings_dict["NAME"]:
+            raise CommandError("The replica and the source are the same database.")
+        if options["every"] is not None and options["every"] <= 0:
+            raise CommandError("--every must be positive.")
+
+        while True:
+            # Open replica connections keep reading the file they opened.
+            replica.close()
+            elapsed = snapshot(source, str(path))
+            self.stdout.write(f"Snapshot of {options['database']} written to {path} in {elapsed:.2f}s")
+            if options["every"] is None:
+                return
+            time.sleep(max(0.0, options["every"] - elapsed))
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.7 on 2025-10-24 14:37
+
+import django.db.models.deletion
+from decimal import Decimal
+from itertools import islice
+from django.db import migrations, models
+
+
+# Rows read and written per batch, so memory stays flat on large tables.
+BATCH_SIZE = 2000
+
+
+def batches(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def copy_order_products(apps, schema_editor):
+    """
+    Moves the auto-created order/product links into OrderItem rows,
+    snapshotting the current product price, and stores each order total.
+    """
+    Order = apps.get_model('crm', 'Order')
+    OrderItem = apps.get_model('crm', 'OrderItem')
+    Links = Order.products.through
+
+    links = Links.objects.values_list('order_id', 'product_id', 'product__price').iterator(chunk_size=BATCH_SIZE)
+    items = (
+        OrderItem(order_id=order_id, product_id=product_id, quantity=1, unit_price=price)
+        for order_id, product_id, price in links
+    )
+    for batch in batches(items):
+        OrderItem.objects.bulk_create(batch)
+
+    totals = (
+        OrderItem.objects.values('order_id')
+        .annotate(total=models.Sum(models.F('unit_price') * models.F('quantity')))
+        .order_by('order_id')
+    )
+    orders = (Order(id=row['order_id'], total_amount=row['total']) for row in totals.iterator(chunk_size=BATCH_SIZE))
+    for batch in batches(orders):
+        Order.objects.bulk_update(batch, ['total_amount'])
+
+
+def copy_order_items_back(apps, schema_editor):
+    Order = apps.get_model('crm', 'Order')
+    OrderItem = apps.get_model('crm', 'OrderItem')
+    Links = Order.products.through
+    links = (
+        Links(order_id=order_id, product_id=product_id)
+        for order_id, product_id in OrderItem.objects.values_list('order_id', 'product_id').iterator(chunk_size=BATCH_SIZE)
+    )
+    for batch in batches(links):
+        Links.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_customer_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='crm.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='crm.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('order', 'product'), name='unique_order_product')],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.RunPython(copy_order_products, copy_order_items_back),
+        migrations.RemoveField(
+            model_name='order',
+            name='products',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='products',
+            field=models.ManyToManyField(related_name='orders', through='crm.OrderItem', to='crm.product'),
+        ),
+    ]
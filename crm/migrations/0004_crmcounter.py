@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:54
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def build_counters(apps, schema_editor):
+    Customer = apps.get_model('crm', 'Customer')
+    Order = apps.get_model('crm', 'Order')
+    CrmCounter = apps.get_model('crm', 'CrmCounter')
+    revenue = Order.objects.aggregate(total=models.Sum('total_amount'))['total']
+    CrmCounter.objects.bulk_create([
+        CrmCounter(name='customers', value=Customer.objects.count()),
+        CrmCounter(name='orders', value=Order.objects.count()),
+        CrmCounter(name='revenue', value=revenue or Decimal('0.00')),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_orderitem_order_total_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrmCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+            ],
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
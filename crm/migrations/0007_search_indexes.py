@@ -0,0 +1,72 @@
+from django.db import OperationalError, migrations, transaction
+
+
+class SQLiteFTS5SQL(migrations.RunSQL):
+    """
+    RunSQL for SQLite builds with FTS5 trigram support. A no-op on other
+    backends and older SQLite builds, where the name filters fall back to
+    icontains.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                super().database_forwards(app_label, schema_editor, from_state, to_state)
+        except OperationalError:
+            pass
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "sqlite":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0006_filter_indexes'),
+    ]
+
+    operations = [
+        # FTS5 tables over the model tables' rowids and the triggers that
+        # keep them in sync. crm.search.ensure_search_indexes recreates
+        # them after later migrations remake these tables.
+        SQLiteFTS5SQL(
+            sql=[
+                "CREATE VIRTUAL TABLE IF NOT EXISTS crm_customer_fts USING fts5("
+                "name, email, content='crm_customer', tokenize='trigram')",
+                "CREATE TRIGGER IF NOT EXISTS crm_customer_fts_ai AFTER INSERT ON crm_customer BEGIN "
+                "INSERT INTO crm_customer_fts(rowid, name, email) VALUES (new.rowid, new.name, new.email); END",
+                "CREATE TRIGGER IF NOT EXISTS crm_customer_fts_ad AFTER DELETE ON crm_customer BEGIN "
+                "INSERT INTO crm_customer_fts(crm_customer_fts, rowid, name, email) "
+                "VALUES ('delete', old.rowid, old.name, old.email); END",
+                "CREATE TRIGGER IF NOT EXISTS crm_customer_fts_au AFTER UPDATE OF name, email ON crm_customer BEGIN "
+                "INSERT INTO crm_customer_fts(crm_customer_fts, rowid, name, email) "
+                "VALUES ('delete', old.rowid, old.name, old.email); "
+                "INSERT INTO crm_customer_fts(rowid, name, email) VALUES (new.rowid, new.name, new.email); END",
+                "INSERT INTO crm_customer_fts(crm_customer_fts) VALUES ('rebuild')",
+                "CREATE VIRTUAL TABLE IF NOT EXISTS crm_product_fts USING fts5("
+                "name, content='crm_product', tokenize='trigram')",
+                "CREATE TRIGGER IF NOT EXISTS crm_product_fts_ai AFTER INSERT ON crm_product BEGIN "
+                "INSERT INTO crm_product_fts(rowid, name) VALUES (new.rowid, new.name); END",
+                "CREATE TRIGGER IF NOT EXISTS crm_product_fts_ad AFTER DELETE ON crm_product BEGIN "
+                "INSERT INTO crm_product_fts(crm_product_fts, rowid, name) "
+                "VALUES ('delete', old.rowid, old.name); END",
+                "CREATE TRIGGER IF NOT EXISTS crm_product_fts_au AFTER UPDATE OF name ON crm_product BEGIN "
+                "INSERT INTO crm_product_fts(crm_product_fts, rowid, name) VALUES ('delete', old.rowid, old.name); "
+                "INSERT INTO crm_product_fts(rowid, name) VALUES (new.rowid, new.name); END",
+                "INSERT INTO crm_product_fts(crm_product_fts) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS crm_customer_fts_ai",
+                "DROP TRIGGER IF EXISTS crm_customer_fts_ad",
+                "DROP TRIGGER IF EXISTS crm_customer_fts_au",
+                "DROP TABLE IF EXISTS crm_customer_fts",
+                "DROP TRIGGER IF EXISTS crm_product_fts_ai",
+                "DROP TRIGGER IF EXISTS crm_product_fts_ad",
+                "DROP TRIGGER IF EXISTS crm_product_fts_au",
+                "DROP TABLE IF EXISTS crm_product_fts",
+            ],
+        ),
+    ]
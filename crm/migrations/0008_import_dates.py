@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0007_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
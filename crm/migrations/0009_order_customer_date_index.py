@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0008_import_dates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'order_date'], name='order_customer_date_idx'),
+        ),
+    ]
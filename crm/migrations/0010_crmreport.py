@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:45
+
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0009_order_customer_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrmReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField(unique=True)),
+                ('period_end', models.DateField()),
+                ('new_customers', models.PositiveIntegerField(default=0)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('active_customers', models.PositiveIntegerField(default=0)),
+                ('total_customers', models.PositiveIntegerField(default=0)),
+                ('total_orders', models.PositiveIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('generated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+            },
+        ),
+    ]
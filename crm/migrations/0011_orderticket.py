@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0010_crmreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderTicket',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('placed', 'Placed'), ('failed', 'Failed')], max_length=10)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('processed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='crm.order')),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 import uuid
+from decimal import Decimal
 from django.db import models
 from django.utils import timezone
 
@@ -8,7 +9,15 @@ class Customer(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add, so imports can keep source dates.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of allCustomers by (created_at, id).
+            models.Index(fields=["created_at", "id"], name="customer_created_id_idx"),
+            models.Index(fields=["phone"], name="customer_phone_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -20,6 +29,13 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "id"], name="product_name_id_idx"),
+            models.Index(fields=["price", "id"], name="product_price_id_idx"),
+            models.Index(fields=["stock", "id"], name="product_stock_id_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} (${self.price})"
 
@@ -27,12 +43,101 @@ class Product(models.Model):
 class Order(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="orders")
-    products = models.ManyToManyField(Product, related_name="orders")
-    order_date = models.DateTimeField(auto_now_add=True)
+    products = models.ManyToManyField(Product, through="OrderItem", related_name="orders")
+    order_date = models.DateTimeField(default=timezone.now, editable=False)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["order_date", "id"], name="order_date_id_idx"),
+            models.Index(fields=["total_amount", "id"], name="order_total_id_idx"),
+            # Answers "has this customer ordered since X" from the index alone.
+            models.Index(fields=["customer", "order_date"], name="order_customer_date_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.customer.name}"
 
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="order_items")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="order_items")
+    quantity = models.PositiveIntegerField(default=1)
+    # Price at purchase time, so later price edits don't rewrite history.
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["order", "product"], name="unique_order_product"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name} @ {self.unit_price}"
+
     @property
-    def total_amount(self):
-        return sum(product.price for product in self.products.all())
+    def line_total(self):
+        return self.unit_price * self.quantity
+
+
+class CrmCounter(models.Model):
+    """
+    Running totals kept in step with customer/order writes, so the
+    dashboard aggregates never have to scan the big tables.
+    """
+    CUSTOMERS = "customers"
+    ORDERS = "orders"
+    REVENUE = "revenue"
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal("0.00"))
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class CrmReport(models.Model):
+    """
+    One week of CRM activity, with the running totals at its end. Each
+    week is computed from the previous report plus that week's rows (see
+    crm.reports), so a report costs one week of data, not all history.
+    """
+    period_start = models.DateField(unique=True)
+    period_end = models.DateField()
+    new_customers = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal("0.00"))
+    active_customers = models.PositiveIntegerField(default=0)
+    total_customers = models.PositiveIntegerField(default=0)
+    total_orders = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal("0.00"))
+    generated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-period_start"]
+
+    def __str__(self):
+        return f"Report {self.period_start} to {self.period_end}"
+
+
+class OrderTicket(models.Model):
+    """
+    Outcome of an order queued by the enqueueOrders mutation, written in
+    the same transaction as the order (see crm.ingest). A ticket with no
+    row yet is still pending.
+    """
+    PLACED = "placed"
+    FAILED = "failed"
+    STATUSES = [(PLACED, "Placed"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    status = models.CharField(max_length=10, choices=STATUSES)
+    # No constraint: cleanup_inactive_customers deletes orders in bulk,
+    # and the ticket should outlive them.
+    order = models.ForeignKey(
+        Order, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    errors = models.JSONField(default=list, blank=True)
+    processed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Ticket {self.id}: {self.status}"
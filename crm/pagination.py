@@ -0,0 +1,112 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from graphql import GraphQLError
+
+
+def keyset_ordering(queryset):
+    """
+    Returns the queryset's ordering as ``[(field, descending, nullable),
+    ...]``, always ending with the primary key so every row has a unique
+    position. Only concrete fields of the model and the queryset's own
+    annotations (such as ``search_rank``) can be used as keyset sort keys.
+    """
+    opts = queryset.model._meta
+    ordering = []
+    for term in queryset.query.order_by or ():
+        if not isinstance(term, str):
+            raise GraphQLError("Only plain field names can be used in order_by.")
+        descending = term.startswith("-")
+        name = term.lstrip("-")
+        if name in queryset.query.annotations:
+            ordering.append((name, descending, False))
+            continue
+        try:
+            field = opts.pk if name == "pk" else opts.get_field(name)
+        except FieldDoesNotExist:
+            raise GraphQLError(f"Cannot order by '{name}'.")
+        if not field.concrete:
+            raise GraphQLError(f"Cannot order by '{name}'.")
+        ordering.append((field.attname, descending, field.null))
+
+    if opts.pk.attname not in {name for name, *_ in ordering}:
+        descending = ordering[0][1] if ordering else False
+        ordering.append((opts.pk.attname, descending, False))
+    return ordering
+
+
+def order_by_terms(ordering, reverse=False):
+    """
+    ``order_by`` arguments for ``ordering``. NULLs of nullable keys sort as
+    if greater than every value (last ascending, first descending), the
+    order ``seek_filter`` assumes whatever the database's default.
+    """
+    terms = []
+    for name, descending, nullable in ordering:
+        descending = descending != reverse
+        if not nullable:
+            terms.append(("-" if descending else "") + name)
+        elif descending:
+            terms.append(F(name).desc(nulls_first=True))
+        else:
+            terms.append(F(name).asc(nulls_last=True))
+    return terms
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder keeping microseconds, which it otherwise truncates
+    to milliseconds: a cursor must seek past its own row exactly.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(ordering, node):
+    values = [[name, getattr(node, name)] for name, *_ in ordering]
+    payload = json.dumps(values, cls=CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(ordering, cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        names = [name for name, _ in values]
+    except (ValueError, TypeError):
+        raise GraphQLError("Invalid cursor.")
+    if names != [name for name, *_ in ordering]:
+        raise GraphQLError("Cursor does not match the requested order_by.")
+    return [value for _, value in values]
+
+
+def seek_filter(ordering, values, forward=True):
+    """
+    Builds the lexicographic "rows after (or before) this cursor" filter:
+    ``k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...`` with per-key directions.
+    NULL cursor values and NULL rows of nullable keys are compared with
+    ``isnull`` lookups, NULL sorting after every value.
+    """
+    condition = Q()
+    for i, (name, descending, nullable) in enumerate(ordering):
+        if descending == forward:
+            # Rows with a smaller key: any non-NULL one if the cursor's is NULL.
+            clause = Q(**{f"{name}__isnull": False} if values[i] is None else {f"{name}__lt": values[i]})
+        elif values[i] is None:
+            # Nothing sorts after NULL.
+            continue
+        else:
+            clause = Q(**{f"{name}__gt": values[i]})
+            if nullable:
+                clause |= Q(**{f"{name}__isnull": True})
+        for j in range(i):
+            previous = ordering[j][0]
+            clause &= Q(**{f"{previous}__isnull": True} if values[j] is None else {previous: values[j]})
+        condition |= clause
+    return condition
@@ -0,0 +1,99 @@
+"""
+Weekly CRM reports, computed in the worker that calls
+``generate_weekly_reports`` and stored as CrmReport rows.
+
+Weeks run Monday to Sunday in the current time zone. Each report adds one
+week's aggregates to the running totals of the week before, so only the
+first report ever reads the full history.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Customer, CrmReport, Order
+
+WEEK = timedelta(days=7)
+CENTS = Decimal("0.01")
+
+
+def week_start(day):
+    """The Monday of ``day``'s week."""
+    return day - timedelta(days=day.weekday())
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def window_totals(lower=None, upper=None):
+    """
+    Aggregates orders and signups in ``[lower, upper)``, either bound
+    optional: one pass over the order_date range and one count over the
+    created_at range, both served by their indexes.
+    """
+    orders = Order.objects.all()
+    customers = Customer.objects.all()
+    if lower is not None:
+        orders = orders.filter(order_date__gte=lower)
+        customers = customers.filter(created_at__gte=lower)
+    if upper is not None:
+        orders = orders.filter(order_date__lt=upper)
+        customers = customers.filter(created_at__lt=upper)
+    totals = orders.aggregate(
+        orders=Count("pk"),
+        revenue=Sum("total_amount"),
+        active_customers=Count("customer", distinct=True),
+    )
+    # SQLite sums decimals as floats; keep the column's two places.
+    totals["revenue"] = Decimal(totals["revenue"] or 0).quantize(CENTS)
+    totals["new_customers"] = customers.count()
+    return totals
+
+
+def compute_report(start, previous=None):
+    """
+    Creates the report for the week starting on ``start``. Its totals
+    continue from ``previous`` when that is the week before; otherwise
+    they are read once from everything before the week.
+    """
+    lower, upper = day_start(start), day_start(start + WEEK)
+    week = window_totals(lower, upper)
+    if previous is not None and previous.period_start == start - WEEK:
+        before = {
+            "new_customers": previous.total_customers,
+            "orders": previous.total_orders,
+            "revenue": previous.total_revenue,
+        }
+    else:
+        before = window_totals(upper=lower)
+    return CrmReport.objects.create(
+        period_start=start,
+        period_end=start + WEEK - timedelta(days=1),
+        new_customers=week["new_customers"],
+        orders=week["orders"],
+        revenue=week["revenue"],
+        active_customers=week["active_customers"],
+        total_customers=before["new_customers"] + week["new_customers"],
+        total_orders=before["orders"] + week["orders"],
+        total_revenue=before["revenue"] + week["revenue"],
+    )
+
+
+def generate_weekly_reports(today=None):
+    """
+    Reports every complete week since the latest report (or just last
+    week, the first time), oldest first. Returns the new reports.
+    """
+    current = week_start(today or timezone.localdate())
+    latest = CrmReport.objects.order_by("-period_start").first()
+    start = latest.period_start + WEEK if latest else current - WEEK
+    created = []
+    while start < current:
+        with transaction.atomic():
+            latest = compute_report(start, latest)
+        created.append(latest)
+        start += WEEK
+    return created
@@ -0,0 +1,124 @@
+import hashlib
+import inspect
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from graphene.relay import PageInfo
+
+from alx_backend_graphql.db_routing import reads_from_replica
+from .loaders import get_loaders
+
+VERSION_KEY = "crm:version:{}"
+RESULT_KEY = "crm:result:{}:{}:{}"
+
+
+def result_cache_settings():
+    return getattr(settings, "CRM_RESULT_CACHE", {})
+
+
+def get_cache():
+    """Returns the backing cache, or None when result caching is disabled."""
+    options = result_cache_settings()
+    if not options.get("ENABLED", False):
+        return None
+    return caches[options.get("CACHE_ALIAS", "default")]
+
+
+def model_versions(cache, models):
+    """
+    Returns the current version stamp of each model.
+
+    Stamps are random tokens rather than counters, so a stamp that gets
+    evicted is replaced by one no cached result can match.
+    """
+    keys = [VERSION_KEY.format(model._meta.label_lower) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = uuid.uuid4().hex
+            cache.add(key, token, timeout=None)
+            versions[key] = cache.get(key, token)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*models):
+    """
+    Bumps the version stamp of ``models`` once the current transaction
+    commits, orphaning every cached result that depends on them.
+    """
+    def bump():
+        cache = get_cache()
+        if cache is not None:
+            cache.set_many(
+                {VERSION_KEY.format(m._meta.label_lower): uuid.uuid4().hex for m in models},
+                timeout=None,
+            )
+    transaction.on_commit(bump)
+
+
+def store_page(cache, key, connection):
+    page = {
+        "nodes": [edge.node for edge in connection.edges],
+        "cursors": [edge.cursor for edge in connection.edges],
+        "page_info": {
+            "start_cursor": connection.page_info.start_cursor,
+            "end_cursor": connection.page_info.end_cursor,
+            "has_previous_page": connection.page_info.has_previous_page,
+            "has_next_page": connection.page_info.has_next_page,
+        },
+        "length": connection.length,
+    }
+    cache.set(key, page, timeout=result_cache_settings().get("TIMEOUT", 300))
+    return connection
+
+
+def cached_connection(resolver, models):
+    """
+    Wraps a connection resolver so its page (nodes, cursors, page info
+    and total length) is cached under the field name, the arguments and
+    the version stamps of ``models``. Pages read from the read replica
+    are served but not stored.
+    """
+    def resolve(root, info, **args):
+        cache = get_cache()
+        if cache is None:
+            return resolver(root, info, **args)
+
+        arguments = json.dumps(args, sort_keys=True, default=str)
+        key = RESULT_KEY.format(
+            info.field_name,
+            hashlib.sha256(arguments.encode("utf-8")).hexdigest(),
+            ".".join(model_versions(cache, models)),
+        )
+        page = cache.get(key)
+        if page is None:
+            connection = resolver(root, info, **args)
+            # A replica page can predate the stamp it would be stored under.
+            if reads_from_replica():
+                return connection
+            if inspect.isawaitable(connection):
+                async def store():
+                    return store_page(cache, key, await connection)
+                return store()
+            return store_page(cache, key, connection)
+
+        connection_type = info.return_type
+        while hasattr(connection_type, "of_type"):
+            connection_type = connection_type.of_type
+        connection_type = connection_type.graphene_type
+        connection = connection_type(
+            edges=[
+                connection_type.Edge(node=node, cursor=cursor)
+                for node, cursor in zip(page["nodes"], page["cursors"])
+            ],
+            page_info=PageInfo(**page["page_info"]),
+        )
+        connection.iterable = page["nodes"]
+        connection.length = page["length"]
+        get_loaders(info).register(page["nodes"])
+        return connection
+
+    return resolve
@@ -1,31 +1,255 @@
-import re
 import graphene
+import inspect
 from decimal import Decimal
+from django.conf import settings
 from django.db import transaction, IntegrityError
-from django.core.validators import validate_email
-from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from django.utils import timezone
+from graphene.relay import PageInfo
 from graphene_django import DjangoObjectType
 from graphene_django.filter import DjangoFilterConnectionField
-from .models import Customer, Order
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError
+from graphql_relay import get_offset_with_default
+from .models import Customer, Order, OrderItem, OrderTicket, CrmCounter, CrmReport
 from crm.models import Product
 from .filters import CustomerFilter, ProductFilter, OrderFilter
+from .ingest import enqueue_orders
+from .loaders import get_loaders
+from .pagination import decode_cursor, encode_cursor, keyset_ordering, order_by_terms, seek_filter
+from .result_cache import cached_connection, invalidate
+from .search import ranked_search, search_orders
+from .services import InsufficientStock, increment_counters, reserve_stock, restock_low_stock_products
+from .utils import chunked, run_sync, selected_fields
+from .validators import customer_input_error
+
+# Ten years of weekly reports.
+MAX_REPORTS = 520
+# updatedProducts is read back row by row; beyond this, ask for the count.
+MAX_UPDATED_PRODUCTS = 500
+# Largest chunkSize bulkCreateCustomers accepts per IN lookup / INSERT.
+MAX_BULK_CHUNK_SIZE = 1000
+# Orders one enqueueOrders call may queue.
+MAX_ENQUEUED_ORDERS = 500
+
+PAGINATION_ARGS = {"first", "last", "before", "after", "offset"}
+
+
+def has_filter_args(kwargs):
+    return any(value is not None for key, value in kwargs.items() if key not in PAGINATION_ARGS)
+
+
+def nested_page_limit(kwargs):
+    """
+    How many rows a loader must fetch per parent for a nested connection
+    page: through the page's last row, plus one to tell whether another
+    page follows. None (every row) when paging backwards.
+    """
+    if kwargs.get("last") is not None or kwargs.get("before") or kwargs.get("offset"):
+        return None
+    first = kwargs.get("first")
+    if first is None:
+        first = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+        if first is None:
+            return None
+    return get_offset_with_default(kwargs.get("after"), -1) + 1 + max(first, 0) + 1
+
+
+class BatchedConnectionField(DjangoFilterConnectionField):
+    """
+    Filter connection that cooperates with the per-request loaders.
+
+    Every page it returns is registered with the loaders so the nested
+    relations of its nodes are fetched in one batch, and lists already
+    produced by a loader are paginated as-is instead of being refiltered.
+    Root fields may pass ``cache_models`` to opt into the result cache.
+    """
+
+    def __init__(self, type_, *args, cache_models=(), **kwargs):
+        self.cache_models = cache_models
+        super().__init__(type_, *args, **kwargs)
+
+    def wrap_resolve(self, parent_resolver):
+        resolver = super().wrap_resolve(parent_resolver)
+        if self.cache_models:
+            resolver = cached_connection(resolver, self.cache_models)
+        return resolver
+
+    @classmethod
+    def resolve_queryset(cls, connection, iterable, info, args, filtering_args, filterset_class):
+        if isinstance(iterable, list):
+            return iterable
+        return super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, queryset_resolver,
+                            max_limit, enforce_first_or_last, root, info, **args):
+        if get_loaders(info).is_async:
+            return cls.connection_resolver_async(
+                resolver, connection, default_manager, queryset_resolver,
+                max_limit, enforce_first_or_last, root, info, **args
+            )
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver,
+            max_limit, enforce_first_or_last, root, info, **args
+        )
+        get_loaders(info).register(edge.node for edge in result.edges)
+        return result
+
+    @classmethod
+    async def connection_resolver_async(cls, resolver, connection, default_manager, queryset_resolver,
+                                        max_limit, enforce_first_or_last, root, info, **args):
+        """
+        Async counterpart of ``connection_resolver``, used by AsyncGraphQLView.
+
+        Loader-backed resolvers are awaited on the event loop. Root
+        resolvers and filtersets may query the database (search index
+        checks, filter methods), so they run on the bounded sync pool.
+        """
+        if enforce_first_or_last and not (args.get("first") or args.get("last")):
+            raise GraphQLError(
+                f"You must provide a `first` or `last` value to properly paginate the `{info.field_name}` connection."
+            )
+        for key in ("first", "last"):
+            if max_limit and args.get(key) and args[key] > max_limit:
+                raise GraphQLError(
+                    f"Requesting {args[key]} records on the `{info.field_name}` connection "
+                    f"exceeds the `{key}` limit of {max_limit} records."
+                )
+
+        def prepare(iterable):
+            if iterable is None:
+                iterable = default_manager
+            return queryset_resolver(connection, iterable, info, args)
+
+        if info.path.prev is None:
+            iterable = await run_sync(lambda: prepare(resolver(root, info, **args)))
+        else:
+            iterable = resolver(root, info, **args)
+            if inspect.isawaitable(iterable):
+                iterable = await iterable
+            iterable = prepare(iterable) if isinstance(iterable, list) else await run_sync(prepare, iterable)
+
+        result = await cls.resolve_connection_async(connection, args, iterable, max_limit)
+        get_loaders(info).register(edge.node for edge in result.edges)
+        return result
+
+    @classmethod
+    async def resolve_connection_async(cls, connection, args, iterable, max_limit=None):
+        if isinstance(iterable, list):
+            return cls.resolve_connection(connection, args, iterable, max_limit)
+        return await run_sync(cls.resolve_connection, connection, args, iterable, max_limit)
+
+class KeysetConnectionField(BatchedConnectionField):
+    """
+    Root list connection paginated by keyset (seek) instead of OFFSET.
+
+    Cursors encode the values of the queryset's ``order_by`` keys plus the
+    primary key, and each page is fetched with ``WHERE (keys) > cursor
+    LIMIT first + 1``. Deep pages cost the same as the first, and no
+    COUNT(*) is run.
+    """
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        if not isinstance(iterable, QuerySet):
+            return super().resolve_connection(connection, args, iterable, max_limit)
+        ordering, queryset, finish = cls.page_query(args, iterable, max_limit)
+        return cls.page_connection(connection, ordering, *finish(list(queryset)))
+
+    @classmethod
+    async def resolve_connection_async(cls, connection, args, iterable, max_limit=None):
+        if not isinstance(iterable, QuerySet):
+            return await super().resolve_connection_async(connection, args, iterable, max_limit)
+        ordering, queryset, finish = cls.page_query(args, iterable, max_limit)
+        nodes = [node async for node in queryset]
+        return cls.page_connection(connection, ordering, *finish(nodes))
+
+    @classmethod
+    def page_query(cls, args, iterable, max_limit):
+        """
+        Returns ``(ordering, queryset, finish)``: the rows to fetch for the
+        requested page, and a function turning them into ``(nodes,
+        has_previous_page, has_next_page)``.
+        """
+        if args.get("offset"):
+            raise GraphQLError("offset is not supported here; paginate with after/before.")
+
+        first, last = args.get("first"), args.get("last")
+        after, before = args.get("after"), args.get("before")
+        if first is None and last is None:
+            first = max_limit
+
+        ordering = keyset_ordering(iterable)
+        queryset = iterable.order_by(*order_by_terms(ordering))
+        if after:
+            queryset = queryset.filter(seek_filter(ordering, decode_cursor(ordering, after)))
+        if before:
+            queryset = queryset.filter(seek_filter(ordering, decode_cursor(ordering, before), forward=False))
+
+        if first is None and last is not None:
+            # Walk backwards from ``before`` (or the end) and flip the page.
+            def finish(nodes):
+                return nodes[:last][::-1], len(nodes) > last, bool(before)
+            return ordering, queryset.order_by(*order_by_terms(ordering, reverse=True))[:last + 1], finish
+
+        def finish(nodes):
+            has_next_page = first is not None and len(nodes) > first
+            nodes = nodes[:first]
+            has_previous_page = bool(after)
+            if last is not None and len(nodes) > last:
+                nodes, has_previous_page = nodes[-last:], True
+            return nodes, has_previous_page, has_next_page
+        return ordering, queryset if first is None else queryset[:first + 1], finish
+
+    @classmethod
+    def page_connection(cls, connection, ordering, nodes, has_previous_page, has_next_page):
+        edges = [connection.Edge(node=node, cursor=encode_cursor(ordering, node)) for node in nodes]
+        result = connection(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous_page,
+                has_next_page=has_next_page,
+            ),
+        )
+        result.iterable = nodes
+        result.length = None
+        return result
 
 class CustomerType(DjangoObjectType):
+    orders = BatchedConnectionField(lambda: OrderType, required=True)
+
     class Meta:
         model = Customer
         fields = "__all__"
         interfaces = (graphene.relay.Node,)
         filterset_class = CustomerFilter
 
+    def resolve_orders(self, info, **kwargs):
+        if has_filter_args(kwargs):
+            return Order.objects.filter(customer=self)
+        return get_loaders(info).customer_orders(nested_page_limit(kwargs)).load(self.pk)
+
 class ProductType(DjangoObjectType):
+    orders = BatchedConnectionField(lambda: OrderType, required=True)
+
     class Meta:
         model = Product
         fields = "__all__"
         interfaces = (graphene.relay.Node,)
         filterset_class = ProductFilter
 
+    def resolve_orders(self, info, **kwargs):
+        if has_filter_args(kwargs):
+            return Order.objects.filter(products=self)
+        return get_loaders(info).product_orders(nested_page_limit(kwargs)).load(self.pk)
+
 class OrderType(DjangoObjectType):
-    total_amount = graphene.Decimal()
+    products = BatchedConnectionField(ProductType, required=True)
     
     class Meta:
         model = Order
@@ -33,8 +257,18 @@ class OrderType(DjangoObjectType):
         interfaces = (graphene.relay.Node,)
         filterset_class = OrderFilter
     
-    def resolve_total_amount(self, info):
-        return self.total_amount
+    def resolve_customer(self, info):
+        return get_loaders(info).order_customer.load(self.customer_id)
+
+    def resolve_products(self, info, **kwargs):
+        if has_filter_args(kwargs):
+            return self.products.all()
+        return get_loaders(info).order_products.load(self.pk)
+
+class CrmReportType(DjangoObjectType):
+    class Meta:
+        model = CrmReport
+        exclude = ("id",)
 
 class CustomerInput(graphene.InputObjectType):
     name = graphene.String(required=True)
@@ -46,11 +280,21 @@ class CreateProductInput(graphene.InputObjectType):
     price = graphene.Float(required=True)
     stock = graphene.Int()
 
+class OrderLineInput(graphene.InputObjectType):
+    product_id = graphene.UUID(required=True)
+    quantity = graphene.Int(default_value=1)
+
 class CreateOrderInput(graphene.InputObjectType):
     customer_id = graphene.UUID(required=True)
-    product_ids = graphene.List(graphene.UUID, required=True)
+    # One unit of each product; ``items`` takes quantities.
+    product_ids = graphene.List(graphene.UUID)
+    items = graphene.List(graphene.NonNull(OrderLineInput))
     order_date = graphene.DateTime()
 
+class OrderLineError(graphene.ObjectType):
+    product_id = graphene.UUID()
+    message = graphene.String()
+
 class CreateCustomer(graphene.Mutation):
     class Arguments:
         input = CustomerInput(required=True)
@@ -65,13 +309,12 @@ class CreateCustomer(graphene.Mutation):
         name = input.name
         email = input.email
         phone = input.phone
-        # validate email
-        try:
-            validate_email(email)
-        except ValidationError:
+
+        error = customer_input_error(email, phone)
+        if error:
             return cls(
                 success=False,
-                message="Invalid email format.",
+                message=error,
                 customer=None
             )
         
@@ -83,18 +326,11 @@ class CreateCustomer(graphene.Mutation):
                 customer=None
             )
         
-        # Validate phone format (if provided)
-        if phone:
-            pattern = r"^(\+\d{1,15}|\d{3}-\d{3}-\d{4})$"
-            if not re.match(pattern, phone):
-                return cls(
-                    success=False,
-                    message="Invalid phone format. Use +1234567890 or 123-456-7890.",
-                    customer=None
-                )
-        
         customer = Customer(name=name, email=email, phone=phone)
-        customer.save()
+        with transaction.atomic():
+            customer.save()
+            increment_counters(customers=1)
+            invalidate(Customer)
         
         return cls(
             success=True,
@@ -102,38 +338,75 @@ class CreateCustomer(graphene.Mutation):
             customer=customer
         )
 
+class BulkCustomerError(graphene.ObjectType):
+    index = graphene.Int()
+    email = graphene.String()
+    message = graphene.String()
+
 class BulkCreateCustomers(graphene.Mutation):
     class Arguments:
         input = graphene.List(CustomerInput,
                                  required=True)
+        chunk_size = graphene.Int()
 
     customers = graphene.List(CustomerType)
     errors = graphene.List(graphene.String)
+    row_errors = graphene.List(BulkCustomerError)
     
     @classmethod
-    def mutate(cls, root, info, input):
+    def mutate(cls, root, info, input, chunk_size=None):
+        if chunk_size is None:
+            chunk_size = settings.CRM_BULK_CHUNK_SIZE
+        elif not 1 <= chunk_size <= MAX_BULK_CHUNK_SIZE:
+            return cls(customers=[],
+                       errors=[f"chunkSize must be between 1 and {MAX_BULK_CHUNK_SIZE}."],
+                       row_errors=[])
+        row_errors = []
+        first_seen = {}
+        pending = []
+
+        # Validate and dedupe in memory before touching the database.
+        for index, data in enumerate(input):
+            error = customer_input_error(data.email, data.phone)
+            if not error and data.email in first_seen:
+                error = f"Duplicate of row {first_seen[data.email]}."
+            if error:
+                row_errors.append(BulkCustomerError(index=index, email=data.email, message=error))
+                continue
+            first_seen[data.email] = index
+            pending.append((index, Customer(name=data.name, email=data.email, phone=data.phone)))
+
+        existing = set()
+        for emails in chunked(first_seen, chunk_size):
+            existing.update(
+                Customer.objects.filter(email__in=emails).values_list("email", flat=True)
+            )
+
         created = []
-        errors = []
-        
-        with transaction.atomic():
-            for data in input:
-                name = data.name
-                email = data.email
-                phone = data.phone
-                
-                if Customer.objects.filter(email=email).exists():
-                    errors.append(f"{email}: already exists")
-                    continue
-                
-                customer = Customer.objects.create(
-                    name=name,
-                    email=email,
-                    phone=phone
-                )
+        for index, customer in pending:
+            if customer.email in existing:
+                row_errors.append(BulkCustomerError(
+                    index=index, email=customer.email, message="Email already exists."
+                ))
+            else:
                 created.append(customer)
 
+        try:
+            with transaction.atomic():
+                for customers in chunked(created, chunk_size):
+                    Customer.objects.bulk_create(customers)
+                increment_counters(customers=len(created))
+                invalidate(Customer)
+        except IntegrityError as e:
+            # Another writer inserted one of these emails after our lookup.
+            return cls(customers=[],
+                       errors=[f"Bulk insert failed: {e}"],
+                       row_errors=row_errors)
+
+        row_errors.sort(key=lambda error: error.index)
         return cls(customers=created,
-                   errors=errors)
+                   errors=[f"[{e.index}] {e.email}: {e.message}" for e in row_errors],
+                   row_errors=row_errors)
 
 class CreateProduct(graphene.Mutation):
     class Arguments:
@@ -166,6 +439,7 @@ class CreateProduct(graphene.Mutation):
         product = Product.objects.create(
             name=name, price=price, stock=stock
         )
+        invalidate(Product)
         
         return cls(
             success=True,
@@ -173,6 +447,25 @@ class CreateProduct(graphene.Mutation):
             product=product
         )
 
+def order_quantities(input):
+    """
+    Merges a CreateOrderInput's ``productIds`` (one unit each) and
+    ``items`` into ``{product_id: quantity}``. Returns ``(quantities,
+    error)``.
+    """
+    quantities = {}
+    for product_id in input.product_ids or []:
+        quantities[product_id] = quantities.get(product_id, 0) + 1
+    for line in input.items or []:
+        # An explicit null gets the declared default of one.
+        quantity = 1 if line.quantity is None else line.quantity
+        if quantity < 1:
+            return None, f"Quantity for product {line.product_id} must be at least 1."
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + quantity
+    if not quantities:
+        return None, "At least one product must be selected."
+    return quantities, None
+
 class CreateOrder(graphene.Mutation):
     class Arguments:
         input = CreateOrderInput(required=True)
@@ -180,100 +473,237 @@ class CreateOrder(graphene.Mutation):
     order = graphene.Field(OrderType)
     message = graphene.String()
     errors = graphene.List(graphene.String)
+    line_errors = graphene.List(OrderLineError)
 
     @classmethod
     def mutate(cls, root, info, input):
-        errors = []
-        
+        quantities, error = order_quantities(input)
+        if error:
+            return cls(errors=[error])
+
         # Validate Customer
-        try:
-            customer = Customer.objects.get(id=input.customer_id)
-        except Customer.DoesNotExist:
-            errors.append("Invalid customer ID.")
-            return cls(errors=errors)
-        
-        # Validate product list
-        if not input.product_ids:
-            errors.append("At least one product must be selected.")
-            return cls(errors=errors)
-        
-        # Gets all valid products
-        products = Product.objects.filter(id__in=input.product_ids)
-        if products.count() != len(input.product_ids):
-            valid_ids = {str(p.id) for p in products}
-            invalid_ids = [str(pid) for pid in input.product_ids if str(pid) not in valid_ids]
-            errors.append(f"Invalid product IDs: {', '.join(invalid_ids)}")
-            return cls(errors=errors)
-        
+        if not Customer.objects.filter(id=input.customer_id).exists():
+            return cls(errors=["Invalid customer ID."])
+
         try:
             with transaction.atomic():
+                # Stock first: the UPDATE takes the write lock, so the
+                # rest of the order cannot be interleaved with another.
+                prices = reserve_stock(quantities)
+                # Snapshot prices so the stored total never drifts.
+                items = [
+                    OrderItem(product_id=product_id, quantity=quantity, unit_price=prices[product_id])
+                    for product_id, quantity in quantities.items()
+                ]
                 order = Order.objects.create(
-                    customer=customer,
-                    order_date=input.order_date
+                    customer_id=input.customer_id,
+                    order_date=input.order_date or timezone.now(),
+                    total_amount=sum(item.line_total for item in items)
                 )
-                order.products.set(products)
+                for item in items:
+                    item.order = order
+                OrderItem.objects.bulk_create(items)
+                increment_counters(orders=1, revenue=order.total_amount)
+                invalidate(Product)
                 
                 return cls(
                     order=order,
                     message="Order created successfully",
                     errors=[]
                 )
+        except InsufficientStock as e:
+            line_errors = [
+                OrderLineError(product_id=product_id, message=message)
+                for product_id, message in e.problems.items()
+            ]
+            return cls(errors=[error.message for error in line_errors], line_errors=line_errors)
         except Exception as e:
-            errors.append(f"Unexpected error: {str(e)}")
-            return cls(errors=errors)
+            return cls(errors=[f"Unexpected error: {str(e)}"])
+
+class EnqueueOrders(graphene.Mutation):
+    """
+    Queues orders for write-behind placement (see crm.ingest) and returns
+    a ticket per order, to poll with ``orderTicket``. Input is checked
+    here; stock is reserved when the order is placed.
+    """
+
+    class Arguments:
+        input = graphene.List(graphene.NonNull(CreateOrderInput), required=True)
+
+    # In input order; null for rejected orders.
+    tickets = graphene.List(graphene.UUID)
+    errors = graphene.List(graphene.String)
+
+    @classmethod
+    def mutate(cls, root, info, input):
+        if len(input) > MAX_ENQUEUED_ORDERS:
+            return cls(tickets=[], errors=[f"At most {MAX_ENQUEUED_ORDERS} orders per call."])
+
+        errors, parsed = {}, []
+        for index, data in enumerate(input):
+            quantities, error = order_quantities(data)
+            if error:
+                errors[index] = error
+            parsed.append(quantities)
+
+        customers = set(Customer.objects.filter(
+            pk__in={data.customer_id for data in input}
+        ).values_list("pk", flat=True))
+        products = set(Product.objects.filter(
+            pk__in={pk for quantities in parsed if quantities for pk in quantities}
+        ).values_list("pk", flat=True))
+
+        accepted = {}
+        for index, (data, quantities) in enumerate(zip(input, parsed)):
+            if quantities is None:
+                continue
+            if data.customer_id not in customers:
+                errors[index] = "Invalid customer ID."
+            elif not products.issuperset(quantities):
+                invalid = next(pk for pk in quantities if pk not in products)
+                errors[index] = f"Invalid product ID: {invalid}"
+            else:
+                accepted[index] = (data.customer_id, quantities, data.order_date)
+
+        tickets = dict(zip(accepted, enqueue_orders(accepted.values()))) if accepted else {}
+        return cls(
+            tickets=[tickets.get(index) for index in range(len(input))],
+            errors=[f"[{index}] {error}" for index, error in sorted(errors.items())],
+        )
+
+class OrderTicketStatus(graphene.Enum):
+    PENDING = "pending"
+    PLACED = OrderTicket.PLACED
+    FAILED = OrderTicket.FAILED
+
+class OrderTicketType(graphene.ObjectType):
+    ticket = graphene.UUID()
+    status = graphene.Field(OrderTicketStatus)
+    order = graphene.Field(OrderType)
+    errors = graphene.List(graphene.String)
+
+def order_ticket(ticket):
+    row = OrderTicket.objects.filter(pk=ticket).first()
+    if row is None:
+        return OrderTicketType(ticket=ticket, status=OrderTicketStatus.PENDING.value, errors=[])
+    # The order may since have been deleted with its customer.
+    order = Order.objects.filter(pk=row.order_id).first() if row.order_id else None
+    return OrderTicketType(ticket=ticket, status=row.status, order=order, errors=row.errors)
 
 class Query(graphene.ObjectType):
-    all_customers = DjangoFilterConnectionField(
+    all_customers = KeysetConnectionField(
         CustomerType,
-        order_by=graphene.List(of_type=graphene.String)
+        cache_models=(Customer,),
+        # Passed via ``args``: DjangoFilterConnectionField swallows an
+        # ``order_by`` keyword without exposing it as an argument.
+        args={"order_by": graphene.List(of_type=graphene.String), "search": graphene.String()}
     )
-    all_products = DjangoFilterConnectionField(
+    all_products = KeysetConnectionField(
         ProductType,
-        order_by=graphene.List(of_type=graphene.String)
+        cache_models=(Product,),
+        args={"order_by": graphene.List(of_type=graphene.String), "search": graphene.String()}
     )
-    all_orders = DjangoFilterConnectionField(
+    all_orders = KeysetConnectionField(
         OrderType,
-        order_by=graphene.List(of_type=graphene.String)
+        args={"order_by": graphene.List(of_type=graphene.String), "search": graphene.String()}
+    )
+    # Status of an order queued with enqueueOrders.
+    order_ticket = graphene.Field(OrderTicketType, ticket=graphene.UUID(required=True))
+    # Stored weekly reports, newest first (see crm.reports).
+    crm_reports = graphene.List(
+        graphene.NonNull(CrmReportType),
+        since=graphene.Date(),
+        limit=graphene.Int(default_value=12),
     )
+    total_customers = graphene.Int()
+    total_orders = graphene.Int()
+    total_revenue = graphene.Decimal()
+
+    def resolve_total_customers(root, info):
+        return get_loaders(info).counter(CrmCounter.CUSTOMERS)
+
+    def resolve_total_orders(root, info):
+        return get_loaders(info).counter(CrmCounter.ORDERS)
+
+    def resolve_total_revenue(root, info):
+        return get_loaders(info).counter(CrmCounter.REVENUE)
+
+    def resolve_order_ticket(root, info, ticket):
+        if get_loaders(info).is_async:
+            return run_sync(order_ticket, ticket)
+        return order_ticket(ticket)
+
+    def resolve_crm_reports(root, info, since=None, limit=12):
+        if not 1 <= limit <= MAX_REPORTS:
+            raise GraphQLError(f"limit must be between 1 and {MAX_REPORTS}.")
+        reports = CrmReport.objects.order_by("-period_start")
+        if since:
+            reports = reports.filter(period_start__gte=since)
+        reports = reports[:limit]
+        if get_loaders(info).is_async:
+            return run_sync(list, reports)
+        return reports
 
-    def resolve_all_customers(root, info, order_by=None, **kwargs):
-        queryset = Customer.objects.all()
-        if order_by:
-            queryset = queryset.order_by(*order_by)
-        return queryset
+    # ``search`` matches substrings of the indexed text columns and, unless
+    # ``order_by`` is given, orders customers and products by relevance.
+    def resolve_all_customers(root, info, order_by=None, search=None, **kwargs):
+        if search:
+            return ranked_search(Customer.objects.all(), search).order_by(*(order_by or ["search_rank"]))
+        return Customer.objects.order_by(*(order_by or ["created_at"]))
 
-    def resolve_all_products(root, info, order_by=None, **kwargs):
-        queryset = Product.objects.all()
-        if order_by:
-            queryset = queryset.order_by(*order_by)
-        return queryset
+    def resolve_all_products(root, info, order_by=None, search=None, **kwargs):
+        if search:
+            return ranked_search(Product.objects.all(), search).order_by(*(order_by or ["search_rank"]))
+        return Product.objects.order_by(*(order_by or ["name"]))
 
-    def resolve_all_orders(root, info, order_by=None, **kwargs):
-        queryset = Order.objects.all()
-        if order_by:
-            queryset = queryset.order_by(*order_by)
-        return queryset
+    def resolve_all_orders(root, info, order_by=None, search=None, **kwargs):
+        queryset = search_orders(Order.objects.all(), search) if search else Order.objects.all()
+        return queryset.order_by(*(order_by or ["-order_date"]))
 
 class UpdateLowStockProducts(graphene.Mutation):
     class Arguments:
-        pass  # No arguments needed
+        threshold = graphene.Int(default_value=10)
+        restock_amount = graphene.Int(default_value=10)
+        chunk_size = graphene.Int()
 
     success = graphene.Boolean()
     message = graphene.String()
     updated_products = graphene.List(ProductType)
 
-    def mutate(self, info):
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        updated = []
+    def mutate(self, info, threshold, restock_amount, chunk_size=None):
+        if threshold < 0 or restock_amount <= 0:
+            return UpdateLowStockProducts(
+                success=False,
+                message="Threshold must be non-negative and restock amount positive.",
+                updated_products=[]
+            )
 
-        for product in low_stock_products:
-            product.stock += 10  # Simulate restocking
-            product.save()
-            updated.append(product)
+        # Only read back the rows (and columns) the client asked for.
+        requested = selected_fields(info, "updated_products")
+        if requested is not None:
+            low_stock = Product.objects.filter(stock__lt=threshold)[:MAX_UPDATED_PRODUCTS + 1]
+            if low_stock.count() > MAX_UPDATED_PRODUCTS:
+                return UpdateLowStockProducts(
+                    success=False,
+                    message=(
+                        f"More than {MAX_UPDATED_PRODUCTS} products are low on stock; "
+                        "leave out updatedProducts to restock them all."
+                    ),
+                    updated_products=[]
+                )
+        count, ids = restock_low_stock_products(
+            threshold, restock_amount, chunk_size, collect_ids=requested is not None
+        )
+        if count:
+            invalidate(Product)
+        updated = []
+        if requested is not None:
+            columns = [f.name for f in Product._meta.concrete_fields if f.name in requested]
+            updated = list(Product.objects.filter(pk__in=ids).only(*columns))
 
         return UpdateLowStockProducts(
             success=True,
-            message=f"Updated {len(updated)} low-stock products.",
+            message=f"Updated {count} low-stock products.",
             updated_products=updated
         )
 
@@ -282,4 +712,5 @@ class Mutation(graphene.ObjectType):
     bulk_create_customers = BulkCreateCustomers.Field()
     create_product = CreateProduct.Field()
     create_order = CreateOrder.Field()
+    enqueue_orders = EnqueueOrders.Field()
     update_low_stock_products = UpdateLowStockProducts.Field()
@@ -0,0 +1,218 @@
+from collections import namedtuple
+from functools import reduce
+from operator import or_
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.models import Expression, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.sql.constants import INNER
+from .models import Customer, OrderItem, Product
+
+SearchIndex = namedtuple("SearchIndex", "model table columns")
+
+# FTS5 tables over the model tables' rowids. The trigram tokenizer
+# matches substrings, so these answer the same questions as icontains.
+# VACUUM renumbers the rowids of these UUID-keyed tables, so vacuum with
+# ``manage.py rebuild_search_index --vacuum``, which rebuilds them after.
+SEARCH_INDEXES = {
+    Customer: SearchIndex(Customer, "crm_customer_fts", ("name", "email")),
+    Product: SearchIndex(Product, "crm_product_fts", ("name",)),
+}
+
+# Trigram matching needs at least three characters.
+MIN_QUERY_LENGTH = 3
+
+_available = set()
+
+
+def index_statements(index):
+    source = index.model._meta.db_table
+    columns = ", ".join(index.columns)
+    new_values = ", ".join(f"new.{c}" for c in index.columns)
+    old_values = ", ".join(f"old.{c}" for c in index.columns)
+    insert = f"INSERT INTO {index.table}(rowid, {columns}) VALUES (new.rowid, {new_values});"
+    delete = (
+        f"INSERT INTO {index.table}({index.table}, rowid, {columns}) "
+        f"VALUES ('delete', old.rowid, {old_values});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index.table} USING fts5("
+        f"{columns}, content='{source}', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {index.table}_ai AFTER INSERT ON {source} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index.table}_ad AFTER DELETE ON {source} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index.table}_au AFTER UPDATE OF {columns} ON {source} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def ensure_search_indexes(connection, rebuild=False):
+    """
+    Creates any missing FTS5 index and its sync triggers, and rebuilds it
+    from the model table.
+
+    Django remakes SQLite tables when a migration alters them, which drops
+    the triggers and renumbers rowids, so this runs after every migrate.
+    Returns False when the database has no FTS5 support.
+    """
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {name for (name,) in cursor.fetchall()}
+        for index in SEARCH_INDEXES.values():
+            names = {index.table, f"{index.table}_ai", f"{index.table}_ad", f"{index.table}_au"}
+            if names <= existing and not rebuild:
+                continue
+            try:
+                for statement in index_statements(index):
+                    cursor.execute(statement)
+            except OperationalError:
+                return False
+            cursor.execute(f"INSERT INTO {index.table}({index.table}) VALUES ('rebuild')")
+    return True
+
+
+def search_index(model, using=DEFAULT_DB_ALIAS):
+    """Returns the model's SearchIndex if its FTS table exists, else None."""
+    index = SEARCH_INDEXES.get(model)
+    connection = connections[using]
+    if index is None or connection.vendor != "sqlite":
+        return None
+    if (using, index.table) not in _available:
+        if index.table not in connection.introspection.table_names():
+            return None
+        _available.add((using, index.table))
+    return index
+
+
+def fts_phrase(value, columns=None):
+    phrase = '"' + value.replace('"', '""') + '"'
+    return "{%s} : %s" % (" ".join(columns), phrase) if columns else phrase
+
+
+def matching_pks(index, expression):
+    # Refers to no outer table, so it also works inside Django subqueries,
+    # where the model table is aliased.
+    opts = index.model._meta
+    return RawSQL(
+        f"SELECT {opts.pk.column} FROM {opts.db_table} WHERE rowid IN "
+        f"(SELECT rowid FROM {index.table} WHERE {index.table} MATCH %s)",
+        [expression],
+    )
+
+
+class SearchHits:
+    """
+    Joins a model table to its FTS5 matches for ``expression`` through a
+    derived table of ``(pk, rank)``, so MATCH runs once per query rather
+    than once per candidate row. Added to a query's alias map like a
+    relation join (see ``ranked_search``).
+    """
+
+    join_type = INNER
+    nullable = False
+    filtered_relation = None
+
+    def __init__(self, index, expression, parent_alias, table_alias=None):
+        self.index = index
+        self.expression = expression
+        self.parent_alias = parent_alias
+        self.table_alias = table_alias
+        self.table_name = f"{index.table}_hits"
+
+    @property
+    def identity(self):
+        return self.__class__, self.table_name, self.parent_alias, self.expression
+
+    def __eq__(self, other):
+        return isinstance(other, SearchHits) and self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+    def equals(self, other):
+        return self == other
+
+    def demote(self):
+        return self
+
+    promote = demote
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(
+            self.index,
+            self.expression,
+            change_map.get(self.parent_alias, self.parent_alias),
+            change_map.get(self.table_alias, self.table_alias),
+        )
+
+    def as_sql(self, compiler, connection):
+        opts, fts = self.index.model._meta, self.index.table
+        qn = compiler.quote_name_unless_alias
+        alias = qn(self.table_alias)
+        sql = (
+            f"INNER JOIN (SELECT {opts.db_table}.{opts.pk.column} AS pk, {fts}.rank AS rank "
+            f"FROM {fts} JOIN {opts.db_table} ON {opts.db_table}.rowid = {fts}.rowid "
+            f"WHERE {fts} MATCH %s) {alias} "
+            f"ON {alias}.pk = {qn(self.parent_alias)}.{qn(opts.pk.column)}"
+        )
+        return sql, [self.expression]
+
+
+class SearchRank(Expression):
+    """The FTS5 rank (bm25) of a SearchHits join; lower is more relevant."""
+
+    output_field = FloatField()
+
+    def __init__(self, alias):
+        super().__init__()
+        self.alias = alias
+
+    def as_sql(self, compiler, connection):
+        return f"{compiler.quote_name_unless_alias(self.alias)}.rank", []
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(change_map.get(self.alias, self.alias))
+
+    def get_group_by_cols(self):
+        return [self]
+
+
+def filter_contains(queryset, text, fields=None):
+    """
+    Case-insensitive substring filter on ``fields`` (every indexed column
+    by default), answered from the FTS index when there is one and with
+    ``icontains`` otherwise.
+    """
+    model = queryset.model
+    columns = tuple(fields or SEARCH_INDEXES[model].columns)
+    index = search_index(model, queryset.db)
+    if index is None or len(text) < MIN_QUERY_LENGTH or not set(columns) <= set(index.columns):
+        return queryset.filter(reduce(or_, (Q(**{f"{c}__icontains": text}) for c in columns)))
+    expression = fts_phrase(text, columns if fields else None)
+    return queryset.filter(pk__in=matching_pks(index, expression))
+
+
+def ranked_search(queryset, text):
+    """
+    Restricts ``queryset`` to rows whose indexed columns contain ``text``
+    and annotates ``search_rank`` (FTS5 bm25, lower is more relevant).
+    """
+    index = search_index(queryset.model, queryset.db)
+    if index is None or len(text) < MIN_QUERY_LENGTH:
+        queryset = filter_contains(queryset, text)
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    # The join both restricts the rows and supplies their rank.
+    queryset = queryset.all()
+    query = queryset.query
+    alias = query.join(SearchHits(index, fts_phrase(text), query.get_initial_alias()))
+    return queryset.annotate(search_rank=SearchRank(alias))
+
+
+def search_orders(queryset, text):
+    """Orders whose customer or any of whose products match ``text``."""
+    customers = filter_contains(Customer.objects.all(), text)
+    items = OrderItem.objects.filter(
+        product__in=filter_contains(Product.objects.all(), text)
+    ).values("order_id")
+    return queryset.filter(Q(customer__in=customers) | Q(pk__in=items))
@@ -0,0 +1,195 @@
+"""
+Deterministic data generation for ``manage.py seed_db``.
+
+Every chunk draws from its own ``random.Random`` seeded with the run's
+seed and the chunk number, so a seed yields the same rows whatever the
+number of worker processes. Like ``crm.importer`` this module must not
+import the models at import time: workers import it before
+``django.setup()`` runs.
+"""
+import random
+import uuid
+from bisect import bisect
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import connections
+
+FIRST_NAMES = (
+    "Alice", "Bob", "Carol", "David", "Emma", "Farid", "Grace", "Hiro", "Ines", "James",
+    "Kofi", "Laura", "Mateo", "Nadia", "Omar", "Priya", "Quinn", "Rosa", "Sven", "Tariq",
+    "Uma", "Victor", "Wen", "Ximena", "Yusuf", "Zoe", "Amara", "Bruno", "Chloe", "Dmitri",
+)
+LAST_NAMES = (
+    "Smith", "Okafor", "Garcia", "Chen", "Muller", "Rossi", "Tanaka", "Kowalski", "Silva", "Nguyen",
+    "Haddad", "Johansson", "Patel", "Dubois", "Moreno", "Kim", "Novak", "Walker", "Ibrahim", "Costa",
+)
+EMAIL_DOMAINS = ("example.com", "example.org", "example.net")
+PRODUCT_ADJECTIVES = (
+    "Compact", "Wireless", "Ergonomic", "Portable", "Smart", "Classic", "Premium", "Rugged",
+    "Slim", "Deluxe", "Eco", "Pro",
+)
+PRODUCT_NOUNS = (
+    "Laptop", "Mouse", "Keyboard", "Monitor", "Headset", "Webcam", "Charger", "Speaker",
+    "Tablet", "Router", "Lamp", "Backpack", "Chair", "Desk", "Microphone", "Drive",
+)
+
+# Relative order volume per weekday (Monday first) and hour of day (UTC).
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.05, 1.1, 1.2, 1.35, 1.15)
+HOUR_WEIGHTS = (
+    0.2, 0.1, 0.1, 0.1, 0.1, 0.2, 0.4, 0.7, 1.0, 1.2, 1.3, 1.4,
+    1.5, 1.4, 1.3, 1.3, 1.4, 1.6, 1.9, 2.1, 2.0, 1.6, 1.0, 0.5,
+)
+HOUR_CUM_WEIGHTS = list(accumulate(HOUR_WEIGHTS))
+# Items per order and quantity per item.
+ITEM_COUNT_CUM_WEIGHTS = list(accumulate((45, 30, 15, 7, 3)))
+QUANTITY_CUM_WEIGHTS = list(accumulate((70, 20, 7, 3)))
+
+CENT = Decimal("0.01")
+
+ORDER_FIELDS = ("id", "customer", "order_date", "total_amount")
+ITEM_FIELDS = ("order", "product", "quantity", "unit_price")
+
+
+def chunk_random(seed, kind, number):
+    return random.Random(f"{seed}:{kind}:{number}")
+
+
+def random_uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def zipf_cum_weights(n, exponent):
+    """Cumulative weights giving rank ``r`` a share proportional to 1 / (r + 1) ** exponent."""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+class Calendar:
+    """
+    Draws timestamps over the ``days`` before ``end``: volume grows
+    linearly to ``growth`` times its starting level and follows weekly
+    and daily cycles.
+    """
+
+    def __init__(self, end, days, growth=3.0):
+        self.start = end - timedelta(days=days)
+        self.days = days
+        self.day_cum_weights = list(accumulate(
+            (1 + (growth - 1) * day / days) * WEEKDAY_WEIGHTS[(self.start + timedelta(days=day)).weekday()]
+            for day in range(days)
+        ))
+
+    def draw(self, rng, first_day=0):
+        """A timestamp on ``first_day`` or later, following the calendar's curve."""
+        floor = self.day_cum_weights[first_day - 1] if first_day else 0
+        day = bisect(self.day_cum_weights, floor + rng.random() * (self.day_cum_weights[-1] - floor))
+        hour = rng.choices(range(24), cum_weights=HOUR_CUM_WEIGHTS)[0]
+        return self.start + timedelta(days=min(day, self.days - 1), hours=hour, seconds=rng.randrange(3600))
+
+    def draw_after(self, rng, earliest):
+        first_day = min(max((earliest - self.start).days + 1, 0), self.days - 1)
+        return self.draw(rng, first_day)
+
+
+def customer_rows(seed, number, start, count, calendar):
+    """Returns ``(id, name, email, phone, created_at)`` tuples for customers start..start+count."""
+    rng = chunk_random(seed, "customers", number)
+    rows = []
+    for index in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        email = f"{first}.{last}.{index}@{rng.choice(EMAIL_DOMAINS)}".lower()
+        phone = f"+1{rng.randrange(2000000000, 9999999999)}" if rng.random() < 0.8 else None
+        rows.append((random_uuid(rng), f"{first} {last}", email, phone, calendar.draw(rng)))
+    return rows
+
+
+def product_rows(seed, number, start, count):
+    """Returns ``(id, name, price, stock)`` tuples; prices are log-normal around $40."""
+    rng = chunk_random(seed, "products", number)
+    rows = []
+    for index in range(start, start + count):
+        name = f"{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_NOUNS)} {index}"
+        price = Decimal(min(max(rng.lognormvariate(3.7, 1.0), 1), 5000)).quantize(CENT)
+        rows.append((random_uuid(rng), name, price, rng.randrange(0, 500)))
+    return rows
+
+
+class OrderGenerator:
+    """
+    Holds what order generation draws from: customers and products listed
+    in popularity order (rank 0 is the most active customer and the best
+    seller), sampled with Zipf weights.
+    """
+
+    def __init__(self, customers, products, calendar, exponent=0.8):
+        self.customers = customers  # [(id, created_at)]
+        self.products = products  # [(id, price)]
+        self.calendar = calendar
+        self.customer_weights = zipf_cum_weights(len(customers), exponent)
+        self.product_weights = zipf_cum_weights(len(products), exponent)
+
+    def rows(self, seed, number, count):
+        """
+        Returns ``(orders, items)``: ``(id, customer_id, order_date,
+        total_amount)`` and ``(order_id, product_id, quantity, unit_price)``
+        tuples for one chunk of ``count`` orders.
+        """
+        rng = chunk_random(seed, "orders", number)
+        most_items = min(len(ITEM_COUNT_CUM_WEIGHTS), len(self.products))
+        orders, items = [], []
+        for _ in range(count):
+            order_id = random_uuid(rng)
+            order_date = self.calendar.draw(rng)
+            # Redraw customers who had not signed up yet, so the dates keep
+            # the calendar's shape instead of piling up after late signups.
+            for _ in range(8):
+                customer_id, created_at = rng.choices(self.customers, cum_weights=self.customer_weights)[0]
+                if created_at <= order_date:
+                    break
+            else:
+                order_date = self.calendar.draw_after(rng, created_at)
+            wanted = rng.choices(range(1, 6), cum_weights=ITEM_COUNT_CUM_WEIGHTS)[0]
+            chosen = {}
+            # Popular products collide often; a few extra draws keep the count close.
+            for product_id, price in rng.choices(self.products, cum_weights=self.product_weights, k=wanted * 2):
+                chosen.setdefault(product_id, price)
+                if len(chosen) == min(wanted, most_items):
+                    break
+            total = Decimal("0.00")
+            for product_id, price in chosen.items():
+                quantity = rng.choices(range(1, 5), cum_weights=QUANTITY_CUM_WEIGHTS)[0]
+                items.append((order_id, product_id, quantity, price))
+                total += price * quantity
+            orders.append((order_id, customer_id, order_date, total))
+        return orders, items
+
+
+def db_rows(model, field_names, rows, using):
+    """
+    Converts ``rows`` to the parameters the database expects for
+    ``field_names``, as bulk_create would, so the conversion cost is paid
+    in the worker rather than by the single writing process.
+    """
+    connection = connections[using]
+    fields = [model._meta.get_field(name) for name in field_names]
+    return [tuple(field.get_db_prep_save(value, connection) for field, value in zip(fields, row)) for row in rows]
+
+
+_generator = None
+
+
+def init_order_worker(*args):
+    global _generator
+    _generator = OrderGenerator(*args)
+
+
+def order_chunk(seed, number, count, using):
+    """
+    Worker entry point; ``init_order_worker`` must have run in this
+    process. Returns database-ready order and item rows.
+    """
+    from .models import Order, OrderItem
+
+    orders, items = _generator.rows(seed, number, count)
+    return db_rows(Order, ORDER_FIELDS, orders, using), db_rows(OrderItem, ITEM_FIELDS, items, using)
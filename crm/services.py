@@ -0,0 +1,155 @@
+from decimal import Decimal
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from .models import Customer, Order, OrderItem, Product, CrmCounter
+
+
+def restock_low_stock_products(threshold=10, amount=10, chunk_size=None, collect_ids=False):
+    """
+    Adds ``amount`` to the stock of every product below ``threshold``.
+
+    The increment is done in SQL (``stock = stock + amount``) so it never
+    overwrites concurrent stock changes. Without ``chunk_size`` this is a
+    single UPDATE; with it, products are updated in primary-key ordered
+    batches so each statement holds the write lock only briefly.
+
+    Returns the number of updated rows and, if ``collect_ids`` is set,
+    their primary keys.
+    """
+    low_stock = Product.objects.filter(stock__lt=threshold)
+    if not chunk_size and not collect_ids:
+        return low_stock.update(stock=F("stock") + amount), []
+
+    updated, ids, last_pk = 0, [], None
+    while True:
+        remaining = low_stock.filter(pk__gt=last_pk) if last_pk else low_stock
+        pks = list(remaining.order_by("pk").values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            break
+        updated += low_stock.filter(pk__in=pks).update(stock=F("stock") + amount)
+        if collect_ids:
+            ids.extend(pks)
+        last_pk = pks[-1]
+        if not chunk_size:
+            break
+    return updated, ids
+
+
+class InsufficientStock(Exception):
+    """Raised by ``reserve_stock`` with a ``{product_id: message}`` dict of the failing lines."""
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("; ".join(problems.values()))
+
+
+def reserve_stock(quantities):
+    """
+    Takes ``quantities`` (``{product_id: units}``) off stock with a single
+    ``UPDATE ... SET stock = stock - qty WHERE stock >= qty``, so two
+    orders can never both take the last units. Returns ``{product_id:
+    price}`` for the reserved products, read after the UPDATE holds their
+    rows so prices cannot move under the order.
+
+    Reserves every line or none: if any product is unknown or short, the
+    UPDATE is rolled back and InsufficientStock says which. Call it inside
+    the transaction that creates the order. The number of queries does
+    not depend on the number of lines.
+    """
+    units = Case(
+        *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+        output_field=IntegerField(),
+    )
+    try:
+        with transaction.atomic():
+            reserved = Product.objects.filter(pk__in=quantities, stock__gte=units).update(
+                stock=F("stock") - units
+            )
+            if reserved != len(quantities):
+                raise InsufficientStock({})
+    except InsufficientStock:
+        # Rolled back to the savepoint, so stock reads as before the UPDATE.
+        raise InsufficientStock(stock_problems(quantities))
+    return dict(Product.objects.filter(pk__in=quantities).values_list("pk", "price"))
+
+
+def stock_problems(quantities):
+    """A ``{product_id: message}`` dict of the lines stock cannot cover."""
+    stock = {
+        pk: (name, available)
+        for pk, name, available in Product.objects.filter(pk__in=quantities).values_list("pk", "name", "stock")
+    }
+    problems = {}
+    for pk, quantity in quantities.items():
+        if pk not in stock:
+            problems[pk] = f"Invalid product ID: {pk}"
+            continue
+        name, available = stock[pk]
+        if available < quantity:
+            problems[pk] = f"Insufficient stock for {name}: {available} available, {quantity} requested."
+    # Stock moved back in between; the order can simply be retried.
+    return problems or {pk: "Stock changed while ordering; try again." for pk in quantities}
+
+
+def increment_counters(customers=0, orders=0, revenue=0):
+    """
+    Applies deltas to the CRM counters. Call it inside the transaction
+    that writes the customers/orders so the totals commit with them.
+
+    Only the mutations, importers, ``delete_orders`` and
+    ``cleanup_inactive_customers.delete_customers`` keep the counters in
+    step. Rows created or deleted any other way (``Model.delete()``, the
+    shell, fixtures) are not counted until ``rebuild_crm_counters`` runs.
+    """
+    deltas = {
+        CrmCounter.CUSTOMERS: customers,
+        CrmCounter.ORDERS: orders,
+        CrmCounter.REVENUE: revenue,
+    }
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        if not CrmCounter.objects.filter(name=name).update(value=F("value") + delta):
+            CrmCounter.objects.create(name=name, value=delta)
+
+
+def delete_orders(pks, using=DEFAULT_DB_ALIAS):
+    """
+    Deletes the orders ``pks`` with their order items and takes them off
+    the CRM counters in one update per counter. Returns ``(orders, revenue)``.
+    """
+    orders = Order.objects.using(using).filter(pk__in=pks)
+    totals = orders.aggregate(count=Count("pk"), revenue=Sum("total_amount"))
+    OrderItem.objects.using(using).filter(order_id__in=orders.values("pk"))._raw_delete(using)
+    orders._raw_delete(using)
+    revenue = totals["revenue"] or 0
+    increment_counters(orders=-totals["count"], revenue=-revenue)
+    return totals["count"], revenue
+
+
+def rebuild_counters():
+    """
+    Recomputes every CRM counter from the source tables. The counter rows
+    are locked before counting, so a write that bumps them meanwhile
+    either lands in the count or waits for the rebuild to commit.
+    """
+    with transaction.atomic():
+        list(CrmCounter.objects.select_for_update())
+        revenue = Order.objects.aggregate(total=Sum("total_amount"))["total"]
+        values = {
+            CrmCounter.CUSTOMERS: Customer.objects.count(),
+            CrmCounter.ORDERS: Order.objects.count(),
+            CrmCounter.REVENUE: revenue or Decimal("0.00"),
+        }
+        for name, value in values.items():
+            CrmCounter.objects.update_or_create(name=name, defaults={"value": value})
+    return values
+
+
+def get_counters():
+    """Returns all counters as a ``{name: value}`` dict in one query."""
+    values = dict.fromkeys(
+        (CrmCounter.CUSTOMERS, CrmCounter.ORDERS, CrmCounter.REVENUE), Decimal("0.00")
+    )
+    values.update(CrmCounter.objects.values_list("name", "value"))
+    return values
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from celery.schedules import crontab
 
@@ -82,7 +83,24 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Query operations read from here. Locally it is a snapshot of
+    # db.sqlite3 kept fresh with `manage.py snapshot_replica --every 10`.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'OPTIONS': {'init_command': 'PRAGMA query_only = ON'},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['alx_backend_graphql.db_routing.ReadReplicaRouter']
+
+# Reads fall back to default while the replica is further behind than
+# this, or missing.
+DATABASE_READ_REPLICA = {
+    'ALIAS': 'replica',
+    'MAX_LAG_SECONDS': 30.0,
 }
 
 
@@ -104,6 +122,93 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Rows per IN lookup / INSERT batch in bulkCreateCustomers.
+CRM_BULK_CHUNK_SIZE = 500
+
+# Parsed/validated query documents kept by the /graphql endpoint, which
+# also backs persisted queries. TTL is in seconds; None keeps entries
+# until they are evicted by size.
+GRAPHQL_DOCUMENT_CACHE = {
+    "MAX_SIZE": 1000,
+    "TTL": None,
+}
+
+# Budget checked on every /graphql operation before execution. Connections
+# count as their first/last argument (DEFAULT_PAGE_SIZE when omitted) and
+# plain lists as DEFAULT_LIST_SIZE. Set a limit to None to disable it.
+GRAPHQL_QUERY_LIMITS = {
+    "MAX_DEPTH": 12,
+    "MAX_NODES": 20000,
+    "MAX_COST": 50000,
+    "DEFAULT_PAGE_SIZE": 100,
+    "DEFAULT_LIST_SIZE": 10,
+}
+
+# Per-request timing (see alx_backend_graphql.instrumentation). Requests
+# are always aggregated into the /metrics histograms; a request sending
+# DEBUG_HEADER also gets its resolver and SQL timings in the response
+# extensions. Without a DEBUG_TOKEN the header is honoured in DEBUG only.
+# graphene-django adds DjangoDebugMiddleware when DEBUG is on. The schema
+# has no _debug field for it to report to, and the cursor wrapper it puts
+# on every connection (the read replica's too) is never taken off.
+GRAPHENE = {
+    'MIDDLEWARE': [],
+}
+
+GRAPHQL_INSTRUMENTATION = {
+    "ENABLED": True,
+    "DEBUG_HEADER": "X-GraphQL-Debug",
+    "DEBUG_TOKEN": None,
+    "METRICS_ALLOWED_IPS": ("127.0.0.1", "::1"),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'crm',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# Opt-in cache for allProducts/allCustomers pages. Entries expire after
+# TIMEOUT seconds and are orphaned as soon as a mutation writes the model.
+CRM_RESULT_CACHE = {
+    "ENABLED": False,
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+# Threads available to async GraphQL requests for blocking ORM work
+# (root resolvers, filtersets, mutations). See AsyncGraphQLView.
+CRM_SYNC_WORKERS = 8
+
+# Set GRAPHQL_ASYNC_VIEW=1 to serve /graphql/ with AsyncGraphQLView under
+# ASGI. It is opt-in: benchmark_graphql_concurrency measures it slower than
+# the sync view under WSGI, so it stays at /graphql/async/ by default.
+GRAPHQL_ASYNC_VIEW = os.environ.get('GRAPHQL_ASYNC_VIEW') == '1'
+
+# Cron jobs and Celery tasks run their GraphQL in-process. Set this to a
+# /graphql URL to have the heartbeat check the web tier over HTTP instead.
+CRM_HEARTBEAT_URL = None
+
+# enqueueOrders puts orders on QUEUE on the Celery broker (or BROKER_URL's,
+# if set); a drain runs DRAIN_DELAY seconds after the first of a burst and
+# commits BATCH_SIZE orders per transaction. See crm.ingest.
+CRM_ORDER_INGEST = {
+    "QUEUE": "crm.order_ingest",
+    "BATCH_SIZE": 500,
+    "DRAIN_DELAY": 0.2,
+    "BROKER_URL": None,
+}
+
+# Where scheduled jobs keep state between runs (e.g. checkpoints); unlike
+# /tmp it must survive reboots.
+CRM_STATE_DIR = os.environ.get('CRM_STATE_DIR', str(BASE_DIR / 'var'))
+
+# Bearer token accepted by /export/<kind>/ besides staff sessions.
+CRM_EXPORT_TOKEN = os.environ.get('CRM_EXPORT_TOKEN')
+
 CRONJOBS = [
     ('*/5 * * * *', 'crm.cron.log_crm_heartbeat'),
     ('0 */12 * * *', 'crm.cron.update_low_stock'),
@@ -143,4 +248,8 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'crm.tasks.generate_crm_report',
         'schedule': crontab(day_of_week='mon', hour=6, minute=0),
     },
+    'drain-order-queue': {
+        'task': 'crm.ingest.drain_order_queue',
+        'schedule': 30.0,
+    },
 }
@@ -1,54 +1,34 @@
 import logging
-import requests
 from datetime import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
 from celery import shared_task
 
+from crm.reports import generate_weekly_reports
+# Registers the ingest task with workers, which autodiscover tasks.py only.
+from crm.ingest import drain_order_queue  # noqa: F401
+
 
 @shared_task
 def generate_crm_report():
     """
-    Generates a weekly CRM report (customers, orders, revenue)
-    and logs it with a timestamp.
+    Stores a CrmReport for every week completed since the last run
+    and logs them with a timestamp. The aggregates run inside the
+    worker, over one week of rows each.
     """
     try:
-        # Setup GraphQL client
-        transport = RequestsHTTPTransport(
-            url="http://localhost:8000/graphql",
-            verify=False,
-            retries=3,
-        )
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-
-        # GraphQL query
-        query = gql("""
-        query {
-            totalCustomers
-            totalOrders
-            totalRevenue
-        }
-        """)
-
-        response = client.execute(query)
+        reports = generate_weekly_reports()
 
-        total_customers = response.get("totalCustomers", 0)
-        total_orders = response.get("totalOrders", 0)
-        total_revenue = response.get("totalRevenue", 0.0)
-
-        # Log the report
+        # Log the reports
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_line = (
-            f"{timestamp} - Report: "
-            f"{total_customers} customers, "
-            f"{total_orders} orders, "
-            f"{total_revenue} revenue\n"
-        )
-
         with open("/tmp/crm_report_log.txt", "a") as log_file:
-            log_file.write(log_line)
-
-        logging.info("CRM weekly report generated successfully.")
+            for report in reports:
+                log_file.write(
+                    f"{timestamp} - Report {report.period_start} to {report.period_end}: "
+                    f"{report.total_customers} customers (+{report.new_customers}), "
+                    f"{report.total_orders} orders (+{report.orders}), "
+                    f"{report.total_revenue} revenue (+{report.revenue})\n"
+                )
+
+        logging.info(f"CRM weekly report generated successfully ({len(reports)} new).")
 
     except Exception as e:
         logging.error(f"Error generating CRM report: {e}")
@@ -1,3 +1,1938 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Count, F, Sum
+from django.test import (
+    AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from graphql_relay import to_global_id
+
+from alx_backend_graphql.db_routing import RoutingState, current_routing, use_replica_for_reads
+from alx_backend_graphql.document_cache import DocumentCache, query_hash
+from alx_backend_graphql.instrumentation import metrics
+from alx_backend_graphql.schema import schema
+from alx_backend_graphql.views import AsyncGraphQLView, CachedGraphQLView, document_cache
+from .export import export_lines, export_queryset
+from .filters import CustomerFilter, ProductFilter, OrderFilter
+from .loaders import AsyncDataLoader
+from .search import ranked_search
+from .models import Customer, Product, Order, OrderItem, OrderTicket, CrmCounter, CrmReport
+from . import cron
+from .management.commands.cleanup_inactive_customers import delete_customers
+from .cron_jobs import send_order_reminders
+from . import reports
+from .benchmarks import operations, percentile, regressions
+from .celery import app
+from .executor import GraphQLExecutionError, execute_graphql
+from .ingest import drain_order_queue, enqueue_orders, place_orders
+from .services import delete_orders, get_counters
+from .tasks import generate_crm_report
+
+
+def make_order(customer, products):
+    order = Order.objects.create(customer=customer)
+    items = OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, unit_price=product.price)
+        for product in products
+    ])
+    order.total_amount = sum(item.line_total for item in items)
+    order.save(update_fields=["total_amount"])
+    return order
+
+
+class OrderTotalAmountFilterTests(TestCase):
+    query = """
+    query ($minTotal: Decimal, $first: Int) {
+      allOrders(totalAmount_Gte: $minTotal, first: $first, orderBy: ["-total_amount"]) {
+        edges { node { id totalAmount } }
+      }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        cls.cheap = Product.objects.create(name="Pen", price=Decimal("5.00"), stock=10)
+        cls.pricey = Product.objects.create(name="Laptop", price=Decimal("900.00"), stock=10)
+
+    def create_orders(self, count, products):
+        for _ in range(count):
+            make_order(self.customer, products)
+
+    def run_query(self, **variables):
+        result = schema.execute(self.query, variable_values=variables)
+        self.assertIsNone(result.errors)
+        return [edge["node"] for edge in result.data["allOrders"]["edges"]]
+
+    def test_filters_and_sorts_by_total(self):
+        self.create_orders(2, [self.cheap])
+        self.create_orders(1, [self.cheap, self.pricey])
+
+        nodes = self.run_query(minTotal=100)
+        self.assertEqual([Decimal(n["totalAmount"]) for n in nodes], [Decimal("905.00")])
+
+        nodes = self.run_query(minTotal=0)
+        self.assertEqual(
+            [Decimal(n["totalAmount"]) for n in nodes],
+            [Decimal("905.00"), Decimal("5.00"), Decimal("5.00")],
+        )
+
+    def test_total_is_not_inflated_by_product_name_join(self):
+        self.create_orders(1, [self.cheap, self.pricey])
+        result = schema.execute("""
+        {
+          allOrders(productName: "a", totalAmount_Lte: 1000) {
+            edges { node { totalAmount } }
+          }
+        }
+        """)
+        self.assertIsNone(result.errors)
+        totals = [e["node"]["totalAmount"] for e in result.data["allOrders"]["edges"]]
+        self.assertEqual([Decimal(t) for t in totals], [Decimal("905.00")])
+
+    def test_query_count_is_constant_in_number_of_orders(self):
+        self.create_orders(3, [self.cheap, self.pricey])
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(len(self.run_query(minTotal=100, first=50)), 3)
+
+        self.create_orders(30, [self.cheap, self.pricey])
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(len(self.run_query(minTotal=100, first=50)), 33)
+
+        self.assertEqual(len(small), len(large))
+
+
+class RelationBatchingTests(TestCase):
+    query = """
+    {
+      allOrders(first: 100) {
+        edges { node {
+          totalAmount
+          customer { name orders { edges { node { totalAmount } } } }
+          products { edges { node { name orders { edges { node { id } } } } } }
+        } }
+      }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=f"Product {i}", price=Decimal("10.00"), stock=5)
+            for i in range(3)
+        ]
+
+    def create_orders(self, count):
+        for i in range(count):
+            customer = Customer.objects.create(name=f"C{i}", email=f"c{i}-{count}@example.com")
+            make_order(customer, self.products[:2])
+
+    def run_query(self):
+        context = RequestFactory().post("/graphql/")
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(self.query, context_value=context)
+        self.assertIsNone(result.errors)
+        return result.data["allOrders"]["edges"], len(queries)
+
+    def test_relations_resolve_correctly(self):
+        self.create_orders(2)
+        edges, _ = self.run_query()
+        self.assertEqual(len(edges), 2)
+        for edge in edges:
+            node = edge["node"]
+            self.assertEqual(Decimal(node["totalAmount"]), Decimal("20.00"))
+            self.assertEqual(len(node["customer"]["orders"]["edges"]), 1)
+            product_names = sorted(p["node"]["name"] for p in node["products"]["edges"])
+            self.assertEqual(product_names, ["Product 0", "Product 1"])
+            for product in node["products"]["edges"]:
+                self.assertEqual(len(product["node"]["orders"]["edges"]), 2)
+
+    def test_one_query_per_nesting_level(self):
+        self.create_orders(5)
+        _, small = self.run_query()
+        self.create_orders(95)
+        edges, large = self.run_query()
+        self.assertEqual(len(edges), 100)
+        self.assertEqual(small, large)
+
+    def test_nested_pages_are_cut_per_parent_in_sql(self):
+        self.create_orders(6)
+        dates = [
+            to_global_id("OrderType", pk) for pk in Order.objects.order_by("order_date", "id").values_list("id", flat=True)
+        ]
+        query = """
+        { allProducts(name: "Product 0") { edges { node {
+            head: orders(first: 2) { edges { node { id } } pageInfo { hasNextPage endCursor } }
+            tail: orders(last: 2) { edges { node { id } } }
+        } } } }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(query, context_value=RequestFactory().post("/graphql/"))
+        self.assertIsNone(result.errors)
+        node = result.data["allProducts"]["edges"][0]["node"]
+        self.assertEqual([e["node"]["id"] for e in node["head"]["edges"]], dates[:2])
+        self.assertTrue(node["head"]["pageInfo"]["hasNextPage"])
+        self.assertEqual([e["node"]["id"] for e in node["tail"]["edges"]], dates[-2:])
+        windowed = [q["sql"] for q in queries if "ROW_NUMBER()" in q["sql"]]
+        self.assertEqual(len(windowed), 1)
+
+        after = node["head"]["pageInfo"]["endCursor"]
+        result = schema.execute(
+            '{ allProducts(name: "Product 0") { edges { node { orders(first: 3, after: "%s") '
+            '{ edges { node { id } } pageInfo { hasNextPage } } } } } }' % after,
+            context_value=RequestFactory().post("/graphql/"),
+        )
+        self.assertIsNone(result.errors)
+        orders = result.data["allProducts"]["edges"][0]["node"]["orders"]
+        self.assertEqual([e["node"]["id"] for e in orders["edges"]], dates[2:5])
+        self.assertTrue(orders["pageInfo"]["hasNextPage"])
+
+    def test_nested_filters_fall_back_to_querysets(self):
+        self.create_orders(1)
+        result = schema.execute(
+            '{ allOrders { edges { node { products(name: "1") { edges { node { name } } } } } } }',
+            context_value=RequestFactory().post("/graphql/"),
+        )
+        self.assertIsNone(result.errors)
+        products = result.data["allOrders"]["edges"][0]["node"]["products"]["edges"]
+        self.assertEqual([p["node"]["name"] for p in products], ["Product 1"])
+
+
+class OrderItemSnapshotTests(TestCase):
+    mutation = """
+    mutation ($customerId: UUID!, $productIds: [UUID]!) {
+      createOrder(input: {customerId: $customerId, productIds: $productIds}) {
+        order { id totalAmount }
+        errors
+      }
+    }
+    """
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Bob", email="bob@example.com")
+        self.pen = Product.objects.create(name="Pen", price=Decimal("2.50"), stock=10)
+        self.book = Product.objects.create(name="Book", price=Decimal("12.00"), stock=10)
+
+    def test_create_order_stores_total_and_price_snapshot(self):
+        result = schema.execute(self.mutation, variable_values={
+            "customerId": str(self.customer.id),
+            "productIds": [str(self.pen.id), str(self.book.id)],
+        })
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["createOrder"]["errors"], [])
+        self.assertEqual(Decimal(result.data["createOrder"]["order"]["totalAmount"]), Decimal("14.50"))
+
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal("14.50"))
+        self.assertEqual(
+            sorted(order.order_items.values_list("unit_price", flat=True)),
+            [Decimal("2.50"), Decimal("12.00")],
+        )
+
+    def test_price_edits_do_not_change_past_totals(self):
+        order = make_order(self.customer, [self.pen, self.book])
+        Product.objects.filter(pk=self.book.pk).update(price=Decimal("99.00"))
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal("14.50"))
+        self.assertEqual(order.order_items.get(product=self.book).unit_price, Decimal("12.00"))
+
+
+class BulkCreateCustomersTests(TestCase):
+    mutation = """
+    mutation ($input: [CustomerInput]!, $chunkSize: Int) {
+      bulkCreateCustomers(input: $input, chunkSize: $chunkSize) {
+        customers { email }
+        errors
+        rowErrors { index email message }
+      }
+    }
+    """
+
+    def run_mutation(self, rows, chunk_size=None):
+        result = schema.execute(
+            self.mutation, variable_values={"input": rows, "chunkSize": chunk_size}
+        )
+        self.assertIsNone(result.errors)
+        return result.data["bulkCreateCustomers"]
+
+    def test_chunk_size_out_of_range_is_a_user_error(self):
+        rows = [{"name": "A", "email": "a@example.com"}]
+        for chunk_size in (0, -1, 1001):
+            data = self.run_mutation(rows, chunk_size=chunk_size)
+            self.assertEqual(data["customers"], [])
+            self.assertEqual(data["errors"], ["chunkSize must be between 1 and 1000."])
+        self.assertFalse(Customer.objects.exists())
+        self.assertEqual(len(self.run_mutation(rows, chunk_size=1)["customers"]), 1)
+
+    def test_reports_per_row_errors_with_indexes(self):
+        Customer.objects.create(name="Old", email="old@example.com")
+        data = self.run_mutation([
+            {"name": "A", "email": "a@example.com", "phone": "+123456"},
+            {"name": "B", "email": "not-an-email"},
+            {"name": "C", "email": "old@example.com"},
+            {"name": "D", "email": "a@example.com"},
+            {"name": "E", "email": "e@example.com", "phone": "12-34"},
+            {"name": "F", "email": "f@example.com", "phone": "123-456-7890"},
+        ])
+        self.assertEqual([c["email"] for c in data["customers"]], ["a@example.com", "f@example.com"])
+        self.assertEqual(
+            [(e["index"], e["message"]) for e in data["rowErrors"]],
+            [
+                (1, "Invalid email format."),
+                (2, "Email already exists."),
+                (3, "Duplicate of row 0."),
+                (4, "Invalid phone format. Use +1234567890 or 123-456-7890."),
+            ],
+        )
+        self.assertEqual(data["errors"][0], "[1] not-an-email: Invalid email format.")
+        self.assertEqual(Customer.objects.count(), 3)
+
+    def test_query_count_depends_on_chunks_not_rows(self):
+        rows = [{"name": f"N{i}", "email": f"user{i}@example.com"} for i in range(1000)]
+        with CaptureQueriesContext(connection) as queries:
+            data = self.run_mutation(rows, chunk_size=250)
+        self.assertEqual(len(data["customers"]), 1000)
+        self.assertEqual(Customer.objects.count(), 1000)
+        # A handful of IN lookups and INSERT batches, not two queries per row.
+        self.assertLess(len(queries), 20)
+
+
+class UpdateLowStockProductsTests(TestCase):
+    def setUp(self):
+        self.low = [
+            Product.objects.create(name=f"Low {i}", price=Decimal("1.00"), stock=i)
+            for i in range(5)
+        ]
+        self.full = Product.objects.create(name="Full", price=Decimal("1.00"), stock=50)
+
+    def run_mutation(self, document):
+        result = schema.execute(document)
+        self.assertIsNone(result.errors)
+        return result.data["updateLowStockProducts"]
+
+    def test_restocks_with_arguments_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.run_mutation("""
+            mutation {
+              updateLowStockProducts(threshold: 3, restockAmount: 7, chunkSize: 2) {
+                success message updatedProducts { name stock }
+              }
+            }
+            """)
+        self.assertTrue(data["success"])
+        self.assertEqual(data["message"], "Updated 3 low-stock products.")
+        self.assertEqual(
+            sorted((p["name"], p["stock"]) for p in data["updatedProducts"]),
+            [("Low 0", 7), ("Low 1", 8), ("Low 2", 9)],
+        )
+        self.assertEqual(Product.objects.get(name="Low 3").stock, 3)
+        self.assertEqual(Product.objects.get(name="Full").stock, 50)
+        # Only the selected columns are read back.
+        self.assertNotIn('"price"', queries[-1]["sql"])
+
+    def test_single_update_when_products_not_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.run_mutation("mutation { updateLowStockProducts { message } }")
+        self.assertEqual(data["message"], "Updated 5 low-stock products.")
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]["sql"].startswith("UPDATE"))
+        self.assertEqual(sorted(Product.objects.values_list("stock", flat=True)), [10, 11, 12, 13, 14, 50])
+
+
+    def test_updated_products_are_refused_above_the_bound(self):
+        with mock.patch("crm.schema.MAX_UPDATED_PRODUCTS", 4):
+            data = self.run_mutation("mutation { updateLowStockProducts { success message updatedProducts { name } } }")
+        self.assertFalse(data["success"])
+        self.assertEqual(data["updatedProducts"], [])
+        self.assertEqual(sorted(Product.objects.values_list("stock", flat=True)), [0, 1, 2, 3, 4, 50])
+
+
+class CrmCounterTests(TestCase):
+    query = "{ totalCustomers totalOrders totalRevenue }"
+
+    def totals(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(self.query, context_value=RequestFactory().post("/graphql/"))
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(queries), 1)
+        data = result.data
+        return data["totalCustomers"], data["totalOrders"], Decimal(data["totalRevenue"])
+
+    def test_mutations_keep_counters_in_step(self):
+        schema.execute('mutation { createCustomer(input: {name: "A", email: "a@example.com"}) { success } }')
+        schema.execute("""
+        mutation { bulkCreateCustomers(input: [
+          {name: "B", email: "b@example.com"}, {name: "C", email: "c@example.com"}
+        ]) { errors } }
+        """)
+        product = Product.objects.create(name="Lamp", price=Decimal("19.99"), stock=3)
+        customer = Customer.objects.get(email="a@example.com")
+        for _ in range(2):
+            result = schema.execute(
+                "mutation ($c: UUID!, $p: [UUID]!) { createOrder(input: {customerId: $c, productIds: $p}) { errors } }",
+                variable_values={"c": str(customer.id), "p": [str(product.id)]},
+            )
+            self.assertEqual(result.data["createOrder"]["errors"], [])
+        self.assertEqual(self.totals(), (3, 2, Decimal("39.98")))
+
+    def test_delete_services_update_the_counters(self):
+        customer = Customer.objects.create(name="D", email="d@example.com")
+        mug = Product.objects.create(name="Mug", price=Decimal("4.00"), stock=5)
+        orders = [make_order(customer, [mug]) for _ in range(3)]
+        other = Customer.objects.create(name="E", email="e@example.com")
+        call_command("rebuild_crm_counters", stdout=StringIO())
+        self.assertEqual(self.totals(), (2, 3, Decimal("12.00")))
+
+        self.assertEqual(delete_orders([orders[0].pk]), (1, Decimal("4.00")))
+        self.assertEqual(self.totals(), (2, 2, Decimal("8.00")))
+        self.assertFalse(OrderItem.objects.filter(order_id=orders[0].pk).exists())
+        # The customer's remaining orders come off the counters with it.
+        with CaptureQueriesContext(connection) as queries:
+            delete_customers([customer.pk, other.pk])
+        self.assertEqual(self.totals(), (0, 0, Decimal("0.00")))
+        self.assertLess(len(queries), 10)
+
+    def test_orm_writes_leave_the_counters_alone(self):
+        customer = Customer.objects.create(name="D", email="d@example.com")
+        order = make_order(customer, [Product.objects.create(name="Mug", price=Decimal("4.00"), stock=5)])
+        order.delete()
+        customer.delete()
+        self.assertEqual(self.totals(), (0, 0, Decimal("0.00")))
+
+    def test_rebuild_command_recomputes_from_tables(self):
+        customer = Customer.objects.create(name="D", email="d@example.com")
+        make_order(customer, [Product.objects.create(name="Mug", price=Decimal("4.00"), stock=1)])
+        CrmCounter.objects.all().delete()
+        self.assertEqual(self.totals(), (0, 0, Decimal("0.00")))
+
+        call_command("rebuild_crm_counters", stdout=StringIO())
+        self.assertEqual(self.totals(), (1, 1, Decimal("4.00")))
+
+
+class GraphQLEndpointCacheTests(TestCase):
+    query = "{ totalCustomers }"
+
+    def setUp(self):
+        document_cache.clear()
+
+    def post(self, payload):
+        return self.client.post("/graphql/", payload, content_type="application/json")
+
+    def test_repeat_queries_skip_parse_and_validation(self):
+        for _ in range(3):
+            response = self.post({"query": self.query})
+            self.assertEqual(response.json()["data"], {"totalCustomers": 0})
+        stats = self.client.get("/graphql/cache-stats/").json()
+        self.assertEqual((stats["size"], stats["hits"], stats["misses"]), (1, 2, 1))
+
+    def test_persisted_query_round_trip(self):
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash(self.query)}}
+
+        response = self.post({"extensions": extensions})
+        self.assertEqual(
+            response.json()["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND"
+        )
+
+        response = self.post({"query": self.query, "extensions": extensions})
+        self.assertEqual(response.json()["data"], {"totalCustomers": 0})
+
+        response = self.post({"extensions": extensions})
+        self.assertEqual(response.json()["data"], {"totalCustomers": 0})
+        # One lookup per request: the miss, the registration, the hit.
+        stats = document_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_async_view_counts_each_request_once(self):
+        for _ in range(2):
+            async_to_sync(AsyncClient().post)("/graphql/async/", {"query": self.query}, content_type="application/json")
+        stats = document_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_stats_are_limited_like_metrics(self):
+        response = self.client.get("/graphql/cache-stats/", REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 403)
+        with override_settings(GRAPHQL_INSTRUMENTATION={"METRICS_ALLOWED_IPS": ["203.0.113.7"]}):
+            response = self.client.get("/graphql/cache-stats/", REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 200)
+
+    def test_persisted_query_hash_must_match(self):
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}}
+        response = self.post({"query": self.query, "extensions": extensions})
+        self.assertEqual(
+            response.json()["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_HASH_MISMATCH"
+        )
+
+    def test_invalid_queries_keep_their_validation_errors(self):
+        for _ in range(2):
+            response = self.post({"query": "{ noSuchField }"})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("noSuchField", response.json()["errors"][0]["message"])
+
+    def test_lru_eviction(self):
+        cache = DocumentCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+@override_settings(CRM_RESULT_CACHE={"ENABLED": True, "CACHE_ALIAS": "default", "TIMEOUT": 60})
+class ResultCacheTests(TestCase):
+    products_query = """
+    query ($max: Decimal) {
+      allProducts(price_Lte: $max, orderBy: ["name"]) {
+        edges { node { name stock } }
+        pageInfo { hasNextPage }
+      }
+    }
+    """
+
+    def setUp(self):
+        cache.clear()
+        for name, price, stock in [("Cup", "3.00", 2), ("Desk", "150.00", 40), ("Pen", "1.00", 5)]:
+            Product.objects.create(name=name, price=Decimal(price), stock=stock)
+
+    def products(self, max_price=None):
+        result = schema.execute(self.products_query, variable_values={"max": max_price})
+        self.assertIsNone(result.errors)
+        return [(e["node"]["name"], e["node"]["stock"]) for e in result.data["allProducts"]["edges"]]
+
+    def test_repeated_queries_skip_the_database(self):
+        first = self.products(max_price="10")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.products(max_price="10"), first)
+        # Different filter arguments are cached separately.
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.products()), 3)
+
+    def test_product_mutations_invalidate(self):
+        self.products()
+        with self.captureOnCommitCallbacks(execute=True):
+            schema.execute('mutation { createProduct(input: {name: "Ink", price: 2.5, stock: 1}) { success } }')
+        self.assertIn(("Ink", 1), self.products())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schema.execute("mutation { updateLowStockProducts { success } }")
+        self.assertIn(("Ink", 11), self.products())
+
+    def test_customer_mutations_only_invalidate_customers(self):
+        query = "{ allCustomers { edges { node { email } } } }"
+        schema.execute(query)
+        self.products()
+        with self.captureOnCommitCallbacks(execute=True):
+            schema.execute('mutation { createCustomer(input: {name: "Z", email: "z@example.com"}) { success } }')
+        with self.assertNumQueries(0):
+            self.products()
+        result = schema.execute(query)
+        self.assertEqual(result.data["allCustomers"]["edges"], [{"node": {"email": "z@example.com"}}])
+
+
+class KeysetPaginationTests(TestCase):
+    query = """
+    query ($first: Int, $last: Int, $after: String, $before: String, $orderBy: [String]) {
+      allOrders(first: $first, last: $last, after: $after, before: $before, orderBy: $orderBy) {
+        edges { cursor node { id } }
+        pageInfo { hasNextPage hasPreviousPage endCursor startCursor }
+      }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name="Kay", email="kay@example.com")
+        product = Product.objects.create(name="Tea", price=Decimal("3.00"), stock=10)
+        cls.orders = [make_order(customer, [product]) for _ in range(7)]
+        # Duplicate sort keys must still page without gaps or repeats.
+        Order.objects.update(order_date=timezone.make_aware(datetime(2025, 1, 1)))
+
+    def page(self, **variables):
+        result = schema.execute(self.query, variable_values=variables)
+        self.assertIsNone(result.errors)
+        return result.data["allOrders"]
+
+    def test_forward_and_backward_walks_cover_every_row_once(self):
+        seen, after = [], None
+        while True:
+            page = self.page(first=3, after=after)
+            seen += [e["node"]["id"] for e in page["edges"]]
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            after = page["pageInfo"]["endCursor"]
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+        backward, before = [], None
+        while True:
+            page = self.page(last=2, before=before)
+            backward = [e["node"]["id"] for e in page["edges"]] + backward
+            if not page["pageInfo"]["hasPreviousPage"]:
+                break
+            before = page["pageInfo"]["startCursor"]
+        self.assertEqual(backward, seen)
+
+    def test_deep_pages_use_seek_not_offset(self):
+        first = self.page(first=5, orderBy=["-total_amount", "order_date"])
+        with CaptureQueriesContext(connection) as queries:
+            page = self.page(first=5, orderBy=["-total_amount", "order_date"],
+                             after=first["pageInfo"]["endCursor"])
+        self.assertEqual(len(page["edges"]), 2)
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"]
+        self.assertNotIn("OFFSET", sql)
+        self.assertNotIn("COUNT", sql)
+
+    def test_cursors_keep_microseconds(self):
+        # Within one millisecond, which a truncated cursor could not tell apart.
+        start = datetime(2025, 1, 1, 0, 0, 0, 100, tzinfo=dt_timezone.utc)
+        for i, order in enumerate(self.orders):
+            Order.objects.filter(pk=order.pk).update(order_date=start.replace(microsecond=100 + i))
+        seen, after = [], None
+        # Bounded: a truncated cursor repeats rows forever.
+        for _ in range(10):
+            page = self.page(first=2, after=after, orderBy=["order_date"])
+            seen += [e["node"]["id"] for e in page["edges"]]
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            after = page["pageInfo"]["endCursor"]
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_cursor_must_match_ordering(self):
+        cursor = self.page(first=1)["pageInfo"]["endCursor"]
+        result = schema.execute(self.query, variable_values={
+            "first": 1, "after": cursor, "orderBy": ["total_amount"],
+        })
+        self.assertEqual(result.errors[0].message, "Cursor does not match the requested order_by.")
+
+    def test_pages_cross_null_sort_keys(self):
+        for i, phone in enumerate([None, "+1000", None, "+3000", "+2000", None, "+2000"]):
+            Customer.objects.create(name=f"Phone {i}", email=f"phone{i}@example.com", phone=phone)
+        query = """
+        query ($first: Int, $last: Int, $after: String, $before: String, $orderBy: [String]) {
+          allCustomers(first: $first, last: $last, after: $after, before: $before, orderBy: $orderBy) {
+            edges { node { email phone } }
+            pageInfo { hasNextPage hasPreviousPage endCursor startCursor }
+          }
+        }
+        """
+
+        def page(**variables):
+            result = schema.execute(query, variable_values=variables)
+            self.assertIsNone(result.errors)
+            return result.data["allCustomers"]
+
+        customers = Customer.objects.all()
+        for order_by in ("phone", "-phone"):
+            seen, after = [], None
+            while True:
+                connection_page = page(first=2, after=after, orderBy=[order_by])
+                seen += [e["node"] for e in connection_page["edges"]]
+                if not connection_page["pageInfo"]["hasNextPage"]:
+                    break
+                after = connection_page["pageInfo"]["endCursor"]
+            phones = [node["phone"] for node in seen]
+            expected = sorted(customers.exclude(phone=None).values_list("phone", flat=True))
+            expected += [None] * customers.filter(phone=None).count()
+            self.assertEqual(phones, expected if order_by == "phone" else expected[::-1])
+            self.assertEqual(len({node["email"] for node in seen}), customers.count())
+
+            backward, before = [], None
+            while True:
+                connection_page = page(last=2, before=before, orderBy=[order_by])
+                backward = [e["node"] for e in connection_page["edges"]] + backward
+                if not connection_page["pageInfo"]["hasPreviousPage"]:
+                    break
+                before = connection_page["pageInfo"]["startCursor"]
+            self.assertEqual(backward, seen)
+
+
+class QueryCostLimitTests(TestCase):
+    def post(self, query, variables=None):
+        return self.client.post(
+            "/graphql/", {"query": query, "variables": variables}, content_type="application/json"
+        )
+
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post(
+            "query ($n: Int) { allOrders(first: $n) { edges { node { id customer { name } } } } }",
+            {"n": 20},
+        )
+        body = response.json()
+        self.assertNotIn("errors", body)
+        # allOrders once, then 20 x (edges, node, id, customer, name).
+        self.assertEqual(body["extensions"]["cost"], {"depth": 5, "nodes": 20, "cost": 101})
+
+    def test_over_budget_queries_are_rejected_before_execution(self):
+        query = """
+        query {
+          allOrders(first: 100) { edges { node { customer {
+            orders(first: 100) { edges { node { products(first: 100) { edges { node { name } } } } } }
+          } } } }
+        }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(query)
+        self.assertEqual(response.status_code, 400)
+        error = response.json()["errors"][0]
+        self.assertEqual(error["extensions"]["code"], "QUERY_TOO_COMPLEX")
+        self.assertEqual(error["extensions"]["metric"], "nodes")
+        self.assertEqual(response.json()["extensions"]["cost"]["nodes"], 100 + 100 * 100 + 100 ** 3)
+        self.assertEqual(len(queries), 0)
+
+    def test_negative_page_sizes_do_not_lower_the_cost(self):
+        expensive = """
+          allOrders(first: 100) { edges { node { customer {
+            orders(first: 100) { edges { node { products(first: 100) { edges { node { name } } } } } }
+          } } } }
+        """
+        alone = self.post("query {%s}" % expensive).json()["extensions"]["cost"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post("query { cheap: allOrders(first: -100) { edges { node { id } } } %s }" % expensive)
+        self.assertEqual(response.status_code, 400)
+        cost = response.json()["extensions"]["cost"]
+        self.assertGreaterEqual(cost["cost"], alone["cost"])
+        self.assertEqual(cost["nodes"], alone["nodes"])
+        self.assertEqual(len(queries), 0)
+
+        empty = self.post("query { allOrders(first: 0) { edges { node { id } } } }").json()
+        self.assertEqual(empty["extensions"]["cost"], {"depth": 4, "nodes": 0, "cost": 1})
+
+    @override_settings(GRAPHQL_QUERY_LIMITS={"MAX_DEPTH": 5})
+    def test_depth_limit_follows_fragments(self):
+        response = self.post("""
+        fragment O on OrderType { customer { orders { edges { node { id } } } } }
+        query { allOrders(first: 1) { edges { node { ...O } } } }
+        """)
+        error = response.json()["errors"][0]
+        self.assertEqual(error["extensions"]["metric"], "depth")
+        self.assertEqual(error["extensions"]["value"], 8)
+
+
+class FilterQueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on the first page each filter produces and
+    fails on any full table or index scan, so list latency stays flat as
+    the tables grow.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        products = Product.objects.bulk_create([
+            Product(name=f"Item {i}", price=Decimal(i), stock=i) for i in range(500)
+        ])
+        customers = Customer.objects.bulk_create([
+            Customer(name=f"Customer {i}", email=f"plan{i}@example.com", phone=f"+1{i:09d}")
+            for i in range(500)
+        ])
+        for i, customer in enumerate(customers):
+            make_order(customer, products[i:i + 2])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def plan(self, filterset_class, queryset, **data):
+        filterset = filterset_class(data=data, queryset=queryset)
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        sql, params = filterset.qs[:101].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoFullScan(self, filterset_class, queryset, **data):
+        plan = self.plan(filterset_class, queryset, **data)
+        self.assertEqual([step for step in plan if step.startswith("SCAN")], [], f"{data}: {plan}")
+        return plan
+
+    def assertRangeAndSortIndexed(self, filterset_class, queryset, **data):
+        plan = self.assertNoFullScan(filterset_class, queryset, **data)
+        self.assertEqual([step for step in plan if "TEMP B-TREE" in step], [], f"{data}: {plan}")
+
+    # Every range filter, sorted by its own column, must be answered by
+    # one composite (column, id) index: no scan and no sort step.
+
+    def test_customer_filters(self):
+        for order_by in (["created_at", "id"], ["-created_at", "-id"]):
+            queryset = Customer.objects.order_by(*order_by)
+            self.assertRangeAndSortIndexed(CustomerFilter, queryset, created_at__gte="2099-01-01")
+            self.assertRangeAndSortIndexed(CustomerFilter, queryset, created_at__lte="2000-01-01")
+        self.assertRangeAndSortIndexed(CustomerFilter, Customer.objects.order_by("phone"), phone_starts_with="+10000001")
+        self.assertNoFullScan(CustomerFilter, Customer.objects.order_by("created_at"), phone_starts_with="+10000001")
+
+    def test_product_filters(self):
+        self.assertRangeAndSortIndexed(ProductFilter, Product.objects.order_by("price", "id"), price__gte=10, price__lte=20)
+        self.assertRangeAndSortIndexed(ProductFilter, Product.objects.order_by("stock", "id"), stock__gte=5, stock__lte=9)
+        self.assertRangeAndSortIndexed(ProductFilter, Product.objects.order_by("stock", "id"), low_stock=3)
+        # Two-sided ranges stay index-backed under the default name sort too.
+        queryset = Product.objects.order_by("name")
+        self.assertNoFullScan(ProductFilter, queryset, price__gte=10, price__lte=20)
+        self.assertNoFullScan(ProductFilter, queryset, stock__gte=5, stock__lte=9)
+
+    def test_order_filters(self):
+        for order_by in (["order_date", "id"], ["-order_date", "-id"]):
+            queryset = Order.objects.order_by(*order_by)
+            self.assertRangeAndSortIndexed(OrderFilter, queryset, order_date__gte="2099-01-01")
+            self.assertRangeAndSortIndexed(OrderFilter, queryset, order_date__gte="2000-01-01", order_date__lte="2000-02-01")
+        self.assertRangeAndSortIndexed(OrderFilter, Order.objects.order_by("-total_amount", "-id"), total_amount__gte=10, total_amount__lte=20)
+        self.assertNoFullScan(OrderFilter, Order.objects.order_by("-order_date"), total_amount__gte=10, total_amount__lte=20)
+
+    def test_date_bounds_cover_whole_days_without_naive_datetimes(self):
+        today = timezone.localdate().isoformat()
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            orders = OrderFilter(data={"order_date__gte": today, "order_date__lte": today}, queryset=Order.objects.all())
+            customers = CustomerFilter(data={"created_at__lte": today}, queryset=Customer.objects.all())
+            self.assertEqual(orders.qs.count(), 500)
+            self.assertEqual(customers.qs.count(), 500)
+
+    def test_low_stock_filter_is_exposed(self):
+        result = schema.execute("{ allProducts(lowStock: 3) { edges { node { stock } } } }")
+        self.assertIsNone(result.errors)
+        self.assertEqual([e["node"]["stock"] for e in result.data["allProducts"]["edges"]], [0, 1, 2])
+
+    def test_phone_prefix_matches_startswith(self):
+        filterset = CustomerFilter(data={"phone_starts_with": "+10000001"}, queryset=Customer.objects.all())
+        self.assertEqual(
+            set(filterset.qs), set(Customer.objects.filter(phone__startswith="+10000001"))
+        )
+        self.assertEqual(filterset.qs.count(), 100)
+
+
+class TextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = Product.objects.bulk_create([
+            Product(name=name, price=Decimal("5.00"), stock=5)
+            for name in ["Blue Widget", "Red Widget", "Widget Widget Pro", "Gadget", "Thingamajig"]
+        ])
+        cls.customers = Customer.objects.bulk_create([
+            Customer(name="Alice Widgetson", email="alice@example.com"),
+            Customer(name="Bob Stone", email="bob@widgets.io"),
+            Customer(name="Carol Gadget", email="carol@example.com"),
+        ])
+        make_order(cls.customers[0], cls.products[:3])
+        make_order(cls.customers[1], cls.products[3:])
+        make_order(cls.customers[2], cls.products[1:2])
+
+    def test_contains_filters_match_icontains(self):
+        for value in ["widget", "WIDG", "ston", "Wi", "xyz", 'a"b']:
+            for field in ["name", "email"]:
+                filterset = CustomerFilter(data={field: value}, queryset=Customer.objects.all())
+                self.assertEqual(
+                    set(filterset.qs), set(Customer.objects.filter(**{f"{field}__icontains": value})),
+                    (field, value),
+                )
+            filterset = ProductFilter(data={"name": value}, queryset=Product.objects.all())
+            self.assertEqual(set(filterset.qs), set(Product.objects.filter(name__icontains=value)))
+            filterset = OrderFilter(data={"product_name": value}, queryset=Order.objects.all())
+            self.assertEqual(
+                list(filterset.qs.order_by("id")),
+                list(Order.objects.filter(products__name__icontains=value).distinct().order_by("id")),
+            )
+            filterset = OrderFilter(data={"customer_name": value}, queryset=Order.objects.all())
+            self.assertEqual(set(filterset.qs), set(Order.objects.filter(customer__name__icontains=value)))
+
+    def test_index_follows_writes(self):
+        product = self.products[4]
+        product.name = "Sprocket"
+        product.save()
+        Product.objects.filter(pk=self.products[3].pk).update(name="Sprocket Mini")
+        Product.objects.create(name="Sprocket Max", price=Decimal("1.00"), stock=1)
+        self.assertEqual(
+            sorted(ProductFilter(data={"name": "sprocket"}, queryset=Product.objects.all()).qs.values_list("name", flat=True)),
+            ["Sprocket", "Sprocket Max", "Sprocket Mini"],
+        )
+        self.assertFalse(ProductFilter(data={"name": "thingamajig"}, queryset=Product.objects.all()).qs.exists())
+        Product.objects.filter(name="Sprocket Max").delete()
+        self.assertEqual(ProductFilter(data={"name": "sprocket"}, queryset=Product.objects.all()).qs.count(), 2)
+
+    def test_name_filter_is_answered_by_the_index(self):
+        filterset = CustomerFilter(data={"name": "widget"}, queryset=Customer.objects.order_by("created_at"))
+        sql, params = filterset.qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertIn("VIRTUAL TABLE", " ".join(plan))
+        self.assertNotIn("LIKE", sql)
+
+    def test_search_orders_by_relevance(self):
+        result = schema.execute('{ allProducts(search: "widget") { edges { cursor node { name } } } }')
+        self.assertIsNone(result.errors)
+        names = [e["node"]["name"] for e in result.data["allProducts"]["edges"]]
+        self.assertEqual(names[0], "Widget Widget Pro")
+        self.assertEqual(set(names), {"Blue Widget", "Red Widget", "Widget Widget Pro"})
+
+        after = result.data["allProducts"]["edges"][0]["cursor"]
+        result = schema.execute(
+            '{ allProducts(search: "widget", first: 5, after: "%s") { edges { node { name } } } }' % after
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual([e["node"]["name"] for e in result.data["allProducts"]["edges"]], names[1:])
+
+    def test_search_matches_once_per_query(self):
+        queryset = ranked_search(Customer.objects.all(), "example").order_by("search_rank")
+        sql, params = queryset.query.sql_with_params()
+        self.assertEqual(sql.count("MATCH"), 1)
+        self.assertEqual({customer.name for customer in queryset}, {"Alice Widgetson", "Carol Gadget"})
+        # Relabelled into a subquery, the join and its rank follow.
+        self.assertEqual(Customer.objects.filter(pk__in=queryset.values("pk")).count(), 2)
+
+    def test_search_customers_and_orders(self):
+        result = schema.execute('{ allCustomers(search: "widget") { edges { node { name } } } }')
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            {e["node"]["name"] for e in result.data["allCustomers"]["edges"]},
+            {"Alice Widgetson", "Bob Stone"},
+        )
+        result = schema.execute('{ allOrders(search: "gadget") { edges { node { customer { name } } } } }')
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            sorted(e["node"]["customer"]["name"] for e in result.data["allOrders"]["edges"]),
+            ["Bob Stone", "Carol Gadget"],
+        )
+
+
+class SearchIndexVacuumTests(TransactionTestCase):
+    def test_vacuum_rebuilds_the_index_against_new_rowids(self):
+        Customer.objects.bulk_create([
+            Customer(name=f"Filler {i}", email=f"filler{i}@example.com") for i in range(20)
+        ])
+        Customer.objects.create(name="Dana Widget", email="dana@example.com")
+        Customer.objects.filter(name__startswith="Filler").delete()
+        call_command("rebuild_search_index", "--vacuum", stdout=StringIO())
+        self.assertEqual(
+            [customer.name for customer in ranked_search(Customer.objects.all(), "widget")], ["Dana Widget"]
+        )
+
+
+class AsyncGraphQLViewTests(TransactionTestCase):
+    """
+    The async view must answer exactly like the sync one. Data is committed
+    (TransactionTestCase) because the bounded sync pool uses its own
+    database connections.
+    """
+
+    query = """
+    {
+      totalCustomers
+      totalRevenue
+      crmReports(limit: 4) { periodStart totalOrders }
+      allOrders(first: 10) {
+        edges { cursor node { totalAmount customer { name } products { edges { node { name } } } } }
+        pageInfo { hasNextPage endCursor }
+      }
+      allCustomers(search: "ali") { edges { node { name orders { edges { node { totalAmount } } } } } }
+    }
+    """
+
+    def setUp(self):
+        document_cache.clear()
+        products = [
+            Product.objects.create(name=f"Product {i}", price=Decimal(i + 1), stock=5) for i in range(4)
+        ]
+        for i, name in enumerate(["Alice", "Bob", "Alina"]):
+            customer = Customer.objects.create(name=name, email=f"{name.lower()}@example.com")
+            make_order(customer, products[i:i + 2])
+        call_command("rebuild_crm_counters", stdout=StringIO())
+
+    def test_queries_match_the_sync_view(self):
+        sync = self.client.post("/graphql/", {"query": self.query}, content_type="application/json")
+        response = async_to_sync(AsyncClient().post)(
+            "/graphql/async/", {"query": self.query}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("errors", response.json())
+        self.assertEqual(response.json()["data"], sync.json()["data"])
+        self.assertEqual(len(response.json()["data"]["allOrders"]["edges"]), 3)
+
+    def test_graphql_is_served_by_the_sync_view_unless_opted_in(self):
+        self.assertIs(resolve("/graphql/").func.view_class, CachedGraphQLView)
+        self.assertIs(resolve("/graphql/async/").func.view_class, AsyncGraphQLView)
+
+    def test_errors_and_mutations(self):
+        client = AsyncClient()
+        post = async_to_sync(client.post)
+        response = post("/graphql/async/", {"query": "{ noSuchField }"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        response = post(
+            "/graphql/async/",
+            {"query": 'mutation { createCustomer(input: {name: "Dana", email: "dana@example.com"}) { customer { name } } }'},
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["data"]["createCustomer"]["customer"]["name"], "Dana")
+        self.assertTrue(Customer.objects.filter(email="dana@example.com").exists())
+
+    @override_settings(GRAPHQL_INSTRUMENTATION={"DEBUG_TOKEN": "secret"})
+    def test_instrumentation_follows_sql_into_the_sync_pool(self):
+        response = async_to_sync(AsyncClient().post)(
+            "/graphql/async/", {"query": self.query}, content_type="application/json",
+            headers={"X-GraphQL-Debug": "secret"},
+        )
+        trace = response.json()["extensions"]["instrumentation"]
+        resolvers = {r["path"]: r for r in trace["resolvers"]}
+        self.assertEqual(resolvers["allOrders.edges.node.customer"]["calls"], 3)
+        self.assertEqual(resolvers["allOrders.edges.node.customer"]["sql_count"], 1)
+        self.assertEqual(sum(r["sql_count"] for r in trace["resolvers"]), trace["sql"]["count"])
+
+
+@override_settings(GRAPHQL_INSTRUMENTATION={"DEBUG_TOKEN": "secret"})
+class InstrumentationTests(TestCase):
+    query = """
+    {
+      totalOrders
+      allOrders(first: 10) { edges { node { totalAmount customer { name } products { edges { node { name } } } } } }
+    }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        products = [Product.objects.create(name=f"Product {i}", price=Decimal("2.00"), stock=5) for i in range(3)]
+        for i in range(4):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com")
+            make_order(customer, products[:2])
+
+    def setUp(self):
+        document_cache.clear()
+        metrics.clear()
+
+    def post(self, **headers):
+        return self.client.post(
+            "/graphql/", {"query": self.query}, content_type="application/json", headers=headers
+        ).json()
+
+    def test_debug_header_returns_phase_resolver_and_sql_timings(self):
+        with CaptureQueriesContext(connection) as queries:
+            body = self.post(**{"X-GraphQL-Debug": "secret"})
+        trace = body["extensions"]["instrumentation"]
+        self.assertEqual(set(trace["phases_ms"]), {"parse_validate", "cost", "execute"})
+        self.assertEqual(trace["sql"]["count"], len(queries))
+        resolvers = {r["path"]: r for r in trace["resolvers"]}
+        self.assertEqual(resolvers["allOrders"]["calls"], 1)
+        # One batched query per relation, attributed to the field that ran it.
+        for path in ("allOrders.edges.node.customer", "allOrders.edges.node.products"):
+            self.assertEqual(resolvers[path]["calls"], 4)
+            self.assertEqual(resolvers[path]["sql_count"], 1)
+        # Attribute reads are not timed.
+        self.assertNotIn("allOrders.edges.node.totalAmount", resolvers)
+
+    def test_requests_are_aggregated_into_metrics(self):
+        body = self.post()
+        self.assertNotIn("instrumentation", body.get("extensions", {}))
+        self.assertNotIn("instrumentation", self.post(**{"X-GraphQL-Debug": "wrong"}).get("extensions", {}))
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        text = response.content.decode()
+        self.assertIn('graphql_request_duration_seconds_count{operation_type="query"} 2', text)
+        self.assertIn('graphql_resolver_duration_seconds_count{field="OrderType.customer"} 8', text)
+        self.assertIn('graphql_resolver_sql_queries_total{field="OrderType.customer"} 2.0', text)
+        self.assertIn('graphql_phase_duration_seconds_bucket{phase="execute",le="+Inf"} 2', text)
+
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.1").status_code, 403)
+
+
+class AsyncDataLoaderTests(SimpleTestCase):
+    def test_concurrent_loads_share_one_batch(self):
+        batches = []
+
+        async def batch_load(keys):
+            batches.append(keys)
+            await asyncio.sleep(0)
+            return [key * 2 for key in keys]
+
+        async def run():
+            loader = AsyncDataLoader(batch_load)
+            for key in (1, 2, 3):
+                loader.queue(key)
+            first = await asyncio.gather(*(loader.load(key) for key in (1, 2, 3, 4)))
+            return first, await loader.load(2)
+
+        self.assertEqual(asyncio.run(run()), ([2, 4, 6, 8], 4))
+        self.assertEqual(batches, [[1, 2, 3, 4]])
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=name, price=Decimal(price), stock=5)
+            for name, price in [("Laptop", "999.99"), ("Mouse", "19.99"), ("Desk", "150.00")]
+        ]
+        cls.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        cls.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        cls.first = make_order(cls.alice, cls.products[:2])
+        cls.second = make_order(cls.bob, cls.products[1:])
+
+    def ndjson(self, kind, **filters):
+        lines = export_lines(kind, export_queryset(kind, filters))
+        return [json.loads(line) for line in lines]
+
+    def test_orders_nest_their_items_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            records = self.ndjson("orders")
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([r["customer_name"] for r in records], ["Alice", "Bob"])
+        self.assertEqual(
+            sorted(item["product_name"] for item in records[0]["items"]), ["Laptop", "Mouse"]
+        )
+        self.assertEqual(records[0]["total_amount"], "1019.98")
+
+    def test_order_filters_apply_without_dropping_items(self):
+        records = self.ndjson("orders", customer_name="bo")
+        self.assertEqual([r["id"] for r in records], [str(self.second.pk)])
+        records = self.ndjson("orders", product_id=str(self.products[2].pk))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(len(records[0]["items"]), 2)
+        with self.assertRaises(ValidationError):
+            export_queryset("orders", {"total_amount__gte": "lots"})
+
+    def test_csv_has_one_row_per_item(self):
+        rows = list(csv.reader(export_lines("orders", export_queryset("orders"), "csv")))
+        self.assertEqual(rows[0][:3], ["id", "order_date", "total_amount"])
+        self.assertEqual(len(rows), 5)
+        rows = list(csv.reader(export_lines("products", export_queryset("products", {"name": "mou"}), "csv")))
+        self.assertEqual([row[1] for row in rows], ["name", "Mouse"])
+
+    def test_streaming_endpoint(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        response = self.client.get("/export/customers/", {"format": "ndjson", "chunk_size": 1})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Alice", "Bob"])
+        self.assertEqual(self.client.get("/export/orders/", {"format": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/export/invoices/").status_code, 400)
+
+    @override_settings(CRM_EXPORT_TOKEN="s3cret")
+    def test_endpoint_requires_staff_or_the_token(self):
+        self.assertEqual(self.client.get("/export/customers/").status_code, 403)
+        self.client.force_login(User.objects.create_user("clerk"))
+        self.assertEqual(self.client.get("/export/customers/").status_code, 403)
+        denied = self.client.get("/export/customers/", headers={"Authorization": "Bearer wrong"})
+        self.assertEqual(denied.status_code, 403)
+        allowed = self.client.get("/export/customers/", headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(allowed.status_code, 200)
+
+    @override_settings(CRM_EXPORT_TOKEN="s3cret")
+    async def test_asgi_streams_asynchronously(self):
+        response = await self.async_client.get(
+            "/export/customers/", {"chunk_size": 1}, headers={"Authorization": "Bearer s3cret"}
+        )
+        self.assertTrue(response.is_async)
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Alice", "Bob"])
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command("export_crm", "orders", "--filter", "customer_name=ali", stdout=out, stderr=StringIO())
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r["customer_email"] for r in records], ["alice@example.com"])
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_crm", *args, "--workers", "0", stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_round_trip_from_export(self):
+        laptop = Product.objects.create(name="Laptop", price=Decimal("999.99"), stock=3)
+        mouse = Product.objects.create(name="Mouse", price=Decimal("19.99"), stock=3)
+        alice = Customer.objects.create(name="Alice", email="alice@example.com", phone="+15551234567")
+        order = make_order(alice, [laptop, mouse])
+        Order.objects.filter(pk=order.pk).update(order_date=datetime(2024, 3, 1, tzinfo=dt_timezone.utc))
+        dumps = {}
+        for kind, format in (("customers", "ndjson"), ("products", "csv"), ("orders", "csv")):
+            path = os.path.join(self.directory.name, f"{kind}.{format}")
+            call_command("export_crm", kind, "--format", format, "--output", path, stderr=StringIO())
+            dumps[kind] = path
+        Order.objects.all().delete()
+        Customer.objects.all().delete()
+        Product.objects.all().delete()
+
+        for kind in ("customers", "products", "orders"):
+            out, err = self.run_import(kind, dumps[kind], "--batch-size", "1")
+            self.assertEqual(err, "")
+        imported = Order.objects.get()
+        self.assertEqual(imported.pk, order.pk)
+        self.assertEqual(imported.order_date, datetime(2024, 3, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(imported.total_amount, Decimal("1019.98"))
+        self.assertEqual(imported.order_items.count(), 2)
+        self.assertEqual(Customer.objects.get().phone, "+15551234567")
+        counters = get_counters()
+        self.assertEqual(counters[CrmCounter.ORDERS], 1)
+        self.assertEqual(counters[CrmCounter.REVENUE], Decimal("1019.98"))
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        Customer.objects.create(name="Existing", email="taken@example.com")
+        path = self.write("customers.ndjson", "\n".join([
+            '{"name": "Ann", "email": "ann@example.com", "phone": "123-456-7890"}',
+            '{"name": "Bad", "email": "not-an-email"}',
+            '{"name": "Bad", "email": "bad@example.com", "phone": "12345"}',
+            '{"name": "Dup", "email": "taken@example.com"}',
+            '{"name": "Ann again", "email": "ann@example.com"}',
+            "{broken",
+        ]))
+        out, err = self.run_import("customers", path)
+        self.assertIn("Imported 1 customers.", out)
+        self.assertEqual(
+            [line.split(":")[0] for line in err.splitlines()],
+            ["record 2", "record 3", "record 4", "record 5", "record 6"],
+        )
+        self.assertIn("Invalid phone format", err)
+
+    def test_non_finite_prices_are_row_errors(self):
+        Customer.objects.create(name="Alice", email="alice@example.com")
+        products = self.write("products.csv", "name,price,stock\nLamp,NaN,1\nDesk,Infinity,1\nPen,1.50,1\n")
+        out, err = self.run_import("products", products)
+        self.assertIn("Imported 1 products.", out)
+        self.assertEqual(err.splitlines(), ["record 1: price is not a number.", "record 2: price is not a number."])
+        orders = self.write("orders.ndjson", '{"customer_email": "alice@example.com", '
+                            '"items": [{"product_name": "Pen", "unit_price": "NaN"}]}')
+        out, err = self.run_import("orders", orders)
+        self.assertIn("unit_price is not a number.", err)
+        self.assertFalse(Order.objects.exists())
+
+    def test_orders_resolve_references_by_natural_key(self):
+        Customer.objects.create(name="Alice", email="alice@example.com")
+        Product.objects.create(name="Laptop", price=Decimal("999.99"), stock=3)
+        Product.objects.create(name="Mouse", price=Decimal("19.99"), stock=3)
+        path = self.write("orders.ndjson", "\n".join([
+            '{"customer_email": "alice@example.com", "items": [{"product_name": "Laptop"}, {"product_name": "Mouse", "quantity": 2}]}',
+            '{"customer_email": "nobody@example.com", "items": [{"product_name": "Laptop"}]}',
+            '{"customer_email": "alice@example.com", "items": [{"product_name": "Tablet"}]}',
+        ]))
+        with CaptureQueriesContext(connection) as queries:
+            out, err = self.run_import("orders", path)
+        self.assertIn("Imported 1 orders.", out)
+        self.assertEqual(len(err.splitlines()), 2)
+        self.assertEqual(Order.objects.get().total_amount, Decimal("1039.97"))
+        # Two id-map loads plus one transaction of bulk inserts.
+        self.assertLess(len(queries), 12)
+
+    def test_validates_in_a_process_pool(self):
+        path = self.write("products.csv", "name,price,stock\n" + "".join(
+            f"Item {i},{i}.50,{i}\n" for i in range(50)
+        ) + "Broken,-1,0\n")
+        err = StringIO()
+        call_command("import_crm", "products", path, "--workers", "2", "--batch-size", "7",
+                     stdout=StringIO(), stderr=err)
+        self.assertEqual(Product.objects.count(), 50)
+        self.assertEqual(err.getvalue().strip(), "record 51: Price must be positive")
+
+
+class SeedDbTests(TestCase):
+    def seed(self, **options):
+        call_command(
+            "seed_db", customers=30, products=12, orders=300, seed=5, end="2026-01-01",
+            batch_size=40, stdout=StringIO(), **options,
+        )
+        return (
+            list(Customer.objects.order_by("id").values_list("id", "email", "phone", "created_at")),
+            list(Product.objects.order_by("id").values_list("id", "name", "price")),
+            list(Order.objects.order_by("id").values_list("id", "customer_id", "order_date", "total_amount")),
+            list(OrderItem.objects.order_by("order_id", "product_id").values_list(
+                "order_id", "product_id", "quantity", "unit_price",
+            )),
+        )
+
+    def test_same_seed_gives_same_data_with_any_worker_count(self):
+        inline = self.seed(workers=0)
+        with CaptureQueriesContext(connection) as queries:
+            pooled = self.seed(workers=2, clear=True)
+        self.assertEqual(inline, pooled)
+        # A handful of multi-row inserts per 40-row chunk, not queries per order.
+        self.assertLess(len(queries), 80)
+
+    def test_generated_orders_are_consistent(self):
+        self.seed(workers=0)
+        self.assertEqual(Order.objects.count(), 300)
+        for order in Order.objects.prefetch_related("order_items"):
+            self.assertEqual(order.total_amount, sum(item.line_total for item in order.order_items.all()))
+        self.assertFalse(Order.objects.filter(order_date__lt=F("customer__created_at")).exists())
+        self.assertFalse(Order.objects.filter(order_date__gte=datetime(2026, 1, 1, tzinfo=dt_timezone.utc)).exists())
+        counters = get_counters()
+        self.assertEqual(counters[CrmCounter.ORDERS], 300)
+        self.assertEqual(counters[CrmCounter.REVENUE], Order.objects.aggregate(t=Sum("total_amount"))["t"])
+        # Power-law: the busiest customer places far more than an even share.
+        busiest = Order.objects.values("customer").annotate(n=Count("id")).order_by("-n")[0]["n"]
+        self.assertGreater(busiest, 3 * 300 / 30)
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name="Ann Smith", email="ann@example.com")
+        products = [
+            Product.objects.create(name=f"Widget {i}", price=Decimal("30.00"), stock=i) for i in range(3)
+        ]
+        make_order(customer, products)
+
+    def test_reports_every_operation_and_leaves_the_data_alone(self):
+        path = os.path.join(tempfile.mkdtemp(), "results.json")
+        self.addCleanup(os.remove, path)
+        call_command(
+            "benchmark_graphql", "--in-place", "--iterations", "3", "--warmup", "0", "--output", path,
+            stdout=StringIO(),
+        )
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(set(report["operations"]), {op.name for op in operations()})
+        orders = report["operations"]["all_orders_filtered"]
+        self.assertEqual(
+            set(orders), {"p50_ms", "p95_ms", "p99_ms", "mean_ms", "queries", "peak_memory_kib"}
+        )
+        self.assertLessEqual(orders["p50_ms"], orders["p99_ms"])
+        self.assertGreater(orders["queries"], 0)
+        # Mutations ran inside rolled-back transactions.
+        self.assertEqual(Customer.objects.count(), 1)
+        self.assertEqual(Product.objects.filter(stock__lt=10).count(), 3)
+
+        # Compared with itself, only an added query counts as a regression.
+        report["operations"]["create_order"]["queries"] -= 1
+        with open(path, "w") as f:
+            json.dump(report, f)
+        with self.assertRaisesMessage(CommandError, "create_order"):
+            call_command(
+                "benchmark_graphql", "--in-place", "--iterations", "3", "--warmup", "0",
+                "--operation", "create_order", "--baseline", path, "--threshold", "100",
+                stdout=StringIO(),
+            )
+
+    def test_regressions_respect_threshold_and_noise_floor(self):
+        before = {"op": {"p50_ms": 10.0, "p95_ms": 12.0, "queries": 3, "peak_memory_kib": 100}}
+        self.assertEqual(regressions(before, before), [])
+        slower = {"op": {**before["op"], "p50_ms": 13.0}}
+        self.assertEqual(regressions(before, slower), ["op: p50 10.0 -> 13.0 ms"])
+        self.assertEqual(regressions(before, slower, threshold=0.5), [])
+        self.assertEqual(regressions(before, slower, min_delta_ms=5), [])
+        heavier = {"op": {**before["op"], "peak_memory_kib": 200}}
+        self.assertEqual(regressions(before, heavier), ["op: peak memory 100 -> 200 KiB"])
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 99), 5)
+
+
+class ScheduledJobTests(TestCase):
+    """Cron jobs and Celery tasks run their GraphQL in-process."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(name="Pen", price=Decimal("1.50"), stock=2)
+        Product.objects.create(name="Desk", price=Decimal("90.00"), stock=40)
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        make_order(customer, list(Product.objects.all()))
+        call_command("rebuild_crm_counters", stdout=StringIO())
+
+    def log_tail(self, path, run):
+        start = os.path.getsize(path) if os.path.exists(path) else 0
+        run()
+        with open(path) as f:
+            f.seek(start)
+            return f.read()
+
+    def test_update_low_stock_runs_the_mutation_in_process(self):
+        with redirect_stdout(StringIO()):
+            logged = self.log_tail("/tmp/low_stock_updates_log.txt", cron.update_low_stock)
+        self.assertIn("Updated 1 low-stock products.", logged)
+        self.assertNotIn("Pen", logged)
+        self.assertEqual(Product.objects.get(name="Pen").stock, 12)
+
+    def test_heartbeat_checks_the_schema_or_the_configured_endpoint(self):
+        out = StringIO()
+        with redirect_stdout(out):
+            cron.log_crm_heartbeat()
+        self.assertIn("GraphQL schema responded: {'totalCustomers': 1}", out.getvalue())
+
+        out = StringIO()
+        with override_settings(CRM_HEARTBEAT_URL="http://web:8000/graphql"), \
+                mock.patch("crm.cron.check_endpoint", return_value={"__typename": "Query"}) as check, \
+                redirect_stdout(out):
+            cron.log_crm_heartbeat()
+        check.assert_called_once_with("http://web:8000/graphql")
+        self.assertIn("GraphQL endpoint responded", out.getvalue())
+
+    def test_weekly_report_task(self):
+        last_week = timezone.now() - timedelta(days=7)
+        Order.objects.update(order_date=last_week)
+        Customer.objects.update(created_at=last_week)
+        logged = self.log_tail("/tmp/crm_report_log.txt", generate_crm_report)
+        self.assertIn("1 customers (+1), 1 orders (+1), 91.50 revenue (+91.50)", logged)
+        self.assertEqual(CrmReport.objects.count(), 1)
+
+    def test_errors_are_raised_not_returned(self):
+        with self.assertRaisesMessage(GraphQLExecutionError, "noSuchField"):
+            execute_graphql("{ noSuchField }")
+
+
+class OrderReminderTests(TestCase):
+    """The reminder cron job streams recent orders by customer from a checkpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name="Pen", price=Decimal("1.50"), stock=100)
+        cls.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        cls.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        for days_ago, customer in [(30, cls.alice), (5, cls.alice), (4, cls.bob), (3, cls.alice), (2, cls.bob)]:
+            order = make_order(customer, [product])
+            Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days_ago))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_file = os.path.join(directory.name, "reminders.log")
+        self.checkpoint_file = os.path.join(directory.name, "checkpoint.json")
+
+    def test_pages_are_bounded_sorted_by_customer_and_only_fetch_ids_and_emails(self):
+        calls = []
+
+        def execute(document, variables):
+            calls.append(variables)
+            return execute_graphql(document, variables)
+
+        now = timezone.now()
+        pages = list(send_order_reminders.order_pages(execute, now - timedelta(days=7), now, page_size=3))
+        self.assertEqual([len(orders) for orders in pages], [3, 1])
+        self.assertEqual(calls[0]["cursor"], None)
+        self.assertIsNotNone(calls[1]["cursor"])
+        self.assertEqual(set(pages[0][0]), {"id", "customer"})
+        emails = [order["customer"]["email"] for orders in pages for order in orders]
+        self.assertEqual(sorted(emails), ["alice@example.com"] * 2 + ["bob@example.com"] * 2)
+        self.assertEqual(emails[0], emails[1])
+        self.assertEqual(emails[2], emails[3])
+
+    def test_each_group_is_emitted_before_the_next_page_is_read(self):
+        pages_read = []
+
+        def pages():
+            for page in [[order("1", "a@x.com"), order("2", "a@x.com")], [order("3", "a@x.com"), order("4", "b@x.com")],
+                         [order("5", "c@x.com")]]:
+                pages_read.append(page)
+                yield page
+
+        def order(pk, email):
+            return {"id": pk, "customer": {"email": email}}
+
+        reminders = send_order_reminders.customer_reminders(pages())
+        self.assertEqual(next(reminders), ("a@x.com", ["1", "2", "3"]))
+        self.assertEqual(len(pages_read), 2)
+        self.assertEqual(list(reminders), [("b@x.com", ["4"]), ("c@x.com", ["5"])])
+
+    def test_each_customer_is_reminded_once_and_the_checkpoint_skips_handled_orders(self):
+        def run():
+            return send_order_reminders.send_order_reminders(
+                execute_graphql, log_file=self.log_file, checkpoint_file=self.checkpoint_file
+            )
+
+        self.assertEqual(run(), 2)
+        with open(self.log_file) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        lines.sort(key=lambda line: "bob@" in line)
+        self.assertIn("Reminder for alice@example.com: 2 order(s)", lines[0])
+        self.assertIn("Reminder for bob@example.com: 2 order(s)", lines[1])
+
+        self.assertEqual(run(), 0)
+        make_order(self.bob, list(Product.objects.all()))
+        self.assertEqual(run(), 1)
+        with open(self.log_file) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("Reminder for bob@example.com: 1 order(s)", lines[2])
+
+    def test_the_checkpoint_defaults_to_the_state_directory(self):
+        state_dir = os.path.join(os.path.dirname(self.log_file), "state")
+        with self.settings(CRM_STATE_DIR=state_dir):
+            send_order_reminders.send_order_reminders(execute_graphql, log_file=self.log_file)
+        self.assertTrue(os.path.exists(os.path.join(state_dir, send_order_reminders.CHECKPOINT_NAME)))
+
+
+class CleanupInactiveCustomersTests(TestCase):
+    """cleanup_inactive_customers deletes in batches and keeps the counters right."""
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name="Pen", price=Decimal("2.00"), stock=100)
+        long_ago = timezone.now() - timedelta(days=400)
+        for i in range(5):
+            customer = Customer.objects.create(name=f"Old {i}", email=f"old{i}@example.com")
+            order = make_order(customer, [product])
+            Order.objects.filter(pk=order.pk).update(order_date=long_ago)
+        active = Customer.objects.create(name="Active", email="active@example.com")
+        make_order(active, [product])
+        old_order = make_order(active, [product])
+        Order.objects.filter(pk=old_order.pk).update(order_date=long_ago)
+        Customer.objects.create(name="New", email="new@example.com")
+        Customer.objects.update(created_at=long_ago)
+        Customer.objects.filter(email="new@example.com").update(created_at=timezone.now())
+        call_command("rebuild_crm_counters", stdout=StringIO())
+
+    def cleanup(self, **options):
+        out = StringIO()
+        call_command("cleanup_inactive_customers", stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_deletes_nothing(self):
+        out = self.cleanup(dry_run=True)
+        self.assertIn("Would delete 5 inactive customers with 5 orders (10.00 revenue).", out)
+        self.assertEqual(Customer.objects.count(), 7)
+
+    def test_deletes_inactive_customers_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            out = self.cleanup(batch_size=2, progress_interval=0)
+        self.assertIn("Deleted 5 inactive customers.", out)
+        self.assertIn("5 customers", out)
+        self.assertEqual(
+            sorted(Customer.objects.values_list("email", flat=True)), ["active@example.com", "new@example.com"]
+        )
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderItem.objects.count(), 2)
+        # No cascaded row is loaded: orders and items go in one DELETE each.
+        self.assertFalse([q for q in queries if 'FROM "crm_orderitem"' in q["sql"] and q["sql"].startswith("SELECT")])
+        deletes = [q for q in queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 3 * 3)
+
+        counters = get_counters()
+        self.assertEqual(counters[CrmCounter.CUSTOMERS], 2)
+        self.assertEqual(counters[CrmCounter.ORDERS], 2)
+        self.assertEqual(counters[CrmCounter.REVENUE], Decimal("4.00"))
+        self.assertIn("No inactive customers found.", self.cleanup())
+
+    def test_rate_limit_pauses_between_batches(self):
+        with mock.patch("crm.management.commands.cleanup_inactive_customers.time.sleep") as sleep:
+            self.cleanup(batch_size=2, max_rate=1)
+        self.assertEqual(sleep.call_count, 3)
+        self.assertGreater(sleep.call_args_list[-1].args[0], 3)
+
+
+class CrmReportTests(TestCase):
+    """Weekly reports build on the previous week instead of rescanning history."""
+
+    # A Wednesday; the last complete week is Mon 2026-03-02 to Sun 2026-03-08.
+    today = date(2026, 3, 11)
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name="Pen", price=Decimal("10.00"), stock=100)
+        # (signup day, order days)
+        for signup, order_days in [
+            (date(2026, 1, 5), [date(2026, 1, 6), date(2026, 3, 3)]),
+            (date(2026, 3, 2), [date(2026, 3, 8), date(2026, 3, 9)]),
+            (date(2026, 3, 10), [date(2026, 3, 17), date(2026, 3, 23)]),
+        ]:
+            customer = Customer.objects.create(name="C", email=f"c{signup}@example.com")
+            Customer.objects.filter(pk=customer.pk).update(created_at=reports.day_start(signup))
+            for day in order_days:
+                order = make_order(customer, [product])
+                Order.objects.filter(pk=order.pk).update(order_date=reports.day_start(day) + timedelta(hours=23))
+
+    def test_first_report_reads_history_then_each_week_only_its_own_rows(self):
+        with mock.patch("crm.reports.window_totals", wraps=reports.window_totals) as totals:
+            first, = reports.generate_weekly_reports(self.today)
+        self.assertEqual((first.period_start, first.period_end), (date(2026, 3, 2), date(2026, 3, 8)))
+        self.assertEqual(
+            (first.new_customers, first.orders, first.revenue, first.active_customers),
+            (1, 2, Decimal("20.00"), 2),
+        )
+        self.assertEqual((first.total_customers, first.total_orders, first.total_revenue), (2, 3, Decimal("30.00")))
+        self.assertEqual(totals.call_count, 2)
+
+        with mock.patch("crm.reports.window_totals", wraps=reports.window_totals) as totals:
+            later = reports.generate_weekly_reports(self.today + timedelta(days=14))
+        self.assertEqual([r.period_start for r in later], [date(2026, 3, 9), date(2026, 3, 16)])
+        # One bounded window per week; history is not read again.
+        self.assertEqual(len(totals.call_args_list), 2)
+        self.assertTrue(all(call.args[0] is not None for call in totals.call_args_list))
+        self.assertEqual(
+            [(r.total_customers, r.total_orders, r.total_revenue) for r in later],
+            [(3, 4, Decimal("40.00")), (3, 5, Decimal("50.00"))],
+        )
+        self.assertEqual(reports.generate_weekly_reports(self.today + timedelta(days=14)), [])
+
+    def test_reports_query(self):
+        reports.generate_weekly_reports(self.today)
+        reports.generate_weekly_reports(self.today + timedelta(days=14))
+        query = "query ($since: Date, $limit: Int) { crmReports(since: $since, limit: $limit) { periodStart totalOrders revenue } }"
+        data = execute_graphql(query, {"since": "2026-03-09"})
+        self.assertEqual(
+            data["crmReports"],
+            [
+                {"periodStart": "2026-03-16", "totalOrders": 5, "revenue": "10.00"},
+                {"periodStart": "2026-03-09", "totalOrders": 4, "revenue": "10.00"},
+            ],
+        )
+        self.assertEqual(len(execute_graphql(query, {"limit": 1})["crmReports"]), 1)
+        with self.assertRaisesMessage(GraphQLExecutionError, "limit must be between 1 and 520."):
+            execute_graphql(query, {"limit": 0})
+
+
+class ReadReplicaRoutingTests(TransactionTestCase):
+    """
+    Query operations read from a snapshot of default; writes, and reads
+    after them, stay on default. Committed data, so the snapshot sees it.
+    """
+
+    databases = {"default", "replica"}
+    query = "{ allCustomers { edges { node { name } } } }"
+
+    def setUp(self):
+        document_cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "replica.sqlite3")
+        # The test replica mirrors default's settings; point a copy at a
+        # file, here and for connections the sync pool threads open.
+        replica = connections["replica"]
+        original = replica.settings_dict
+        replica.close()
+        self.addCleanup(setattr, replica, "settings_dict", original)
+        self.addCleanup(connections.settings.__setitem__, "replica", connections.settings["replica"])
+        replica.settings_dict = connections.settings["replica"] = {**original, "NAME": self.path}
+        self.addCleanup(replica.close)
+
+        Customer.objects.create(name="Alice", email="alice@example.com")
+        out = StringIO()
+        call_command("snapshot_replica", stdout=out)
+        self.assertIn(f"written to {self.path}", out.getvalue())
+        Customer.objects.create(name="Bob", email="bob@example.com")
+
+    def names(self, response):
+        self.assertNotIn("errors", response.json())
+        return [edge["node"]["name"] for edge in response.json()["data"]["allCustomers"]["edges"]]
+
+    def test_queries_read_the_replica(self):
+        with CaptureQueriesContext(connection) as default_queries:
+            response = self.client.post("/graphql/", {"query": self.query}, content_type="application/json")
+        self.assertEqual(self.names(response), ["Alice"])
+        self.assertEqual(len(default_queries), 0)
+
+        response = async_to_sync(AsyncClient().post)(
+            "/graphql/async/", {"query": self.query}, content_type="application/json"
+        )
+        self.assertEqual(self.names(response), ["Alice"])
+
+    def test_mutations_and_stale_replicas_use_default(self):
+        mutation = 'mutation { createCustomer(input: {name: "Cara", email: "cara@example.com"}) { customer { name } } }'
+        response = self.client.post("/graphql/", {"query": mutation}, content_type="application/json")
+        self.assertEqual(response.json()["data"]["createCustomer"]["customer"], {"name": "Cara"})
+
+        stale = time.time() - 60
+        os.utime(self.path, (stale, stale))
+        response = self.client.post("/graphql/", {"query": self.query}, content_type="application/json")
+        self.assertEqual(self.names(response), ["Alice", "Bob", "Cara"])
+
+    @override_settings(CRM_RESULT_CACHE={"ENABLED": True, "CACHE_ALIAS": "default", "TIMEOUT": 60})
+    def test_replica_reads_are_not_stored_in_the_result_cache(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        mutation = 'mutation { createCustomer(input: {name: "Cara", email: "cara@example.com"}) { customer { name } } }'
+        self.client.post("/graphql/", {"query": mutation}, content_type="application/json")
+        response = self.client.post("/graphql/", {"query": self.query}, content_type="application/json")
+        self.assertEqual(self.names(response), ["Alice"])
+
+        call_command("snapshot_replica", stdout=StringIO())
+        response = self.client.post("/graphql/", {"query": self.query}, content_type="application/json")
+        self.assertEqual(self.names(response), ["Alice", "Bob", "Cara"])
+
+    def test_reads_after_a_write_stay_on_default(self):
+        state = RoutingState()
+        token = current_routing.set(state)
+        try:
+            self.assertEqual(use_replica_for_reads(), "replica")
+            self.assertEqual(Customer.objects.count(), 1)
+            customer = Customer.objects.get()
+            customer.phone = "+15550001111"
+            customer.save()
+            self.assertEqual(customer._state.db, "default")
+            self.assertEqual(Customer.objects.count(), 2)
+        finally:
+            current_routing.reset(token)
+        # Outside a GraphQL request everything uses default.
+        self.assertEqual(Customer.objects.filter(phone="+15550001111").count(), 1)
+
+
+class CreateOrderStockTests(TestCase):
+    """createOrder reserves stock for every line at once, or fails as a whole."""
+
+    mutation = """
+    mutation ($input: CreateOrderInput!) {
+      createOrder(input: $input) {
+        order { totalAmount }
+        errors
+        lineErrors { productId message }
+      }
+    }
+    """
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Bob", email="bob@example.com")
+        self.products = [
+            Product.objects.create(name=f"Item {i}", price=Decimal("2.00"), stock=5) for i in range(6)
+        ]
+
+    def order(self, lines):
+        result = schema.execute(self.mutation, variable_values={"input": {
+            "customerId": str(self.customer.id),
+            "items": [{"productId": str(product.id), "quantity": quantity} for product, quantity in lines],
+        }})
+        self.assertIsNone(result.errors)
+        return result.data["createOrder"]
+
+    def stock(self):
+        return [product.stock for product in Product.objects.order_by("name")]
+
+    def test_quantities_are_reserved_and_charged(self):
+        pen, book = self.products[:2]
+        data = self.order([(pen, 2), (book, 3), (pen, 1)])
+        self.assertEqual(data["errors"], [])
+        self.assertEqual(Decimal(data["order"]["totalAmount"]), Decimal("12.00"))
+        self.assertEqual(self.stock(), [2, 2, 5, 5, 5, 5])
+        self.assertEqual(
+            sorted(OrderItem.objects.values_list("quantity", flat=True)), [3, 3]
+        )
+        self.assertEqual(get_counters()[CrmCounter.REVENUE], Decimal("12.00"))
+
+    def test_a_short_line_fails_the_whole_order(self):
+        pen, book = self.products[:2]
+        data = self.order([(pen, 2), (book, 6)])
+        self.assertIsNone(data["order"])
+        self.assertEqual(data["lineErrors"], [
+            {"productId": str(book.id), "message": "Insufficient stock for Item 1: 5 available, 6 requested."},
+        ])
+        self.assertEqual(data["errors"], ["Insufficient stock for Item 1: 5 available, 6 requested."])
+        self.assertEqual(self.stock(), [5] * 6)
+        self.assertFalse(Order.objects.exists())
+
+        unknown = Product(name="Gone", price=Decimal("1.00"))
+        data = self.order([(pen, 1), (unknown, 1)])
+        self.assertEqual(data["errors"], [f"Invalid product ID: {unknown.id}"])
+        self.assertEqual(self.order([(pen, 0)])["errors"], [f"Quantity for product {pen.id} must be at least 1."])
+
+        data = self.order([(pen, None)])
+        self.assertEqual(data["errors"], [])
+        self.assertEqual(data["order"]["totalAmount"], str(pen.price))
+        self.assertEqual(self.stock()[0], 4)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        counts = []
+        for lines in ([(self.products[0], 1)], [(product, 1) for product in self.products[1:]]):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.order(lines)["errors"], [])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class CreateOrderRaceTests(TransactionTestCase):
+    """Concurrent orders for the last units never oversell."""
+
+    mutation = """
+    mutation ($input: CreateOrderInput!) {
+      createOrder(input: $input) { order { id } errors }
+    }
+    """
+
+    def test_threads_racing_for_the_last_units(self):
+        customer = Customer.objects.create(name="Bob", email="bob@example.com")
+        product = Product.objects.create(name="Lamp", price=Decimal("9.00"), stock=3)
+        variables = {"input": {"customerId": str(customer.id), "items": [{"productId": str(product.id)}]}}
+        start = threading.Barrier(8)
+
+        def place_order():
+            start.wait()
+            try:
+                for _ in range(50):
+                    data = schema.execute(self.mutation, variable_values=variables).data["createOrder"]
+                    # SQLite's shared-cache test database refuses a second
+                    # writer instead of waiting; a client would retry.
+                    if not any("locked" in error for error in data["errors"]):
+                        return data
+                    time.sleep(0.01)
+                return data
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: place_order(), range(8)))
+
+        placed = [data for data in results if data["order"]]
+        refused = [data for data in results if not data["order"]]
+        self.assertEqual(len(placed), 3)
+        self.assertEqual(
+            {error for data in refused for error in data["errors"]},
+            {"Insufficient stock for Lamp: 0 available, 1 requested."},
+        )
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), 3)
+
+
+class OrderIngestTests(TestCase):
+    """enqueueOrders queues orders that a drain places in micro-batches."""
+
+    mutation = """
+    mutation ($input: [CreateOrderInput!]!) {
+      enqueueOrders(input: $input) { tickets errors }
+    }
+    """
+
+    ticket_query = """
+    query ($ticket: UUID!) {
+      orderTicket(ticket: $ticket) { status errors order { totalAmount } }
+    }
+    """
+
+    def setUp(self):
+        # Orders queue on Kombu's in-memory broker, and tasks run as they
+        # are sent. The app reads the CELERY_ settings, so that name takes
+        # precedence.
+        ingest = override_settings(CRM_ORDER_INGEST={**settings.CRM_ORDER_INGEST, "BROKER_URL": "memory://"})
+        ingest.enable()
+        self.addCleanup(ingest.disable)
+        previous = app.conf.task_always_eager
+        app.conf.update(CELERY_TASK_ALWAYS_EAGER=True)
+        self.addCleanup(app.conf.update, CELERY_TASK_ALWAYS_EAGER=previous)
+        cache.clear()
+        self.customer = Customer.objects.create(name="Bob", email="bob@example.com")
+        self.pen = Product.objects.create(name="Pen", price=Decimal("2.00"), stock=10)
+        self.book = Product.objects.create(name="Book", price=Decimal("15.00"), stock=1)
+
+    def order(self, *lines, customer=None):
+        return {
+            "customerId": str((customer or self.customer).id),
+            "items": [{"productId": str(product.id), "quantity": quantity} for product, quantity in lines],
+        }
+
+    def enqueue(self, *orders):
+        result = schema.execute(self.mutation, variable_values={"input": list(orders)})
+        self.assertIsNone(result.errors)
+        return result.data["enqueueOrders"]
+
+    def ticket(self, ticket):
+        result = schema.execute(self.ticket_query, variable_values={"ticket": str(ticket)})
+        self.assertIsNone(result.errors)
+        return result.data["orderTicket"]
+
+    def test_enqueued_orders_are_placed_by_the_drain(self):
+        data = self.enqueue(self.order((self.pen, 2)), self.order((self.pen, 1), (self.book, 1)))
+        self.assertEqual(data["errors"], [])
+        self.assertEqual(len(data["tickets"]), 2)
+        self.assertEqual(
+            [self.ticket(ticket) for ticket in data["tickets"]],
+            [
+                {"status": "PLACED", "errors": [], "order": {"totalAmount": "4.00"}},
+                {"status": "PLACED", "errors": [], "order": {"totalAmount": "17.00"}},
+            ],
+        )
+        self.assertEqual(
+            sorted(Product.objects.values_list("name", "stock")), [("Book", 0), ("Pen", 7)]
+        )
+        self.assertEqual(get_counters()[CrmCounter.REVENUE], Decimal("21.00"))
+
+    def test_invalid_orders_get_no_ticket(self):
+        stranger = Customer(name="Eve", email="eve@example.com")
+        gone = Product(name="Gone", price=Decimal("1.00"))
+        data = self.enqueue(
+            self.order((self.pen, 1), customer=stranger),
+            self.order((self.pen, 1)),
+            self.order((gone, 1)),
+            self.order((self.pen, 0)),
+        )
+        self.assertEqual(data["errors"], [
+            "[0] Invalid customer ID.",
+            f"[2] Invalid product ID: {gone.id}",
+            f"[3] Quantity for product {self.pen.id} must be at least 1.",
+        ])
+        self.assertEqual([ticket is None for ticket in data["tickets"]], [True, False, True, True])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_calls_are_capped(self):
+        with mock.patch("crm.schema.MAX_ENQUEUED_ORDERS", 2):
+            data = self.enqueue(*[self.order((self.pen, 1))] * 3)
+        self.assertEqual(data, {"tickets": [], "errors": ["At most 2 orders per call."]})
+        self.assertFalse(Order.objects.exists())
+
+    def test_short_stock_fails_only_that_order(self):
+        data = self.enqueue(self.order((self.book, 1)), self.order((self.book, 1)), self.order((self.pen, 1)))
+        statuses = [self.ticket(ticket) for ticket in data["tickets"]]
+        self.assertEqual([status["status"] for status in statuses], ["PLACED", "FAILED", "PLACED"])
+        self.assertEqual(statuses[1]["errors"], ["Insufficient stock for Book: 0 available, 1 requested."])
+        self.assertIsNone(statuses[1]["order"])
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_unknown_tickets_are_pending(self):
+        self.assertEqual(
+            self.ticket("00000000-0000-0000-0000-000000000000"),
+            {"status": "PENDING", "errors": [], "order": None},
+        )
+
+    def test_each_batch_is_one_bulk_insert(self):
+        with mock.patch("crm.ingest.schedule_drain"):
+            tickets = enqueue_orders([(self.customer.pk, {self.pen.pk: 1}, None)] * 5)
+        self.assertFalse(Order.objects.exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(drain_order_queue(batch_size=2), 5)
+        inserts = [query["sql"] for query in queries if query["sql"].startswith('INSERT INTO "crm_order"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(
+            set(OrderTicket.objects.values_list("pk", "status")),
+            {(ticket, OrderTicket.PLACED) for ticket in tickets},
+        )
+        self.assertEqual(drain_order_queue(), 0)
+
+    def test_redelivered_orders_are_placed_once(self):
+        payload = {
+            "ticket": "11111111-1111-1111-1111-111111111111",
+            "customer_id": str(self.customer.pk),
+            "items": {str(self.pen.pk): 1},
+            "order_date": timezone.now().isoformat(),
+        }
+        place_orders([payload, payload])
+        place_orders([payload])
+        self.assertEqual(Order.objects.count(), 1)
+        self.pen.refresh_from_db()
+        self.assertEqual(self.pen.stock, 9)
+
+    def test_benchmark_cleans_up_after_itself(self):
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "pass --yes"):
+            call_command("benchmark_order_ingest", "--orders", "5", stdout=out)
+        call_command("benchmark_order_ingest", "--orders", "5", "--batch-size", "2", "--yes", stdout=out)
+        self.assertIn("Speedup:", out.getvalue())
+        self.assertEqual((Customer.objects.count(), Product.objects.count()), (1, 2))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderTicket.objects.exists())
+        self.assertEqual(get_counters()[CrmCounter.ORDERS], 0)
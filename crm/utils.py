@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+def chunked(iterable, size):
+    """Yields lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@lru_cache(maxsize=None)
+def sync_executor():
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, "CRM_SYNC_WORKERS", 8), thread_name_prefix="crm-sync"
+    )
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Runs blocking (sync ORM) code from async execution on a bounded thread
+    pool, so a burst of requests cannot grow the number of threads without
+    limit.
+    """
+    def call():
+        # Pool threads outlive requests, so apply CONN_MAX_AGE per task.
+        close_old_connections()
+        return func(*args, **kwargs)
+    return await sync_to_async(call, thread_sensitive=False, executor=sync_executor())()
+
+
+def selected_fields(info, field_name):
+    """
+    Returns the snake_case names selected under ``field_name`` in the
+    current field's selection set, or None if it was not requested.
+    """
+    def collect(selection_set, names):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                names.append(selection)
+            elif isinstance(selection, InlineFragmentNode):
+                collect(selection.selection_set, names)
+            elif isinstance(selection, FragmentSpreadNode):
+                collect(info.fragments[selection.name.value].selection_set, names)
+        return names
+
+    selected = None
+    for node in info.field_nodes:
+        for child in collect(node.selection_set, []):
+            if to_snake_case(child.name.value) != field_name or not child.selection_set:
+                continue
+            selected = selected or set()
+            selected.update(to_snake_case(f.name.value) for f in collect(child.selection_set, []))
+    return selected
@@ -0,0 +1,19 @@
+import re
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+PHONE_PATTERN = re.compile(r"^(\+\d{1,15}|\d{3}-\d{3}-\d{4})$")
+
+
+def customer_input_error(email, phone):
+    """
+    Returns the validation message for a customer's email and phone,
+    or None when both are acceptable.
+    """
+    try:
+        validate_email(email)
+    except ValidationError:
+        return "Invalid email format."
+    if phone and not PHONE_PATTERN.match(phone):
+        return "Invalid phone format. Use +1234567890 or 123-456-7890."
+    return None
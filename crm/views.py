@@ -1,3 +1,67 @@
-from django.shortcuts import render
+from itertools import islice
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from .export import FORMATS, export_lines, export_queryset
+
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_allowed(request):
+    """
+    Exports carry customer PII: only active staff users, or clients sending
+    ``Authorization: Bearer <CRM_EXPORT_TOKEN>``, may download them.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    token = getattr(settings, "CRM_EXPORT_TOKEN", None)
+    return bool(token) and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+async def stream_async(lines, batch_size):
+    """
+    Yields ``lines`` ``batch_size`` at a time from the thread the view ran
+    in. Under ASGI a sync iterator would be read whole before the first
+    byte is sent.
+    """
+    iterator = iter(lines)
+    next_batch = sync_to_async(lambda: "".join(islice(iterator, batch_size)), thread_sensitive=True)
+    while batch := await next_batch():
+        yield batch
+
+
+@require_GET
+def export(request, kind):
+    """
+    Streams ``kind`` (customers, products or orders) as NDJSON or CSV.
+    ``format`` and ``chunk_size`` are query parameters; every other
+    parameter is passed to the kind's FilterSet.
+    """
+    if not export_allowed(request):
+        return HttpResponseForbidden()
+    params = request.GET.dict()
+    format = params.pop("format", "ndjson")
+    chunk_size = params.pop("chunk_size", "2000")
+    if format not in FORMATS or not chunk_size.isdigit() or int(chunk_size) < 1:
+        return JsonResponse(
+            {"error": f"format must be one of {', '.join(FORMATS)} and chunk_size a positive integer."},
+            status=400,
+        )
+    try:
+        queryset = export_queryset(kind, params)
+    except ValidationError as e:
+        return JsonResponse({"error": e.messages}, status=400)
+
+    lines = export_lines(kind, queryset, format, int(chunk_size))
+    if isinstance(request, ASGIRequest):
+        lines = stream_async(lines, int(chunk_size))
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[format])
+    response["Content-Disposition"] = f'attachment; filename="{kind}.{format}"'
+    return response